@@ -0,0 +1,288 @@
+"""
+Chat archive - inactive rooms moved out of the hot `messages` table
+A room whose newest message is older than CHAT_ARCHIVE_AFTER_DAYS is packed
+into one compressed row of `chat_archive` and its messages are deleted, so
+`messages` and its indexes only hold conversations that are still going.
+The row keeps the last message preview and each participant's unread count,
+so the matches list never has to open it.
+
+A room is hot or archived, never both: opening, syncing, reading or sending
+to an archived room first rehydrates it (the messages go back into
+`messages` in one transaction). Archived messages keep their search index
+entries (see MessageSearch), so old chats stay searchable without rehydrating
+them.
+
+Blob format: one codec byte (b"z" zstd when the zstandard package is
+installed, b"d" zlib/deflate otherwise) + compressed column-oriented JSON
+(ids, senders, timestamps, texts, client ids, room seq numbers as parallel
+arrays). Rows archived before seq numbers existed are numbered by position.
+"""
+
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+
+import orjson
+
+try:
+    import zstandard
+except ImportError:  # Optional - zlib is always available
+    zstandard = None
+
+# Rooms with no message for this long are archived (0 = never archive automatically)
+CHAT_ARCHIVE_AFTER_DAYS = int(os.getenv("CHAT_ARCHIVE_AFTER_DAYS", "0"))
+CHAT_ARCHIVE_INTERVAL_SECONDS = int(os.getenv("CHAT_ARCHIVE_INTERVAL_SECONDS", "86400"))
+CHAT_ARCHIVE_BATCH_ROOMS = 200  # Rooms archived per transaction
+
+
+def iso(value) -> str:
+    """Timestamp as the ISO text messages are written with (Postgres hands back datetimes)"""
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def encode_messages(rows: List[dict]) -> bytes:
+    """Pack messages (id, sender_id, message, created_at, client_id, seq) into a compressed blob"""
+    payload = orjson.dumps({
+        "id": [row['id'] for row in rows],
+        "sender_id": [row['sender_id'] for row in rows],
+        "created_at": [iso(row['created_at']) for row in rows],
+        "message": [row['message'] for row in rows],
+        "client_id": [row['client_id'] for row in rows],
+        "seq": [row['seq'] for row in rows],
+    })
+    if zstandard is not None:
+        return b"z" + zstandard.ZstdCompressor(level=9).compress(payload)
+    return b"d" + zlib.compress(payload, 9)
+
+
+def decode_messages(blob) -> List[dict]:
+    blob = bytes(blob)
+    codec, data = blob[:1], blob[1:]
+    if codec == b"z":
+        if zstandard is None:
+            raise RuntimeError("Chat archive row is zstd-compressed but zstandard is not installed")
+        payload = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        payload = zlib.decompress(data)
+    columns = orjson.loads(payload)
+    if "seq" not in columns:  # Archived in (created_at, id) order before seq numbers
+        columns["seq"] = list(range(1, len(columns["id"]) + 1))
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+class ChatArchive:
+    """Archive / rehydrate whole chat rooms"""
+
+    def __init__(self, database, wallet_ids):
+        self.db = database
+        self.wallet_ids = wallet_ids
+        self.lock = threading.Lock()
+        self.stats = {"runs": 0, "rooms_archived": 0, "messages_archived": 0, "rooms_rehydrated": 0,
+                      "last_run_seconds": 0.0, "last_rehydrate_ms": 0.0}
+
+    # ---------- rehydration ----------
+
+    def rehydrate(self, cursor, chat_room_ids: Iterable[str]) -> int:
+        """Move archived rooms back into `messages` inside the caller's transaction; returns rooms restored"""
+        chat_room_ids = list(dict.fromkeys(chat_room_ids))
+        if not chat_room_ids:
+            return 0
+        ph = self.db.placeholder()
+        start = time.perf_counter()
+        # DELETE ... RETURNING claims each row once, even with concurrent openers
+        cursor.execute(f"""DELETE FROM chat_archive WHERE chat_room_id IN ({", ".join([ph] * len(chat_room_ids))})
+                           RETURNING chat_room_id, messages""", tuple(chat_room_ids))
+        archived = cursor.fetchall()
+        for row in archived:
+            room, blob = row['chat_room_id'], row['messages']
+            cursor.executemany(f"""INSERT INTO messages (id, chat_room_id, sender_id, message, created_at, client_id, seq)
+                                   VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})
+                                   ON CONFLICT DO NOTHING""",
+                               [(m['id'], room, m['sender_id'], m['message'], m['created_at'], m['client_id'], m['seq'])
+                                for m in decode_messages(blob)])
+        if archived:
+            self.stats["rooms_rehydrated"] += len(archived)
+            self.stats["last_rehydrate_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return len(archived)
+
+    def ensure_hot(self, chat_room_id: str) -> bool:
+        """Rehydrate a room if it is archived (one primary key lookup otherwise); True if it was archived"""
+        ph = self.db.placeholder()
+        if not self.db.execute_one(f"SELECT 1 AS archived FROM chat_archive WHERE chat_room_id = {ph}",
+                                   (chat_room_id,)):
+            return False
+        with self.db.get_connection() as conn:
+            restored = self.rehydrate(self.db.get_cursor(conn), [chat_room_id])
+            conn.commit()
+        return restored > 0
+
+    def messages(self, chat_room_ids: List[str]) -> Dict[str, List[dict]]:
+        """Decoded messages of the archived rooms among `chat_room_ids` (room -> messages, read only)"""
+        if not chat_room_ids:
+            return {}
+        ph = self.db.placeholder()
+        rows = self.db.execute_query(f"""SELECT chat_room_id, messages FROM chat_archive
+                                         WHERE chat_room_id IN ({", ".join([ph] * len(chat_room_ids))})""",
+                                     tuple(chat_room_ids))
+        return {row['chat_room_id']: decode_messages(row['messages']) for row in rows}
+
+    def summaries(self, chat_room_ids: List[str]) -> Dict[str, dict]:
+        """Last message preview + unread counts of archived rooms (room -> row)"""
+        if not chat_room_ids:
+            return {}
+        ph = self.db.placeholder()
+        rows = self.db.execute_query(f"""SELECT chat_room_id, last_sender_id, last_message, last_message_at,
+                                                user1_unread, user2_unread
+                                         FROM chat_archive
+                                         WHERE chat_room_id IN ({", ".join([ph] * len(chat_room_ids))})""",
+                                     tuple(chat_room_ids))
+        return {row['chat_room_id']: row for row in rows}
+
+    # ---------- archival ----------
+
+    def _archive_room(self, cursor, room: dict, cutoff: str, wallets: Dict[int, str]) -> int:
+        ph = self.db.placeholder()
+        chat_room_id = room['chat_room_id']
+        cursor.execute(f"""SELECT id, sender_id, message, created_at, client_id, seq FROM messages
+                           WHERE chat_room_id = {ph} AND created_at < {ph}
+                           ORDER BY seq""", (chat_room_id, cutoff))
+        rows = [dict(row) for row in cursor.fetchall()]
+        if not rows:
+            return 0
+
+        # A room archived earlier that got messages without being opened (concurrent send) - merge
+        cursor.execute(f"SELECT messages FROM chat_archive WHERE chat_room_id = {ph}", (chat_room_id,))
+        existing = cursor.fetchone()
+        if existing:
+            known = {row['id'] for row in rows}
+            rows = sorted([m for m in decode_messages(existing['messages']) if m['id'] not in known] + rows,
+                          key=lambda m: m['seq'])
+
+        # Unread counts per participant at archive time (the room is frozen until it is opened)
+        cursor.execute(f"""SELECT wallet_address, last_read_at FROM chat_reads WHERE chat_room_id = {ph}""",
+                       (chat_room_id,))
+        read_at = {row['wallet_address']: row['last_read_at'] for row in cursor.fetchall()}
+        unread = []
+        for participant in (room['user1_id'], room['user2_id']):
+            last_read = read_at.get(wallets.get(participant))
+            unread.append(sum(1 for m in rows if m['sender_id'] != participant
+                              and (last_read is None or iso(m['created_at']) > iso(last_read))))
+
+        last = rows[-1]
+        blob = encode_messages(rows)
+        cursor.execute(f"""INSERT INTO chat_archive (chat_room_id, messages, message_count, last_sender_id,
+                                                     last_message, last_message_at, user1_unread, user2_unread)
+                           VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})
+                           ON CONFLICT (chat_room_id) DO UPDATE SET messages = excluded.messages,
+                           message_count = excluded.message_count, last_sender_id = excluded.last_sender_id,
+                           last_message = excluded.last_message, last_message_at = excluded.last_message_at,
+                           user1_unread = excluded.user1_unread, user2_unread = excluded.user2_unread,
+                           archived_at = CURRENT_TIMESTAMP""",
+                       (chat_room_id, blob, len(rows), last['sender_id'], last['message'][:140],
+                        last['created_at'], unread[0], unread[1]))
+        # Only what was packed - a message sent meanwhile stays hot and is merged on the next open
+        cursor.execute(f"DELETE FROM messages WHERE chat_room_id = {ph} AND seq <= {ph}",
+                       (chat_room_id, last['seq']))
+        return len(rows)
+
+    def table_bytes(self) -> int:
+        """On-disk size of messages + its indexes (Postgres) or of the whole database file (SQLite)"""
+        if self.db.use_postgres:
+            row = self.db.execute_one("SELECT pg_total_relation_size('messages') AS size")
+            return int(row['size'])
+        row = self.db.execute_one("""SELECT page_count * page_size AS size
+                                     FROM pragma_page_count(), pragma_page_size()""")
+        return int(row['size'])
+
+    def archive_inactive(self, older_than_days: int, vacuum: bool = False) -> Dict:
+        """Archive every room whose newest message is older than the cutoff"""
+        start = time.time()
+        ph = self.db.placeholder()
+        # messages.created_at is written as local-time ISO text
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+        bytes_before = self.table_bytes()
+
+        rooms = self.db.execute_query(f"""SELECT m.chat_room_id, MAX(x.user1_id) AS user1_id,
+                                                 MAX(x.user2_id) AS user2_id
+                                          FROM messages m JOIN matches x ON x.chat_room_id = m.chat_room_id
+                                          GROUP BY m.chat_room_id
+                                          HAVING MAX(m.created_at) < {ph}""", (cutoff,))
+        # Resolved up front - a lookup on its own connection would wait on the archive transaction (SQLite)
+        wallets = self.wallet_ids.get_wallets({room['user1_id'] for room in rooms} | {room['user2_id'] for room in rooms})
+        archived_messages = 0
+        with self.lock:
+            for i in range(0, len(rooms), CHAT_ARCHIVE_BATCH_ROOMS):
+                with self.db.get_connection() as conn:
+                    cursor = self.db.get_cursor(conn)
+                    for room in rooms[i:i + CHAT_ARCHIVE_BATCH_ROOMS]:
+                        archived_messages += self._archive_room(cursor, room, cutoff, wallets)
+                    conn.commit()
+
+        if vacuum and not self.db.use_postgres:
+            with self.db.get_connection() as conn:
+                conn.execute("VACUUM")
+
+        elapsed = time.time() - start
+        bytes_after = self.table_bytes()
+        self.stats["runs"] += 1
+        self.stats["rooms_archived"] += len(rooms)
+        self.stats["messages_archived"] += archived_messages
+        self.stats["last_run_seconds"] = round(elapsed, 3)
+        print(f"🧊 Archived {len(rooms)} chat rooms ({archived_messages} messages) inactive for {older_than_days}d "
+              f"({bytes_before} -> {bytes_after} bytes, {elapsed:.2f}s)")
+        return {"rooms": len(rooms), "messages": archived_messages, "cutoff": cutoff,
+                "bytes_before": bytes_before, "bytes_after": bytes_after, "seconds": round(elapsed, 3)}
+
+    def describe(self) -> Dict:
+        row = self.db.execute_one("""SELECT COUNT(*) AS rooms, COALESCE(SUM(message_count), 0) AS messages
+                                     FROM chat_archive""")
+        return {"archived_rooms": row['rooms'], "archived_messages": row['messages'],
+                "codec": "zstd" if zstandard is not None else "zlib",
+                "archive_after_days": CHAT_ARCHIVE_AFTER_DAYS, **self.stats}
+
+
+if __name__ == "__main__":
+    # Size / rehydration benchmark (SQLite, temp dir): python chat_archive.py [rooms] [messages_per_room]
+    import random
+    import sys
+    import tempfile
+    import uuid
+
+    room_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_room = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    os.chdir(tempfile.mkdtemp())
+    from database import db
+    from wallet_ids import WalletIdMap
+
+    db.init_db()
+    words = ["gm", "wen", "moon", "ser", "sol", "jup", "bonk", "ngmi", "wagmi", "lfg", "rug", "alpha", "chart", "pump"]
+    rooms = [str(uuid.uuid4()) for _ in range(room_count)]
+    old = datetime(2024, 1, 1)
+    with db.get_connection() as conn:
+        conn.executemany("INSERT INTO matches (id, user1_id, user2_id, chat_room_id) VALUES (?, ?, ?, ?)",
+                         [(str(uuid.uuid4()), i * 2 + 1, i * 2 + 2, room) for i, room in enumerate(rooms)])
+        conn.executemany("""INSERT INTO messages (id, chat_room_id, sender_id, message, created_at, seq)
+                            VALUES (?, ?, ?, ?, ?, ?)""",
+                         [(str(uuid.uuid4()), room, i * 2 + 1 + n % 2,
+                           " ".join(random.choices(words, k=random.randint(2, 12))),
+                           (old + timedelta(minutes=n)).isoformat(), n + 1)
+                          for i, room in enumerate(rooms) for n in range(per_room)])
+        conn.commit()
+        conn.execute("VACUUM")
+
+    archive = ChatArchive(db, WalletIdMap(db))
+    result = archive.archive_inactive(older_than_days=30, vacuum=True)
+    archive_bytes = db.execute_one("SELECT SUM(LENGTH(messages)) AS size FROM chat_archive")['size']
+    print(f"{result['messages']} messages in {room_count} rooms ({per_room} per room), "
+          f"codec {'zstd' if zstandard is not None else 'zlib'}")
+    print(f"  database file before: {result['bytes_before'] / 1e6:8.2f} MB")
+    print(f"  database file after:  {result['bytes_after'] / 1e6:8.2f} MB")
+    print(f"  archive payload:      {archive_bytes / 1e6:8.2f} MB ({archive_bytes / result['messages']:.1f} bytes/message)")
+
+    start = time.perf_counter()
+    for room in rooms[:100]:
+        archive.ensure_hot(room)
+    print(f"  rehydrate on open:    {(time.perf_counter() - start) / 100 * 1000:8.2f} ms per room")
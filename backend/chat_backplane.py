@@ -0,0 +1,261 @@
+"""
+Chat pub/sub backplane - delivers chat broadcasts to sockets on every worker
+A message is handed to local sockets right away and published to the other
+workers, which forward it to their own sockets for that room. Workers only
+subscribe to rooms they currently hold sockets for.
+
+CHAT_BACKPLANE:
+- "postgres": LISTEN/NOTIFY, one channel per room (default with DATABASE_URL)
+- "local":    in-process broker (single worker, tests - several backplanes
+              sharing one LocalBroker behave like separate workers)
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+import orjson
+
+from fast_json import dumps
+
+CHAT_BACKPLANE = os.getenv("CHAT_BACKPLANE", "auto").lower()  # "auto", "local" or "postgres"
+
+# NOTIFY payloads are capped at 8000 bytes; bigger messages are sent by id and loaded by the receiver
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+Deliver = Callable[[dict, str], Awaitable[int]]
+
+
+class LocalBroker:
+    """In-process message bus shared by LocalBackplane instances"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set["LocalBackplane"]] = {}
+
+    def subscribe(self, chat_room_id: str, backplane: "LocalBackplane"):
+        self.subscribers.setdefault(chat_room_id, set()).add(backplane)
+
+    def unsubscribe(self, chat_room_id: str, backplane: "LocalBackplane"):
+        room = self.subscribers.get(chat_room_id)
+        if room is not None:
+            room.discard(backplane)
+            if not room:
+                del self.subscribers[chat_room_id]
+
+
+class LocalBackplane:
+    """Backplane for a single process (or several simulated workers sharing a broker)"""
+
+    kind = "local"
+
+    def __init__(self, deliver: Deliver, broker: Optional[LocalBroker] = None):
+        self.deliver = deliver
+        self.broker = broker or LocalBroker()
+        self.rooms: Set[str] = set()
+        self.stats = {"published": 0, "received": 0}
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        for chat_room_id in list(self.rooms):
+            await self.unsubscribe(chat_room_id)
+
+    async def subscribe(self, chat_room_id: str):
+        self.rooms.add(chat_room_id)
+        self.broker.subscribe(chat_room_id, self)
+
+    async def unsubscribe(self, chat_room_id: str):
+        self.rooms.discard(chat_room_id)
+        self.broker.unsubscribe(chat_room_id, self)
+
+    async def publish(self, chat_room_id: str, message: dict) -> int:
+        """Deliver to local sockets, then to every other subscribed backplane"""
+        self.stats["published"] += 1
+        delivered = await self.deliver(message, chat_room_id)
+        for other in list(self.broker.subscribers.get(chat_room_id, ())):
+            if other is not self:
+                other.stats["received"] += 1
+                await other.deliver(message, chat_room_id)
+        return delivered
+
+    def describe(self) -> Dict:
+        return {"kind": self.kind, "subscribed_rooms": len(self.rooms), **self.stats}
+
+
+def channel_name(chat_room_id: str) -> str:
+    """Postgres channel for a room (identifiers max out at 63 bytes)"""
+    return "chat_" + hashlib.sha1(chat_room_id.encode("utf-8")).hexdigest()
+
+
+class PostgresBackplane:
+    """LISTEN/NOTIFY backplane - one listener connection per worker"""
+
+    kind = "postgres"
+
+    def __init__(self, deliver: Deliver, connect: Callable, load_message: Callable[[str], Optional[dict]]):
+        self.deliver = deliver
+        self.connect = connect
+        self.load_message = load_message
+        self.origin = uuid.uuid4().hex  # Skip our own notifications (already delivered locally)
+        self.rooms: Dict[str, str] = {}  # channel -> chat_room_id
+        self.listener = None
+        self.publisher = None
+        self.publish_lock = threading.Lock()
+        # Serializes LISTEN/UNLISTEN round trips (run off the event loop) and listener reopens
+        self.subscription_lock: Optional[asyncio.Lock] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"published": 0, "received": 0, "oversized": 0, "reconnects": 0}
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.subscription_lock = asyncio.Lock()
+        await self._open_listener()
+        print(f"📡 Chat backplane: Postgres LISTEN/NOTIFY (worker {self.origin[:8]})")
+
+    def _connect_listener(self, channels):
+        """Blocking part of opening the listener (worker thread)"""
+        conn = self.connect()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            for channel in channels:
+                cursor.execute(f"LISTEN {channel}")
+        return conn
+
+    async def _open_listener(self):
+        # Under the lock, so no subscription change lands between the room snapshot and the reader
+        async with self.subscription_lock:
+            conn = await asyncio.to_thread(self._connect_listener, list(self.rooms))
+            self.listener = conn
+            self.loop.add_reader(conn.fileno(), self._on_readable)
+
+    async def stop(self):
+        if self.listener is not None:
+            self.loop.remove_reader(self.listener.fileno())
+            self.listener.close()
+            self.listener = None
+        if self.publisher is not None:
+            self.publisher.close()
+            self.publisher = None
+
+    def _execute_listener(self, listener, sql: str):
+        with listener.cursor() as cursor:
+            cursor.execute(sql)
+
+    async def _change_subscription(self, sql: str):
+        """LISTEN/UNLISTEN on a worker thread; changes apply in call order"""
+        async with self.subscription_lock:
+            listener = self.listener
+            if listener is None:
+                return  # Reconnecting - the reopen LISTENs the current self.rooms
+            try:
+                await asyncio.to_thread(self._execute_listener, listener, sql)
+            except Exception as e:
+                print(f"❌ Chat backplane listener error: {e}")
+                if listener is self.listener:
+                    self._reconnect()
+
+    async def subscribe(self, chat_room_id: str):
+        channel = channel_name(chat_room_id)
+        if channel not in self.rooms:
+            self.rooms[channel] = chat_room_id
+            await self._change_subscription(f"LISTEN {channel}")
+
+    async def unsubscribe(self, chat_room_id: str):
+        channel = channel_name(chat_room_id)
+        if self.rooms.pop(channel, None) is not None:
+            await self._change_subscription(f"UNLISTEN {channel}")
+
+    def _notify(self, channel: str, payload: str):
+        with self.publish_lock:
+            try:
+                if self.publisher is None or self.publisher.closed:
+                    self.publisher = self.connect()
+                    self.publisher.autocommit = True
+                with self.publisher.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+            except Exception:
+                self.publisher = None
+                raise
+
+    async def publish(self, chat_room_id: str, message: dict) -> int:
+        """Deliver to local sockets, then NOTIFY the room's channel"""
+        self.stats["published"] += 1
+        delivered = await self.deliver(message, chat_room_id)
+        payload = dumps({"origin": self.origin, "room": chat_room_id, "message": message}).decode("utf-8")
+        if len(payload.encode("utf-8")) > NOTIFY_PAYLOAD_LIMIT:
+            self.stats["oversized"] += 1
+            payload = dumps({"origin": self.origin, "room": chat_room_id,
+                             "message_id": message["id"]}).decode("utf-8")
+        try:
+            await asyncio.to_thread(self._notify, channel_name(chat_room_id), payload)
+        except Exception as e:
+            print(f"❌ Chat backplane publish failed: {e}")
+        return delivered
+
+    def _on_readable(self):
+        try:
+            self.listener.poll()
+        except Exception as e:
+            print(f"❌ Chat backplane listener lost: {e}")
+            self._reconnect()
+            return
+        while self.listener.notifies:
+            notification = self.listener.notifies.pop(0)
+            try:
+                event = orjson.loads(notification.payload)
+            except orjson.JSONDecodeError:
+                continue
+            if event.get("origin") == self.origin or notification.channel not in self.rooms:
+                continue
+            self.stats["received"] += 1
+            asyncio.ensure_future(self._forward(event))
+
+    async def _forward(self, event: dict):
+        message = event.get("message")
+        if message is None:
+            message = await asyncio.to_thread(self.load_message, event["message_id"])
+            if message is None:
+                return
+        await self.deliver(message, event["room"])
+
+    def _reconnect(self):
+        """Reopen the listener and re-LISTEN every subscribed room"""
+        if self.listener is not None:
+            try:
+                self.loop.remove_reader(self.listener.fileno())
+                self.listener.close()
+            except Exception:
+                pass
+            self.listener = None
+        self.stats["reconnects"] += 1
+
+        async def reopen():
+            while self.listener is None:
+                try:
+                    await self._open_listener()
+                except Exception as e:
+                    print(f"❌ Chat backplane reconnect failed: {e}")
+                    await asyncio.sleep(2)
+
+        asyncio.ensure_future(reopen())
+
+    def describe(self) -> Dict:
+        return {"kind": self.kind, "subscribed_rooms": len(self.rooms), "worker": self.origin[:8], **self.stats}
+
+
+def create_backplane(database, deliver: Deliver, load_message: Callable[[str], Optional[dict]],
+                     kind: str = CHAT_BACKPLANE):
+    """Pick the backplane for this deployment"""
+    if kind == "auto":
+        kind = "postgres" if database.use_postgres else "local"
+    if kind == "postgres":
+        if not database.use_postgres:
+            raise RuntimeError("CHAT_BACKPLANE=postgres needs a PostgreSQL DATABASE_URL")
+        import psycopg2
+        from database import DB_CONFIG
+        return PostgresBackplane(deliver, lambda: psycopg2.connect(**DB_CONFIG), load_message)
+    return LocalBackplane(deliver)
@@ -0,0 +1,69 @@
+"""
+Chat room membership cache - chat_room_id -> the two participants' wallet ids
+Every chat entry point (history, send, read receipts, WebSocket handshake)
+authorizes against this map instead of querying `matches`. Rooms are loaded
+lazily with one indexed lookup and added directly when a match is created.
+Matches are never deleted or re-assigned, so entries never go stale and the
+map is safe to keep per worker; unknown rooms are not cached (another worker
+may create them a moment later).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Maximum number of cached rooms (least recently used are dropped)
+CHAT_ROOM_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_ROOM_CACHE_MAX_ENTRIES", "100000"))
+
+
+class ChatRoomCache:
+    """LRU map of chat rooms to their (user1_id, user2_id) participants"""
+
+    def __init__(self, database, max_entries: int = CHAT_ROOM_CACHE_MAX_ENTRIES):
+        self.db = database
+        self.max_entries = max_entries
+        self.rooms: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "added": 0}
+
+    def _store(self, chat_room_id: str, pair: Tuple[int, int]):
+        with self.lock:
+            self.rooms[chat_room_id] = pair
+            self.rooms.move_to_end(chat_room_id)
+            while len(self.rooms) > self.max_entries:
+                self.rooms.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def add(self, chat_room_id: str, user1_id: int, user2_id: int):
+        """Remember a new room (call after the match is committed)"""
+        self._store(chat_room_id, (user1_id, user2_id))
+        self.stats["added"] += 1
+
+    def participants(self, chat_room_id: str) -> Optional[Tuple[int, int]]:
+        """The room's two wallet ids, or None if there is no such room"""
+        with self.lock:
+            pair = self.rooms.get(chat_room_id)
+            if pair is not None:
+                self.stats["hits"] += 1
+                self.rooms.move_to_end(chat_room_id)
+                return pair
+
+        self.stats["misses"] += 1
+        ph = self.db.placeholder()
+        row = self.db.execute_one(f"SELECT user1_id, user2_id FROM matches WHERE chat_room_id = {ph}",
+                                  (chat_room_id,))
+        if not row:
+            return None
+        pair = (row['user1_id'], row['user2_id'])
+        self._store(chat_room_id, pair)
+        return pair
+
+    def is_member(self, chat_room_id: str, wallet_id: Optional[int]) -> bool:
+        if wallet_id is None:
+            return False
+        pair = self.participants(chat_room_id)
+        return pair is not None and wallet_id in pair
+
+    def describe(self) -> Dict:
+        return {"rooms": len(self.rooms), "max_entries": self.max_entries, **self.stats}
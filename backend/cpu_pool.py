@@ -0,0 +1,192 @@
+"""
+Bounded worker pool for CPU-bound request work
+Work that releases the GIL (ed25519 verification in libsodium) runs on a small
+thread pool instead of the event loop, so a login burst can't stall every
+other request on the worker. The pool is bounded twice: CPU_POOL_WORKERS
+threads, and at most CPU_POOL_MAX_QUEUE jobs waiting (further submitters wait
+for a slot instead of piling up). Stats are kept per task name: queue depth
+(jobs waiting or running), wait and run latency.
+
+MicroBatcher coalesces calls that arrive while a batch is running into the
+next batch - one thread hop for many checks, no added latency when idle.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Tuple
+
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+CPU_POOL_MAX_QUEUE = int(os.getenv("CPU_POOL_MAX_QUEUE", "256"))
+CPU_BATCH_MAX_SIZE = int(os.getenv("CPU_BATCH_MAX_SIZE", "64"))
+
+
+class CpuPool:
+    """Thread pool with a bounded backlog and per-task latency stats"""
+
+    def __init__(self, workers: int = CPU_POOL_WORKERS, max_queue: int = CPU_POOL_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cpu")
+        self.slots = None  # Semaphore, created on first use (needs the running loop on Python < 3.10)
+        self.tasks: Dict[str, dict] = {}
+
+    def _task_stats(self, task: str) -> dict:
+        stats = self.tasks.get(task)
+        if stats is None:
+            stats = self.tasks[task] = {"queued": 0, "completed": 0, "failed": 0,
+                                        "wait_ms_total": 0.0, "run_ms_total": 0.0, "max_ms": 0.0}
+        return stats
+
+    async def run(self, task: str, fn: Callable, *args):
+        """Run fn(*args) on the pool and return its result"""
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.workers + self.max_queue)
+        stats = self._task_stats(task)
+        submitted = time.perf_counter()
+        stats["queued"] += 1
+        started = None
+
+        def job():
+            nonlocal started
+            started = time.perf_counter()
+            return fn(*args)
+
+        async with self.slots:
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.executor, job)
+            except Exception:
+                stats["failed"] += 1
+                raise
+            finally:
+                finished = time.perf_counter()
+                started = started or finished
+                stats["queued"] -= 1
+                stats["completed"] += 1
+                stats["wait_ms_total"] += (started - submitted) * 1000
+                stats["run_ms_total"] += (finished - started) * 1000
+                stats["max_ms"] = max(stats["max_ms"], (finished - submitted) * 1000)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def describe(self) -> Dict:
+        tasks = {}
+        for task, stats in self.tasks.items():
+            done = stats["completed"] or 1
+            tasks[task] = {
+                "queue_depth": stats["queued"],
+                "completed": stats["completed"],
+                "failed": stats["failed"],
+                "avg_wait_ms": round(stats["wait_ms_total"] / done, 3),
+                "avg_run_ms": round(stats["run_ms_total"] / done, 3),
+                "max_ms": round(stats["max_ms"], 3),
+            }
+        return {"workers": self.workers, "max_queue": self.max_queue, "tasks": tasks}
+
+
+class MicroBatcher:
+    """Coalesces concurrent calls into batches run on a CpuPool
+
+    `batch_fn` takes a list of distinct keys and returns one result per key;
+    identical keys submitted together share one result.
+    """
+
+    def __init__(self, pool: CpuPool, task: str, batch_fn: Callable[[List[Hashable]], List],
+                 max_size: int = CPU_BATCH_MAX_SIZE):
+        self.pool = pool
+        self.task = task
+        self.batch_fn = batch_fn
+        self.max_size = max_size
+        self.pending: List[Tuple[Hashable, asyncio.Future]] = []
+        self.runners = 0  # Batch loops started (at most one per pool worker)
+        self.stats = {"calls": 0, "batches": 0, "max_batch": 0}
+
+    async def submit(self, key: Hashable):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((key, future))
+        self.stats["calls"] += 1
+        # Idle: start right away. Busy: the call joins the next batch of a running loop,
+        # unless a full batch is waiting and a worker is free for it
+        if not self.runners or (len(self.pending) >= self.max_size and self.runners < self.pool.workers):
+            self.runners += 1
+            asyncio.create_task(self._run())
+        return await future
+
+    async def _run(self):
+        try:
+            while self.pending:
+                batch, self.pending = self.pending[:self.max_size], self.pending[self.max_size:]
+                keys = list(dict.fromkeys(key for key, _ in batch))
+                self.stats["batches"] += 1
+                self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+                try:
+                    results = dict(zip(keys, await self.pool.run(self.task, self.batch_fn, keys)))
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for key, future in batch:
+                    if not future.done():
+                        future.set_result(results[key])
+        finally:
+            self.runners -= 1
+
+    def describe(self) -> Dict:
+        return {"calls_per_batch": round(self.stats["calls"] / self.stats["batches"], 2) if self.stats["batches"] else 0.0,
+                "pending": len(self.pending), **self.stats}
+
+
+if __name__ == "__main__":
+    # Login burst benchmark: python cpu_pool.py [concurrent_logins]
+    import sys
+
+    import base58
+    from nacl.signing import SigningKey, VerifyKey
+
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    message = b"Smart Money Tinder Authentication | Timestamp: 1700000000000"
+    keys = [SigningKey.generate() for _ in range(logins)]
+    signed = [(base58.b58encode(bytes(k.verify_key)).decode(), base58.b58encode(k.sign(message).signature).decode())
+              for k in keys]
+
+    def verify(entry) -> bool:
+        wallet_address, signature = entry
+        VerifyKey(base58.b58decode(wallet_address)).verify(message, base58.b58decode(signature))
+        return True
+
+    async def ticker(stop: asyncio.Event) -> float:
+        """Worst event loop stall while the logins run"""
+        worst = 0.0
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            worst = max(worst, time.perf_counter() - start - 0.001)
+        return worst * 1000
+
+    async def burst(check) -> Tuple[float, float]:
+        stop = asyncio.Event()
+        lag = asyncio.create_task(ticker(stop))
+        await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        await asyncio.gather(*(check(entry) for entry in signed))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        return elapsed, await lag
+
+    async def main():
+        async def inline(entry):
+            return verify(entry)
+
+        pool = CpuPool()
+        batcher = MicroBatcher(pool, "signature", lambda entries: [verify(e) for e in entries])
+        for label, check in (("on the event loop", inline), ("pool + micro-batches", batcher.submit)):
+            elapsed, lag = await burst(check)
+            print(f"  {label:<22} {logins / elapsed:8.0f} logins/s, worst loop stall {lag:7.2f} ms")
+        print(f"{logins} concurrent logins, {pool.workers} workers: {batcher.describe()}")
+        print(pool.describe())
+        pool.shutdown()
+
+    asyncio.run(main())
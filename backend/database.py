@@ -5,7 +5,8 @@ Automatically switches based on DATABASE_URL environment variable
 
 import os
 import sqlite3
-from typing import Any, List, Optional, Tuple
+import time
+from typing import Any, Callable, List, Optional, Tuple
 from contextlib import contextmanager
 
 # Check if we should use PostgreSQL or SQLite
@@ -31,47 +32,101 @@ else:
     DB_CONFIG = {'database': 'smartmoney.db'}
     print(f"📁 Using SQLite: smartmoney.db")
 
+# Bump whenever create_tables or run_migrations (main.py) changes - a database already at
+# this version starts without running any DDL
+SCHEMA_VERSION = 6
+
+
+class ObservedCursorMixin:
+    """Reports the time of each execute / executemany to Database.observer as `op`
+
+    op None = not timed (execute_* time the whole call themselves).
+    """
+    op: Optional[str] = None
+    observe: Optional[Callable[[str, float], None]] = None
+
+    def execute(self, *args, **kwargs):
+        if self.op is None:
+            return super().execute(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().execute(*args, **kwargs)
+        finally:
+            self.observe(self.op, started)
+
+    def executemany(self, *args, **kwargs):
+        if self.op is None:
+            return super().executemany(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().executemany(*args, **kwargs)
+        finally:
+            self.observe(self.op + "_many", started)
+
+
+class ObservedSQLiteCursor(ObservedCursorMixin, sqlite3.Cursor):
+    pass
+
+
+if USE_POSTGRES:
+    class ObservedDictCursor(ObservedCursorMixin, psycopg2.extras.RealDictCursor):
+        pass
+
 
 class Database:
     """Database wrapper that works with both SQLite and PostgreSQL"""
     
     def __init__(self):
         self.use_postgres = USE_POSTGRES
+        # Called as observer(op, seconds) for connects, execute_* calls and statements run on
+        # get_cursor cursors (metrics)
+        self.observer: Optional[Callable[[str, float], None]] = None
+    
+    def _observe(self, op: str, started: float):
+        if self.observer is not None:
+            self.observer(op, time.perf_counter() - started)
     
     @contextmanager
     def get_connection(self):
         """Get a database connection (context manager)"""
+        started = time.perf_counter()
         if self.use_postgres:
             conn = psycopg2.connect(**DB_CONFIG)
+            self._observe("connect", started)
             try:
                 yield conn
             finally:
                 conn.close()
         else:
             conn = sqlite3.connect(DB_CONFIG['database'])
+            self._observe("connect", started)
             try:
                 yield conn
             finally:
                 conn.close()
     
-    def get_cursor(self, conn):
-        """Get a cursor for the connection"""
+    def get_cursor(self, conn, op: Optional[str] = "execute"):
+        """Get a cursor for the connection; its statements are timed as `op` (None = not timed)"""
         if self.use_postgres:
-            return conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor = conn.cursor(cursor_factory=ObservedDictCursor)
         else:
             conn.row_factory = sqlite3.Row
-            return conn.cursor()
+            cursor = conn.cursor(ObservedSQLiteCursor)
+        cursor.op, cursor.observe = op, self._observe
+        return cursor
     
     def execute_query(self, query: str, params: Optional[Tuple] = None) -> List[Any]:
         """Execute a SELECT query and return results"""
         with self.get_connection() as conn:
-            cursor = self.get_cursor(conn)
+            started = time.perf_counter()
+            cursor = self.get_cursor(conn, op=None)
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
             
             results = cursor.fetchall()
+            self._observe("query", started)
             
             # Convert to list of dicts for consistency
             if self.use_postgres:
@@ -82,13 +137,15 @@ class Database:
     def execute_one(self, query: str, params: Optional[Tuple] = None) -> Optional[Any]:
         """Execute a SELECT query and return one result"""
         with self.get_connection() as conn:
-            cursor = self.get_cursor(conn)
+            started = time.perf_counter()
+            cursor = self.get_cursor(conn, op=None)
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
             
             result = cursor.fetchone()
+            self._observe("one", started)
             
             if result is None:
                 return None
@@ -102,12 +159,14 @@ class Database:
     def execute_write(self, query: str, params: Optional[Tuple] = None) -> int:
         """Execute an INSERT/UPDATE/DELETE query and return affected rows"""
         with self.get_connection() as conn:
-            cursor = self.get_cursor(conn)
+            started = time.perf_counter()
+            cursor = self.get_cursor(conn, op=None)
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
             conn.commit()
+            self._observe("write", started)
             return cursor.rowcount
     
     def placeholder(self) -> str:
@@ -118,48 +177,171 @@ class Database:
         """Initialize database tables"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            
-            # Users table with extended profile fields
-            cursor.execute('''CREATE TABLE IF NOT EXISTS users
-                         (id TEXT PRIMARY KEY,
-                          wallet_address TEXT UNIQUE NOT NULL,
-                          trader_number INTEGER UNIQUE,
-                          bio TEXT NOT NULL,
-                          country TEXT NOT NULL,
-                          favourite_ct_account TEXT NOT NULL,
-                          worst_ct_account TEXT,
-                          favourite_trading_venue TEXT NOT NULL,
-                          asset_choice_6m TEXT NOT NULL,
-                          twitter_account TEXT,
-                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-            
-            # Swipes table
-            cursor.execute('''CREATE TABLE IF NOT EXISTS swipes
-                         (id TEXT PRIMARY KEY,
-                          user_id TEXT NOT NULL,
-                          target_wallet TEXT NOT NULL,
-                          direction TEXT NOT NULL,
-                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                          FOREIGN KEY (user_id) REFERENCES users(id))''')
-            
-            # Matches table
-            cursor.execute('''CREATE TABLE IF NOT EXISTS matches
-                         (id TEXT PRIMARY KEY,
-                          user1_wallet TEXT NOT NULL,
-                          user2_wallet TEXT NOT NULL,
-                          chat_room_id TEXT NOT NULL,
-                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-            
-            # Messages table
-            cursor.execute('''CREATE TABLE IF NOT EXISTS messages
-                         (id TEXT PRIMARY KEY,
-                          chat_room_id TEXT NOT NULL,
-                          sender_wallet TEXT NOT NULL,
-                          message TEXT NOT NULL,
-                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-            
+            self.create_tables(cursor)
             conn.commit()
             print("✅ Database tables initialized")
+    
+    def schema_is_current(self) -> bool:
+        """Whether the database was fully set up at SCHEMA_VERSION (one query, no DDL)"""
+        try:
+            row = self.execute_one("SELECT version FROM schema_version")
+        except Exception:
+            return False  # No schema_version table yet
+        return bool(row) and row['version'] == SCHEMA_VERSION
+    
+    def mark_schema_current(self):
+        """Record SCHEMA_VERSION once tables and migrations are in place"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+            cursor.execute("DELETE FROM schema_version")
+            cursor.execute(f"INSERT INTO schema_version (version) VALUES ({self.placeholder()})", (SCHEMA_VERSION,))
+            conn.commit()
+    
+    def create_tables(self, cursor):
+        """Create missing tables/indexes on an open cursor (also used by migrations)"""
+        # Users table with extended profile fields
+        cursor.execute('''CREATE TABLE IF NOT EXISTS users
+                     (id TEXT PRIMARY KEY,
+                      wallet_address TEXT UNIQUE NOT NULL,
+                      trader_number INTEGER UNIQUE,
+                      bio TEXT NOT NULL,
+                      country TEXT NOT NULL,
+                      favourite_ct_account TEXT NOT NULL,
+                      worst_ct_account TEXT,
+                      favourite_trading_venue TEXT NOT NULL,
+                      asset_choice_6m TEXT NOT NULL,
+                      twitter_account TEXT,
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                      updated_at DOUBLE PRECISION)''')  # Unix time of the last profile write (cache validators)
+        
+        # Wallet ids: every wallet referenced by swipes/matches/messages is interned to a dense integer
+        id_type = "SERIAL PRIMARY KEY" if self.use_postgres else "INTEGER PRIMARY KEY"
+        cursor.execute(f'''CREATE TABLE IF NOT EXISTS wallet_ids
+                     (id {id_type},
+                      wallet_address TEXT UNIQUE NOT NULL)''')
+        
+        # Swipes table (one row per swiper/target pair, clustered on that key in SQLite)
+        without_rowid = "" if self.use_postgres else " WITHOUT ROWID"
+        cursor.execute(f'''CREATE TABLE IF NOT EXISTS swipes
+                     (swiper_id INTEGER NOT NULL,
+                      target_id INTEGER NOT NULL,
+                      direction TEXT NOT NULL,
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                      PRIMARY KEY (swiper_id, target_id)){without_rowid}''')
+        
+        # Matches table (user1_id < user2_id)
+        cursor.execute('''CREATE TABLE IF NOT EXISTS matches
+                     (id TEXT PRIMARY KEY,
+                      user1_id INTEGER NOT NULL,
+                      user2_id INTEGER NOT NULL,
+                      chat_room_id TEXT NOT NULL,
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+        
+        # Messages table (seq: per-room number in commit order for sync cursors - created_at is display only)
+        cursor.execute('''CREATE TABLE IF NOT EXISTS messages
+                     (id TEXT PRIMARY KEY,
+                      chat_room_id TEXT NOT NULL,
+                      sender_id INTEGER NOT NULL,
+                      message TEXT NOT NULL,
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                      client_id TEXT,
+                      seq BIGINT)''')
+        
+        # Chat read receipts (last message timestamp each participant has read)
+        cursor.execute('''CREATE TABLE IF NOT EXISTS chat_reads
+                     (chat_room_id TEXT NOT NULL,
+                      wallet_address TEXT NOT NULL,
+                      last_read_at TIMESTAMP,
+                      PRIMARY KEY (chat_room_id, wallet_address))''')
+        
+        # Databases still on wallet-string columns get their indexes from the wallet id migration
+        if 'target_id' in self.table_columns(cursor, 'swipes'):
+            self.create_relation_indexes(cursor)
+        
+        # Per-user swipe/match counters (maintained incrementally, rebuilt by reconciliation)
+        cursor.execute('''CREATE TABLE IF NOT EXISTS user_stats
+                     (wallet_address TEXT PRIMARY KEY,
+                      swipes_given INTEGER NOT NULL DEFAULT 0,
+                      likes_given INTEGER NOT NULL DEFAULT 0,
+                      likes_received INTEGER NOT NULL DEFAULT 0,
+                      matches INTEGER NOT NULL DEFAULT 0)''')
+        
+        # Archived left swipes: one compressed target id list per swiper (see swipe_archive.py)
+        blob_type = "BYTEA" if self.use_postgres else "BLOB"
+        cursor.execute(f'''CREATE TABLE IF NOT EXISTS swipe_archive
+                     (swiper_id INTEGER PRIMARY KEY,
+                      targets {blob_type} NOT NULL,
+                      target_count INTEGER NOT NULL,
+                      archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+        # Archived chat rooms: all messages of an inactive room in one compressed row (see chat_archive.py)
+        cursor.execute(f'''CREATE TABLE IF NOT EXISTS chat_archive
+                     (chat_room_id TEXT PRIMARY KEY,
+                      messages {blob_type} NOT NULL,
+                      message_count INTEGER NOT NULL,
+                      last_sender_id INTEGER,
+                      last_message TEXT,
+                      last_message_at TIMESTAMP,
+                      user1_unread INTEGER NOT NULL DEFAULT 0,
+                      user2_unread INTEGER NOT NULL DEFAULT 0,
+                      archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+        # Hottest Nansen cache entries, saved on shutdown for the startup warm-up (NANSEN_CACHE_WARMUP)
+        # fetched_at is unix epoch seconds, data is the cached JSON
+        cursor.execute('''CREATE TABLE IF NOT EXISTS nansen_cache_snapshot
+                     (wallet_address TEXT NOT NULL,
+                      data_type TEXT NOT NULL,
+                      data TEXT NOT NULL,
+                      fetched_at DOUBLE PRECISION NOT NULL,
+                      hits INTEGER NOT NULL DEFAULT 0,
+                      PRIMARY KEY (wallet_address, data_type))''')
+        
+        # Signed auth messages already exchanged for a session (see signature_cache.py)
+        # expires_at is unix epoch seconds - after it the message is refused as too old anyway
+        cursor.execute('''CREATE TABLE IF NOT EXISTS used_signatures
+                     (wallet_address TEXT NOT NULL,
+                      signature TEXT NOT NULL,
+                      expires_at BIGINT NOT NULL,
+                      PRIMARY KEY (wallet_address, signature))''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_used_signatures_expires ON used_signatures (expires_at)")
+        
+        # Wallet eligibility table (real users need Nansen PnL or balance data to be shown)
+        # checked_at / recheck_at are unix epoch seconds
+        cursor.execute('''CREATE TABLE IF NOT EXISTS wallet_eligibility
+                     (wallet_address TEXT PRIMARY KEY,
+                      eligible INTEGER NOT NULL,
+                      checked_at BIGINT NOT NULL,
+                      recheck_at BIGINT NOT NULL)''')
+    
+    def table_columns(self, cursor, table: str) -> List[str]:
+        """Column names of a table"""
+        if self.use_postgres:
+            cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (table,))
+        else:
+            cursor.execute(f"PRAGMA table_info({table})")
+        return [row[0] if self.use_postgres else row[1] for row in cursor.fetchall()]
+    
+    def create_relation_indexes(self, cursor):
+        """Indexes on the wallet id columns of swipes, matches and messages"""
+        # One match per wallet pair, plus per-wallet lookups for the matches list
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_matches_pair ON matches (user1_id, user2_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_matches_user1 ON matches (user1_id, created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_matches_user2 ON matches (user2_id, created_at)")
+        # Room -> participants lookups (chat membership cache misses)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_matches_room ON matches (chat_room_id)")
+        # Last message / unread counts per room
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_room_created ON messages (chat_room_id, created_at)")
+        message_columns = self.table_columns(cursor, 'messages')
+        # Retried WebSocket sends (same sender + client message id) map to the stored message
+        if 'client_id' in message_columns:
+            cursor.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_sender_client
+                              ON messages (sender_id, client_id) WHERE client_id IS NOT NULL""")
+        # Sync cursors and message lists (per-room sequence numbers)
+        if 'seq' in message_columns:
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_room_seq ON messages (chat_room_id, seq)")
+        # Reverse swipe index for the "liked you" inbox
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_swipes_target_direction_created ON swipes (target_id, direction, created_at)")
 
 
 # Global database instance
@@ -0,0 +1,66 @@
+"""
+Fast JSON helpers - orjson encoding and splicing of pre-encoded fragments
+Profile cards are encoded to bytes once and reused across feed responses
+"""
+
+from typing import Iterable
+
+import orjson
+from fastapi.responses import Response
+
+
+def dumps(payload) -> bytes:
+    """Encode a payload with orjson (unknown types fall back to str)"""
+    return orjson.dumps(payload, default=str)
+
+
+def splice_list(key: str, fragments: Iterable[bytes]) -> bytes:
+    """Build {"key": [<fragment>, ...]} from already-encoded JSON fragments"""
+    return b'{"' + key.encode("utf-8") + b'":[' + b",".join(fragments) + b"]}"
+
+
+class PreEncodedJSONResponse(Response):
+    """Response for bodies that are already JSON bytes (skips jsonable_encoder + re-encoding)"""
+    media_type = "application/json"
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: python fast_json.py [cards_per_page]
+    import json
+    import sys
+    import time
+
+    from fastapi.encoders import jsonable_encoder
+
+    cards_per_page = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    card = {
+        "wallet_address": "ERjMXMF6AVnMckiQb6zvTEcaCVc7iBpNqmtbNVjeKCpc",
+        "pnl_summary": {"total_pnl": 48211.5, "total_pnl_formatted": "$48.2k", "pnl_percentage": 71.2,
+                        "win_rate": 64, "total_trades": 412, "traded_token_count": 88, "time_period": "90D"},
+        "balance": {"total_balance_usd": 90211.33, "total_balance_formatted": "$90.2k", "sol_balance": 311.2,
+                    "sol_balance_formatted": "311.2 SOL", "token_count": 12,
+                    "tokens": [{"token_symbol": "SOL", "token_amount": 311.2, "value_usd": 52000.1}] * 5},
+        "is_demo": True,
+        "trader_number": 1, "trader_number_formatted": "#001",
+        "bio": "degen since '21. made 420% on BONK before it was cool\n\nonly trade in crocs btw 💀",
+        "country": "US", "favourite_ct_account": "@cobie", "worst_ct_account": None,
+        "favourite_trading_venue": "Pumpfun", "asset_choice_6m": "BONK & memecoins", "twitter_account": None
+    }
+    page = {"profiles": [dict(card) for _ in range(cards_per_page)]}
+    fragments = [dumps(c) for c in page["profiles"]]
+    iterations = 20000
+
+    def bench(label, fn):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        per_page_us = (time.perf_counter() - start) / iterations * 1e6
+        print(f"{label:<40} {per_page_us:8.1f} µs/page")
+        return per_page_us
+
+    print(f"Encoding a feed page of {cards_per_page} cards ({iterations} iterations)")
+    baseline = bench("jsonable_encoder + json.dumps (before)",
+                     lambda: json.dumps(jsonable_encoder(page)).encode("utf-8"))
+    bench("orjson.dumps", lambda: dumps(page))
+    spliced = bench("splice pre-encoded fragments (after)", lambda: splice_list("profiles", fragments))
+    print(f"Speedup: {baseline / spliced:.0f}x")
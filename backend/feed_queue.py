@@ -0,0 +1,162 @@
+"""
+Per-user feed queues - materialized swipe deck candidates
+Each viewer's unseen candidate list is built once from the database and then
+maintained incrementally (swipes remove targets, new signups are enqueued)
+"""
+
+import os
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Set
+
+# Maximum number of viewers with a materialized queue (least recently used are dropped)
+FEED_QUEUE_MAX_USERS = int(os.getenv("FEED_QUEUE_MAX_USERS", "10000"))
+
+
+class FeedQueue:
+    """Ordered candidate wallets for a single viewer"""
+
+    def __init__(self, wallets: List[str]):
+        self.order: Deque[str] = deque(wallets)
+        self.members: Set[str] = set(wallets)
+
+    def peek(self, count: int) -> List[str]:
+        """Return the next `count` candidates without recomputing anything"""
+        # Drop stale entries (already swiped) sitting at the head of the queue
+        while self.order and self.order[0] not in self.members:
+            self.order.popleft()
+
+        result = []
+        seen = set()
+        for wallet in self.order:
+            if len(result) >= count:
+                break
+            if wallet in self.members and wallet not in seen:
+                result.append(wallet)
+                seen.add(wallet)
+        return result
+
+    def __iter__(self) -> Iterator[str]:
+        """Candidates in deck order (remove() is safe while iterating - compaction swaps in a new deque)"""
+        seen = set()
+        for wallet in self.order:
+            if wallet in self.members and wallet not in seen:
+                seen.add(wallet)
+                yield wallet
+
+    def remove(self, wallet: str) -> bool:
+        """Remove a candidate (lazy - the deque entry is skipped until compaction)"""
+        if wallet not in self.members:
+            return False
+        self.members.discard(wallet)
+        if len(self.order) > 2 * len(self.members) + 16:
+            self.order = deque(w for w in self.order if w in self.members)
+        return True
+
+    def push_front(self, wallet: str) -> bool:
+        """Enqueue a candidate at the front of the deck (newest users first)"""
+        if wallet in self.members:
+            return False
+        self.members.add(wallet)
+        self.order.appendleft(wallet)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+
+class FeedQueueManager:
+    """In-memory per-viewer feed queues with lazy rebuild and consistency checks"""
+
+    def __init__(self, build_candidates: Callable[[str], List[str]], max_users: int = FEED_QUEUE_MAX_USERS):
+        self.build_candidates = build_candidates
+        self.max_users = max_users
+        self.queues: "OrderedDict[str, FeedQueue]" = OrderedDict()
+
+    def rebuild(self, viewer: str) -> FeedQueue:
+        """Rebuild a viewer's queue from the database (used on first access and after restarts)"""
+        queue = FeedQueue(self.build_candidates(viewer))
+        self.queues[viewer] = queue
+        self.queues.move_to_end(viewer)
+        while len(self.queues) > self.max_users:
+            self.queues.popitem(last=False)
+        print(f"🧱 Feed queue built for {viewer[:8]}... ({len(queue)} candidates)")
+        return queue
+
+    def _get(self, viewer: str) -> FeedQueue:
+        queue = self.queues.get(viewer)
+        if queue is None:
+            return self.rebuild(viewer)
+        self.queues.move_to_end(viewer)
+        return queue
+
+    def peek(self, viewer: str, count: int) -> List[str]:
+        """Serve the next page of candidates for a viewer"""
+        return self._get(viewer).peek(count)
+
+    def candidates(self, viewer: str) -> Iterator[str]:
+        """Walk a viewer's whole queue in deck order (for callers that skip some candidates)"""
+        return iter(self._get(viewer))
+
+    def remove(self, viewer: str, target: str):
+        """Drop a swiped target from the viewer's queue (no-op if the queue isn't built yet)"""
+        queue = self.queues.get(viewer)
+        if queue is not None:
+            queue.remove(target)
+
+    def remove_everywhere(self, target: str) -> int:
+        """Drop a wallet from every materialized queue (e.g. it became ineligible)"""
+        removed = sum(1 for queue in self.queues.values() if queue.remove(target))
+        if removed:
+            print(f"📤 Removed {target[:8]}... from {removed} feed queue(s)")
+        return removed
+
+    def enqueue_new_user(self, wallet: str) -> int:
+        """Add a newly signed-up wallet to every existing viewer's queue"""
+        added = 0
+        for viewer, queue in self.queues.items():
+            if viewer != wallet and queue.push_front(wallet):
+                added += 1
+        if added:
+            print(f"📥 Enqueued new user {wallet[:8]}... into {added} feed queue(s)")
+        return added
+
+    def invalidate(self, viewer: Optional[str] = None):
+        """Forget one viewer's queue (or all of them); they are rebuilt on next access"""
+        if viewer is None:
+            self.queues.clear()
+        else:
+            self.queues.pop(viewer, None)
+
+    def check_consistency(self, viewer: str, repair: bool = False) -> Dict:
+        """Compare a viewer's queue against a fresh recomputation from the database"""
+        expected = set(self.build_candidates(viewer))
+        queue = self.queues.get(viewer)
+        actual = set(queue.members) if queue is not None else set()
+
+        missing = sorted(expected - actual)
+        extra = sorted(actual - expected)
+        consistent = queue is None or (not missing and not extra)
+
+        if not consistent:
+            print(f"⚠️ Feed queue drift for {viewer[:8]}...: {len(missing)} missing, {len(extra)} extra")
+            if repair:
+                self.rebuild(viewer)
+
+        return {
+            "wallet_address": viewer,
+            "materialized": queue is not None,
+            "consistent": consistent,
+            "queue_size": len(actual),
+            "expected_size": len(expected),
+            "missing": missing,
+            "extra": extra,
+            "repaired": repair and not consistent
+        }
+
+    def stats(self) -> Dict:
+        """Summary of materialized queues"""
+        return {
+            "queues": len(self.queues),
+            "max_queues": self.max_users,
+            "total_candidates": sum(len(q) for q in self.queues.values())
+        }
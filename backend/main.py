@@ -1,25 +1,48 @@
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Depends, Header
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Depends, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, validator
-from typing import List, Optional, Dict
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from pydantic import BaseModel, ValidationError, validator
+from typing import List, Optional, Dict, Set, Tuple
 import json
-import requests
-import httpx
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import uuid
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from contextlib import contextmanager, asynccontextmanager
 import os
 import time
-from database import db
+from database import db, SCHEMA_VERSION
+from feed_queue import FeedQueueManager
+from ranking import CandidateRanker
+from profile_cache import ProfileCardCache, format_http_date, is_not_modified
+from fast_json import dumps as fast_dumps, splice_list, PreEncodedJSONResponse
+from swipe_buffer import SwipeWriteBehind
+from wallet_ids import WalletIdMap
+from ws_fanout import ConnectionManager
+from chat_backplane import create_backplane
+from message_writer import MessageGroupCommit
+from chat_rooms import ChatRoomCache
+from message_search import MessageSearch
+from chat_archive import ChatArchive, CHAT_ARCHIVE_AFTER_DAYS, CHAT_ARCHIVE_INTERVAL_SECONDS
+from swipe_archive import SwipeArchive, SWIPE_ARCHIVE_AFTER_DAYS, SWIPE_ARCHIVE_INTERVAL_SECONDS
+from swipe_archive import encode_targets as encode_archive_targets
+from signature_cache import SignatureVerifier, SIGNATURE_MAX_AGE_SECONDS
+from cpu_pool import CpuPool, MicroBatcher
+from metrics import Registry, RequestMetricsMiddleware, LoopLagMonitor
 import re
-import base58
-from nacl.signing import VerifyKey
-from nacl.exceptions import BadSignatureError
 import jwt
 import secrets
+import base64
+import zlib
 
-app = FastAPI(title="Smart Money Tinder API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown (nothing touches the database at import time)"""
+    await start_app()
+    yield
+    await stop_app()
+
+app = FastAPI(title="Smart Money Tinder API", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # CORS middleware - Allow all origins for demo/hackathon
 app.add_middleware(
@@ -30,6 +53,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus metrics (GET /metrics, see metrics.py) - recorded on the hot paths, gauges read at scrape time
+metrics = Registry()
+http_request_seconds = metrics.histogram("http_request_duration_seconds", "HTTP request latency by route template",
+                                         ("method", "route", "status"))
+db_query_seconds = metrics.histogram("db_query_duration_seconds", "Database connect, execute_* and cursor statement latency", ("op",))
+nansen_request_seconds = metrics.histogram("nansen_request_duration_seconds", "Nansen API call latency",
+                                           ("endpoint", "status"))
+nansen_rate_limit_wait_seconds = metrics.histogram("nansen_rate_limit_wait_seconds",
+                                                   "Time Nansen calls waited for the rate limiter")
+nansen_cache_requests = metrics.counter("nansen_cache_requests_total", "Nansen cache lookups",
+                                        ("data_type", "result"))
+nansen_cache_evictions = metrics.counter("nansen_cache_evictions_total", "Nansen cache entries removed",
+                                         ("data_type", "reason"))
+event_loop_lag_seconds = metrics.histogram("event_loop_lag_seconds", "How late the event loop ran a scheduled wake-up")
+loop_lag = LoopLagMonitor(event_loop_lag_seconds)
+db.observer = lambda op, seconds: db_query_seconds.observe(seconds, op)
+app.add_middleware(RequestMetricsMiddleware, histogram=http_request_seconds)
+
 # Authentication configuration
 REQUIRE_AUTH = os.getenv("REQUIRE_AUTH", "false").lower() == "true"
 REQUIRE_SIGNATURE = os.getenv("REQUIRE_SIGNATURE", "false").lower() == "true"
@@ -48,36 +89,33 @@ else:
 
 print(f"🎫 Session tokens enabled - Valid for {SESSION_EXPIRY_HOURS} hour(s)")
 
-def verify_solana_signature(wallet_address: str, message: str, signature: str) -> bool:
+# Verified signatures + decoded keys cached per worker, used ones recorded in the database (see signature_cache.py)
+signature_verifier = SignatureVerifier(db)
+if REQUIRE_SIGNATURE and SIGNATURE_MAX_AGE_SECONDS:
+    print(f"✍️  Signed auth messages accepted for {SIGNATURE_MAX_AGE_SECONDS}s after their timestamp")
+
+# ed25519 checks run on a small thread pool, batched during login bursts (see cpu_pool.py)
+cpu_pool = CpuPool()
+signature_checks = MicroBatcher(cpu_pool, "signature",
+                                lambda entries: [signature_verifier.verify(*entry) for entry in entries])
+
+async def verify_solana_signature(wallet_address: str, message: str, signature: str) -> bool:
     """
     Verify a Solana wallet signature using ed25519
     
     Args:
         wallet_address: Base58-encoded public key (Solana wallet address)
-        message: The message that was signed
+        message: The message that was signed (must carry a timestamp less than
+            SIGNATURE_MAX_AGE_SECONDS old)
         signature: Base58-encoded signature
     
     Returns:
-        True if signature is valid, False otherwise
+        True if signature is valid, False otherwise (repeat checks of the same
+        signed message are a cache lookup on the event loop; new ones go to the pool)
     """
-    try:
-        # Decode the public key (wallet address) from base58
-        public_key_bytes = base58.b58decode(wallet_address)
-        
-        # Create a VerifyKey from the public key
-        verify_key = VerifyKey(public_key_bytes)
-        
-        # Decode the signature from base58
-        signature_bytes = base58.b58decode(signature)
-        
-        # Verify the signature
-        # Solana signatures are 64 bytes: first 64 bytes are the signature
-        verify_key.verify(message.encode('utf-8'), signature_bytes)
-        
+    if signature_verifier.cached(wallet_address, message, signature):
         return True
-    except (BadSignatureError, ValueError, Exception) as e:
-        print(f"❌ Signature verification failed: {type(e).__name__}: {str(e)}")
-        return False
+    return await signature_checks.submit((wallet_address, message, signature))
 
 def create_session_token(wallet_address: str) -> str:
     """
@@ -98,6 +136,11 @@ def create_session_token(wallet_address: str) -> str:
     token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return token
 
+# Decoded session tokens: token -> (wallet, exp). Clients send the same token for an hour,
+# so only its first request per worker pays for the JWT decode
+session_token_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+SESSION_TOKEN_CACHE_MAX_ENTRIES = 10000
+
 def verify_session_token(token: str) -> Optional[str]:
     """
     Verify a JWT session token and return the wallet address
@@ -108,8 +151,15 @@ def verify_session_token(token: str) -> Optional[str]:
     Returns:
         Wallet address if valid, None otherwise
     """
+    cached = session_token_cache.get(token)
+    if cached and cached[1] > time.time():
+        return cached[0]
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        if payload.get("wallet"):
+            session_token_cache[token] = (payload["wallet"], payload["exp"])
+            while len(session_token_cache) > SESSION_TOKEN_CACHE_MAX_ENTRIES:
+                session_token_cache.popitem(last=False)
         return payload.get("wallet")
     except jwt.ExpiredSignatureError:
         print("⏰ Session token expired")
@@ -164,16 +214,24 @@ async def get_authenticated_wallet(
             )
         
         # Verify the signature
-        if not verify_solana_signature(x_wallet_address, x_signature_message, x_wallet_signature):
+        if not await verify_solana_signature(x_wallet_address, x_signature_message, x_wallet_signature):
             raise HTTPException(
                 status_code=401,
-                detail="Invalid signature. Signature verification failed"
+                detail="Invalid or expired signature. Signature verification failed"
             )
-        
-        print(f"✅ Signature verified for wallet: {x_wallet_address[:8]}...")
     
     return x_wallet_address
 
+# Maintenance endpoints (archival, stats rebuild, ...) need X-Admin-Token; they are disabled while ADMIN_TOKEN is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency for maintenance endpoints"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled. Set ADMIN_TOKEN to enable them")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token")
+
 def verify_wallet_ownership(wallet_address: str, authenticated_wallet: Optional[str]):
     """Verify that authenticated wallet matches the requested wallet"""
     if REQUIRE_AUTH:
@@ -188,8 +246,12 @@ def verify_wallet_ownership(wallet_address: str, authenticated_wallet: Optional[
     elif authenticated_wallet and wallet_address != authenticated_wallet:
         print(f"⚠️  WARNING: Wallet mismatch in dev mode - {authenticated_wallet} accessing {wallet_address}")
 
-# Database setup
-db.init_db()
+# Wallet address <-> dense integer id (swipes, matches and messages store ids); loaded after migrations
+wallet_ids = WalletIdMap(db)
+
+# Full-text search over chat messages (index built by run_migrations or, on a Postgres database
+# with messages, the one-off migration in message_search.py)
+message_search = MessageSearch(db)
 
 # In-memory cache for Nansen API responses
 # Structure: { wallet_address: { 'pnl': {'data': {...}, 'timestamp': 123}, 'balance': {'data': {...}, 'timestamp': 456} } }
@@ -199,6 +261,15 @@ nansen_cache = {}
 CACHE_TTL_PNL_SECONDS = 604800  # 1 week (PnL doesn't change much)
 CACHE_TTL_BALANCE_SECONDS = 1800  # 30 minutes (balance changes more frequently)
 
+# Persisted eligibility verdicts for real users (no Nansen PnL/balance = not shown)
+# Structure: { wallet_address: {'eligible': bool, 'recheck_at': epoch_seconds} } - mirrors wallet_eligibility table
+wallet_eligibility = {}
+ELIGIBILITY_RECHECK_ELIGIBLE_SECONDS = CACHE_TTL_PNL_SECONDS  # Re-check with the PnL refresh
+ELIGIBILITY_RECHECK_INELIGIBLE_SECONDS = 86400  # Give empty wallets another chance daily
+
+# Columnar feature store used to rank the swipe deck (fed from the Nansen cache + profiles)
+candidate_ranker = CandidateRanker()
+
 # Rate limiting for Nansen API
 rate_limiter = {
     'requests': [],  # List of request timestamps
@@ -208,7 +279,7 @@ rate_limiter = {
 
 async def wait_for_rate_limit():
     """Rate limiter to ensure we don't exceed 10 req/sec or 250 req/min"""
-    current_time = time.time()
+    current_time = started = time.time()
     
     # Clean up old timestamps (older than 60 seconds)
     rate_limiter['requests'] = [
@@ -242,10 +313,28 @@ async def wait_for_rate_limit():
     
     # Record this request
     rate_limiter['requests'].append(time.time())
+    nansen_rate_limit_wait_seconds.observe(rate_limiter['requests'][-1] - started)
+
+async def nansen_post(client, endpoint: str, api_key: str, payload: dict):
+    """POST to a Nansen profiler endpoint (latency and status recorded per endpoint)"""
+    start = time.perf_counter()
+    status = "error"  # Timeouts / connection errors
+    try:
+        response = await client.post(
+            f"https://api.nansen.ai/api/v1/profiler/address/{endpoint}",
+            headers={"apiKey": api_key, "Content-Type": "application/json"},
+            json=payload,
+            timeout=10
+        )
+        status = response.status_code
+        return response
+    finally:
+        nansen_request_seconds.observe(time.perf_counter() - start, endpoint, status)
 
 def get_cached_data(wallet_address: str, data_type: str):
     """Get cached Nansen data if not expired"""
     if wallet_address not in nansen_cache:
+        nansen_cache_requests.inc(data_type, "miss")
         return None
     
     cache_entry = nansen_cache[wallet_address].get(data_type, {})
@@ -255,19 +344,110 @@ def get_cached_data(wallet_address: str, data_type: str):
     
     # Check if cache expired
     if time.time() - cache_entry.get('timestamp', 0) > ttl:
+        nansen_cache_requests.inc(data_type, "expired" if cache_entry else "miss")
         return None
     
+    nansen_cache_requests.inc(data_type, "hit")
+    # Hit count decides which entries survive a restart (NANSEN_CACHE_WARMUP)
+    cache_entry['hits'] = cache_entry.get('hits', 0) + 1
     return cache_entry.get('data')
 
-def set_cached_data(wallet_address: str, data_type: str, data: dict):
+def set_cached_data(wallet_address: str, data_type: str, data: dict, fetched_at: Optional[float] = None):
     """Cache Nansen API response with separate timestamps per data type"""
     if wallet_address not in nansen_cache:
         nansen_cache[wallet_address] = {}
     
     nansen_cache[wallet_address][data_type] = {
         'data': data,
-        'timestamp': time.time()
+        'timestamp': fetched_at or time.time()
     }
+    
+    # Keep ranking features in sync with cached Nansen data
+    if data_type == 'pnl':
+        candidate_ranker.update_pnl(wallet_address, data)
+    elif data_type == 'balance':
+        candidate_ranker.update_balance(wallet_address, data)
+
+# Optional warm-up across restarts: the most-hit Nansen entries are saved on shutdown and
+# loaded on startup (keeping their original fetch time, so TTLs still apply)
+NANSEN_CACHE_WARMUP = os.getenv("NANSEN_CACHE_WARMUP", "false").lower() == "true"
+NANSEN_WARMUP_MAX_ENTRIES = int(os.getenv("NANSEN_WARMUP_MAX_ENTRIES", "2000"))
+
+def save_nansen_snapshot():
+    """Persist the hottest unexpired Nansen cache entries for the next startup"""
+    now = time.time()
+    entries = []
+    for wallet, cache_data in nansen_cache.items():
+        for data_type, entry in cache_data.items():
+            ttl = CACHE_TTL_PNL_SECONDS if data_type == 'pnl' else CACHE_TTL_BALANCE_SECONDS
+            if now - entry['timestamp'] <= ttl:
+                entries.append((wallet, data_type, fast_dumps(entry['data']).decode("utf-8"),
+                                entry['timestamp'], entry.get('hits', 0)))
+    entries.sort(key=lambda entry: entry[4], reverse=True)
+    entries = entries[:NANSEN_WARMUP_MAX_ENTRIES]
+    
+    ph = db.placeholder()
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM nansen_cache_snapshot")
+        cursor.executemany(f"""INSERT INTO nansen_cache_snapshot (wallet_address, data_type, data, fetched_at, hits)
+                               VALUES ({ph}, {ph}, {ph}, {ph}, {ph})""", entries)
+        conn.commit()
+    print(f"💾 Saved {len(entries)} Nansen cache entries for the next warm-up")
+
+def load_nansen_snapshot():
+    """Preload the Nansen cache (and ranking features) from the last shutdown's snapshot"""
+    ph = db.placeholder()
+    rows = db.execute_query(f"""SELECT wallet_address, data_type, data, fetched_at FROM nansen_cache_snapshot
+                                ORDER BY hits DESC LIMIT {ph}""", (NANSEN_WARMUP_MAX_ENTRIES,))
+    now = time.time()
+    loaded = 0
+    for row in rows:
+        ttl = CACHE_TTL_PNL_SECONDS if row['data_type'] == 'pnl' else CACHE_TTL_BALANCE_SECONDS
+        if now - row['fetched_at'] > ttl:
+            continue
+        set_cached_data(row['wallet_address'], row['data_type'], json.loads(row['data']), fetched_at=row['fetched_at'])
+        loaded += 1
+    print(f"🔥 Nansen cache warmed: {loaded} entries ({len(rows) - loaded} expired)")
+
+def load_wallet_eligibility():
+    """Load stored eligibility verdicts into memory"""
+    rows = db.execute_query("SELECT wallet_address, eligible, recheck_at FROM wallet_eligibility")
+    for row in rows:
+        wallet_eligibility[row['wallet_address']] = {
+            'eligible': bool(row['eligible']),
+            'recheck_at': row['recheck_at']
+        }
+    print(f"🏷️ Loaded {len(rows)} wallet eligibility flags")
+
+def get_eligibility_status(wallet_address: str) -> Optional[bool]:
+    """Stored eligibility verdict, or None if unknown / due for a re-check"""
+    entry = wallet_eligibility.get(wallet_address)
+    if entry is None or time.time() >= entry['recheck_at']:
+        return None
+    return entry['eligible']
+
+def record_eligibility(wallet_address: str, eligible: bool):
+    """Persist an eligibility verdict with its re-check schedule (skips unchanged fresh verdicts)"""
+    if get_eligibility_status(wallet_address) == eligible:
+        return
+    
+    now = int(time.time())
+    delay = ELIGIBILITY_RECHECK_ELIGIBLE_SECONDS if eligible else ELIGIBILITY_RECHECK_INELIGIBLE_SECONDS
+    recheck_at = now + delay
+    
+    ph = db.placeholder()
+    db.execute_write(f"""INSERT INTO wallet_eligibility (wallet_address, eligible, checked_at, recheck_at)
+                         VALUES ({ph}, {ph}, {ph}, {ph})
+                         ON CONFLICT (wallet_address) DO UPDATE
+                         SET eligible = excluded.eligible, checked_at = excluded.checked_at, 
+                             recheck_at = excluded.recheck_at""",
+                     (wallet_address, 1 if eligible else 0, now, recheck_at))
+    
+    wallet_eligibility[wallet_address] = {'eligible': eligible, 'recheck_at': recheck_at}
+    if not eligible:
+        feed_queues.remove_everywhere(wallet_address)
+    print(f"🏷️ {wallet_address[:8]}... marked {'eligible' if eligible else 'ineligible'}")
 
 def clear_expired_cache():
     """Periodic cleanup of expired cache entries"""
@@ -287,7 +467,8 @@ def clear_expired_cache():
             wallets_to_remove.append(wallet)
     
     for wallet in wallets_to_remove:
-        del nansen_cache[wallet]
+        for data_type in nansen_cache.pop(wallet):
+            nansen_cache_evictions.inc(data_type, "expired")
     
     if wallets_to_remove:
         print(f"🧹 Cleared {len(wallets_to_remove)} fully expired cache entries")
@@ -396,12 +577,139 @@ DEMO_TRADERS_DATA = [
 ]
 
 # Auto-seed demo traders on startup if database is empty
-def run_migrations():
-    """Run database migrations automatically on startup"""
+def index_exists(cursor, index_name: str) -> bool:
+    """Check whether an index exists (works for SQLite and PostgreSQL)"""
+    if db.use_postgres:
+        cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", (index_name,))
+    else:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,))
+    return cursor.fetchone() is not None
+
+def migrate_unique_swipes(cursor):
+    """Collapse duplicate swipes (keep the latest per user/target) and enforce uniqueness"""
+    cursor.execute("""DELETE FROM swipes WHERE id IN (
+                          SELECT id FROM (
+                              SELECT id, ROW_NUMBER() OVER (
+                                  PARTITION BY user_id, target_wallet 
+                                  ORDER BY created_at DESC, id DESC) AS rn 
+                              FROM swipes) ranked 
+                          WHERE rn > 1)""")
+    print(f"   🧹 Removed {cursor.rowcount} duplicate swipes")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_swipes_user_target ON swipes (user_id, target_wallet)")
+
+def migrate_unique_matches(cursor):
+    """Store match pairs in canonical order, merge duplicate matches and enforce uniqueness"""
+    ph = db.placeholder()
+    cursor.execute("SELECT id, user1_wallet, user2_wallet, chat_room_id FROM matches ORDER BY created_at, id")
+    kept = {}
+    removed = 0
+    for row in cursor.fetchall():
+        match_id, wallet1, wallet2, chat_room_id = row[0], row[1], row[2], row[3]
+        pair = tuple(sorted((wallet1, wallet2)))
+        if pair in kept:
+            # Duplicate match: move its messages into the oldest room for this pair
+            cursor.execute(f"UPDATE messages SET chat_room_id = {ph} WHERE chat_room_id = {ph}",
+                           (kept[pair], chat_room_id))
+            cursor.execute(f"DELETE FROM matches WHERE id = {ph}", (match_id,))
+            removed += 1
+            continue
+        kept[pair] = chat_room_id
+        if (wallet1, wallet2) != pair:
+            cursor.execute(f"UPDATE matches SET user1_wallet = {ph}, user2_wallet = {ph} WHERE id = {ph}",
+                           (pair[0], pair[1], match_id))
+    print(f"   🧹 Merged {removed} duplicate matches")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_matches_pair ON matches (user1_wallet, user2_wallet)")
+
+def migrate_dense_wallet_ids(cursor):
+    """Rewrite swipes, matches and messages from wallet strings / user UUIDs to dense wallet ids"""
+    # Intern every wallet referenced anywhere
+    cursor.execute("""INSERT INTO wallet_ids (wallet_address)
+                      SELECT wallet_address FROM (
+                          SELECT wallet_address FROM users
+                          UNION SELECT target_wallet FROM swipes
+                          UNION SELECT user1_wallet FROM matches
+                          UNION SELECT user2_wallet FROM matches
+                          UNION SELECT sender_wallet FROM messages
+                      ) w
+                      WHERE wallet_address IS NOT NULL
+                      ON CONFLICT (wallet_address) DO NOTHING""")
+    
+    # Move the old tables aside (index names are global, so drop the old indexes first)
+    for index_name in ('idx_swipes_user_target', 'idx_swipes_target_direction_created', 'idx_matches_pair',
+                       'idx_matches_user1', 'idx_matches_user2', 'idx_messages_room_created'):
+        cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+    legacy_archive = 'user_id' in db.table_columns(cursor, 'swipe_archive')
+    for table in ('swipes', 'matches', 'messages') + (('swipe_archive',) if legacy_archive else ()):
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+    db.create_tables(cursor)
+    
+    cursor.execute("""INSERT INTO swipes (swiper_id, target_id, direction, created_at)
+                      SELECT ws.id, wt.id, s.direction, s.created_at FROM swipes_legacy s
+                      JOIN users u ON u.id = s.user_id
+                      JOIN wallet_ids ws ON ws.wallet_address = u.wallet_address
+                      JOIN wallet_ids wt ON wt.wallet_address = s.target_wallet""")
+    print(f"   🔢 Rewrote {cursor.rowcount} swipes")
+    # Pairs are canonical by id now (user1_id < user2_id)
+    cursor.execute("""INSERT INTO matches (id, user1_id, user2_id, chat_room_id, created_at)
+                      SELECT m.id, CASE WHEN w1.id < w2.id THEN w1.id ELSE w2.id END,
+                             CASE WHEN w1.id < w2.id THEN w2.id ELSE w1.id END, m.chat_room_id, m.created_at
+                      FROM matches_legacy m
+                      JOIN wallet_ids w1 ON w1.wallet_address = m.user1_wallet
+                      JOIN wallet_ids w2 ON w2.wallet_address = m.user2_wallet""")
+    print(f"   🔢 Rewrote {cursor.rowcount} matches")
+    cursor.execute("""INSERT INTO messages (id, chat_room_id, sender_id, message, created_at)
+                      SELECT m.id, m.chat_room_id, w.id, m.message, m.created_at FROM messages_legacy m
+                      JOIN wallet_ids w ON w.wallet_address = m.sender_wallet""")
+    print(f"   🔢 Rewrote {cursor.rowcount} messages")
+    
+    if legacy_archive:
+        # Archived target lists were newline-joined wallet strings keyed by user UUID
+        ph = db.placeholder()
+        cursor.execute("""SELECT w.id, a.targets FROM swipe_archive_legacy a
+                          JOIN users u ON u.id = a.user_id
+                          JOIN wallet_ids w ON w.wallet_address = u.wallet_address""")
+        for swiper_id, blob in cursor.fetchall():
+            targets = zlib.decompress(bytes(blob)).decode("utf-8").split("\n")
+            target_ids = wallet_ids.get_ids([t for t in targets if t], cursor=cursor)
+            cursor.execute(f"INSERT INTO swipe_archive (swiper_id, targets, target_count) VALUES ({ph}, {ph}, {ph})",
+                           (swiper_id, encode_archive_targets(target_ids.values()), len(target_ids)))
+    
+    for table in ('swipes', 'matches', 'messages') + (('swipe_archive',) if legacy_archive else ()):
+        cursor.execute(f"DROP TABLE {table}_legacy")
+
+MESSAGE_SEQ_BACKFILL_ROOMS = 500  # Rooms numbered per transaction
+
+def backfill_message_seq(conn, cursor) -> int:
+    """Number messages without a seq per room in (created_at, id) order, committing every batch of rooms
+
+    A room's archived messages (older than its hot ones) keep the first numbers.
+    Returns the number of messages numbered.
+    """
+    ph = db.placeholder()
+    numbered = 0
+    while True:
+        cursor.execute(f"SELECT DISTINCT chat_room_id FROM messages WHERE seq IS NULL LIMIT {ph}",
+                       (MESSAGE_SEQ_BACKFILL_ROOMS,))
+        rooms = [row[0] for row in cursor.fetchall()]
+        if not rooms:
+            return numbered
+        cursor.execute(f"""UPDATE messages SET seq = numbered.seq FROM (
+                               SELECT m.id, COALESCE(a.message_count, 0) + ROW_NUMBER() OVER (
+                                          PARTITION BY m.chat_room_id ORDER BY m.created_at, m.id) AS seq
+                               FROM messages m LEFT JOIN chat_archive a ON a.chat_room_id = m.chat_room_id
+                               WHERE m.chat_room_id IN ({", ".join([ph] * len(rooms))})
+                           ) numbered
+                           WHERE messages.id = numbered.id""", tuple(rooms))
+        numbered += cursor.rowcount
+        conn.commit()
+
+def run_migrations() -> bool:
+    """Run database migrations automatically on startup; returns True if everything is in place"""
     with db.get_connection() as conn:
         try:
             print("🔄 Checking database migrations...")
             cursor = conn.cursor()
+            migrated = False
             
             # Check if twitter_account column exists
             if db.use_postgres:
@@ -420,21 +728,95 @@ def run_migrations():
                 cursor.execute("ALTER TABLE users ADD COLUMN twitter_account TEXT")
                 conn.commit()
                 print("   ✅ twitter_account column added!")
-            else:
+                migrated = True
+            
+            # Profile version for cache validators (ETag / Last-Modified agree across workers)
+            if 'updated_at' not in columns:
+                print("   📝 Adding updated_at column to users...")
+                cursor.execute("ALTER TABLE users ADD COLUMN updated_at DOUBLE PRECISION")
+                cursor.execute(f"UPDATE users SET updated_at = {db.placeholder()}", (time.time(),))
+                conn.commit()
+                print("   ✅ updated_at column added!")
+                migrated = True
+            
+            # Databases still keyed on wallet strings (before wallet ids)
+            legacy_relations = 'target_wallet' in db.table_columns(cursor, 'swipes')
+            
+            # One swipe row per (user, target) - swipes become upserts
+            if legacy_relations and not index_exists(cursor, 'idx_swipes_user_target'):
+                print("   📝 Adding unique (user_id, target_wallet) index on swipes...")
+                migrate_unique_swipes(cursor)
+                conn.commit()
+                print("   ✅ swipes deduplicated!")
+                migrated = True
+            
+            # One match per wallet pair (user1_wallet < user2_wallet)
+            if legacy_relations and not index_exists(cursor, 'idx_matches_pair'):
+                print("   📝 Adding unique wallet pair index on matches...")
+                migrate_unique_matches(cursor)
+                conn.commit()
+                print("   ✅ matches deduplicated!")
+                migrated = True
+            
+            # Wallet strings -> dense integer ids in swipes, matches and messages
+            if legacy_relations:
+                print("   📝 Rewriting swipes/matches/messages with dense wallet ids...")
+                if not db.use_postgres:
+                    conn.execute("BEGIN")  # DDL would otherwise run outside the transaction
+                migrate_dense_wallet_ids(cursor)
+                conn.commit()
+                print("   ✅ wallet ids migrated!")
+                migrated = True
+            
+            # Client message ids - retried WebSocket sends are deduplicated
+            if 'client_id' not in db.table_columns(cursor, 'messages'):
+                print("   📝 Adding client_id column to messages...")
+                cursor.execute("ALTER TABLE messages ADD COLUMN client_id TEXT")
+                db.create_relation_indexes(cursor)
+                conn.commit()
+                print("   ✅ client_id column added!")
+                migrated = True
+            
+            # Per-room sequence numbers in commit order - sync cursors page on these, not created_at
+            if 'seq' not in db.table_columns(cursor, 'messages'):
+                print("   📝 Adding seq column to messages...")
+                cursor.execute("ALTER TABLE messages ADD COLUMN seq BIGINT")
+                conn.commit()
+                migrated = True
+            if backfill_message_seq(conn, cursor):
+                db.create_relation_indexes(cursor)
+                conn.commit()
+                print("   ✅ message seq numbers backfilled!")
+                migrated = True
+            
+            # Full-text index over messages (FTS5 on SQLite, tsvector + GIN on Postgres)
+            try:
+                if message_search.ensure_index(cursor):
+                    conn.commit()
+                    print("   ✅ message search index built!")
+                    migrated = True
+            except Exception as e:
+                conn.rollback()
+                message_search.available = False
+                print(f"   ⚠️  Message search unavailable: {e}")
+                return False  # Retried next startup
+            
+            if not migrated:
                 print("   ✅ All migrations up to date")
+            return True
         except Exception as e:
             print(f"   ⚠️  Migration error: {e}")
+            return False
 
 def auto_seed_demo_traders():
     """Automatically seed demo traders with FULL profiles on startup if database has no users"""
     with db.get_connection() as conn:
         cursor = db.get_cursor(conn)
         
-        # Check if we have any users
-        cursor.execute("SELECT COUNT(*) FROM users")
-        user_count = cursor.fetchone()[0] if not db.use_postgres else cursor.fetchone()['count']
+        # Check if we have any users (no full COUNT - this runs on every cold start)
+        cursor.execute("SELECT 1 AS present FROM users LIMIT 1")
         
-        if user_count == 0:
+        if cursor.fetchone() is None:
             print("🌱 Database is empty! Auto-seeding demo traders with full profiles...")
             ph = db.placeholder()
             for idx, trader in enumerate(DEMO_TRADERS_DATA, start=1):
@@ -442,13 +824,14 @@ def auto_seed_demo_traders():
                     user_id = str(uuid.uuid4())
                     query = f"""INSERT INTO users 
                                 (id, wallet_address, trader_number, bio, country, favourite_ct_account,
-                                 worst_ct_account, favourite_trading_venue, asset_choice_6m, twitter_account, created_at)
-                                VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})"""
+                                 worst_ct_account, favourite_trading_venue, asset_choice_6m, twitter_account, created_at,
+                                 updated_at)
+                                VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})"""
                     cursor.execute(query,
                              (user_id, trader["address"], idx, trader["bio"], trader["country"],
                               trader["favourite_ct_account"], None,  # worst_ct_account is optional
                               trader["favourite_trading_venue"], trader["asset_choice_6m"],
-                              None, datetime.now().isoformat()))  # twitter_account is optional
+                              None, datetime.now().isoformat(), time.time()))  # twitter_account is optional
                     print(f"   ✅ Added Trader #{idx:03d}: {trader['address'][:8]}... ({trader['country']})")
                 except Exception as e:
                     print(f"   ⚠️  Skipped {trader['address'][:8]}...: {str(e)}")
@@ -456,33 +839,244 @@ def auto_seed_demo_traders():
             conn.commit()
             print(f"🎉 Auto-seed complete! Added {len(DEMO_TRADERS_DATA)} demo traders with full profiles")
         else:
-            print(f"✅ Database already has {user_count} users. Skipping auto-seed.")
+            print("✅ Database already has users. Skipping auto-seed.")
+
+# Per-user stats counters - updated in the same transaction as the swipe/match that changes them
+STATS_RECONCILE_INTERVAL_SECONDS = int(os.getenv("STATS_RECONCILE_INTERVAL_SECONDS", "0"))  # 0 = manual only
 
-# Run migrations and auto-seed on startup
-run_migrations()
-auto_seed_demo_traders()
+def swipe_stat_deltas(user_wallet: str, target_wallet: str, old_direction: Optional[str], new_direction: str):
+    """Counter changes caused by a swipe (old_direction is None for a first swipe)"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    if old_direction is None:
+        deltas[user_wallet]['swipes_given'] += 1
+    was_like = old_direction == 'right'
+    is_like = new_direction == 'right'
+    if was_like != is_like:
+        change = 1 if is_like else -1
+        deltas[user_wallet]['likes_given'] += change
+        deltas[target_wallet]['likes_received'] += change
+    return deltas
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = defaultdict(list)
+def apply_stat_deltas(cursor, deltas):
+    """Upsert counter deltas into user_stats"""
+    ph = db.placeholder()
+    for wallet, fields in deltas.items():
+        values = [fields.get(name, 0) for name in ('swipes_given', 'likes_given', 'likes_received', 'matches')]
+        if not any(values):
+            continue
+        cursor.execute(f"""INSERT INTO user_stats (wallet_address, swipes_given, likes_given, likes_received, matches)
+                           VALUES ({ph}, {ph}, {ph}, {ph}, {ph})
+                           ON CONFLICT (wallet_address) DO UPDATE SET
+                           swipes_given = user_stats.swipes_given + excluded.swipes_given,
+                           likes_given = user_stats.likes_given + excluded.likes_given,
+                           likes_received = user_stats.likes_received + excluded.likes_received,
+                           matches = user_stats.matches + excluded.matches""",
+                       (wallet, *values))
+
+def apply_buffered_swipe_stats(cursor, entries):
+    """Write-behind flush hook: derive counter changes from the rows about to be upserted"""
+    ph = db.placeholder()
+    deltas = defaultdict(lambda: defaultdict(int))
+    for entry in entries:
+        cursor.execute(f"SELECT direction FROM swipes WHERE swiper_id = {ph} AND target_id = {ph}",
+                       (entry['swiper_id'], entry['target_id']))
+        previous = cursor.fetchone()
+        old_direction = previous[0] if previous else None
+        if old_direction is None and swipe_archive.remove_target(cursor, entry['swiper_id'], entry['target_id']):
+            old_direction = 'left'
+        for wallet, fields in swipe_stat_deltas(entry['user_wallet'], entry['target_wallet'],
+                                                old_direction, entry['direction']).items():
+            for name, value in fields.items():
+                deltas[wallet][name] += value
+    apply_stat_deltas(cursor, deltas)
+
+def reconcile_user_stats() -> dict:
+    """Rebuild every counter from the raw swipes/matches tables and report drift"""
+    if swipe_buffer.enabled:
+        swipe_buffer.flush()
+    
+    start = time.time()
+    with db.get_connection() as conn:
+        cursor = db.get_cursor(conn)
+        cursor.execute("SELECT wallet_address, swipes_given, likes_given, likes_received, matches FROM user_stats")
+        before = {}
+        for row in cursor.fetchall():
+            row = dict(row)
+            before[row.pop('wallet_address')] = row
+        
+        cursor.execute("DELETE FROM user_stats")
+        cursor.execute("""INSERT INTO user_stats (wallet_address, swipes_given, likes_given, likes_received, matches)
+                          SELECT w.wallet_address, SUM(sg), SUM(lg), SUM(lr), SUM(m) FROM (
+                              SELECT swiper_id AS wallet_id, COUNT(*) AS sg,
+                                     SUM(CASE WHEN direction = 'right' THEN 1 ELSE 0 END) AS lg, 0 AS lr, 0 AS m
+                              FROM swipes GROUP BY swiper_id
+                              UNION ALL
+                              SELECT target_id, 0, 0, COUNT(*), 0 FROM swipes 
+                              WHERE direction = 'right' GROUP BY target_id
+                              UNION ALL
+                              SELECT swiper_id, target_count, 0, 0, 0 FROM swipe_archive
+                              UNION ALL
+                              SELECT user1_id, 0, 0, 0, COUNT(*) FROM matches GROUP BY user1_id
+                              UNION ALL
+                              SELECT user2_id, 0, 0, 0, COUNT(*) FROM matches GROUP BY user2_id
+                          ) t JOIN wallet_ids w ON w.id = t.wallet_id
+                          GROUP BY w.wallet_address""")
+        
+        cursor.execute("SELECT wallet_address, swipes_given, likes_given, likes_received, matches FROM user_stats")
+        after = {}
+        for row in cursor.fetchall():
+            row = dict(row)
+            after[row.pop('wallet_address')] = row
+        conn.commit()
+    
+    corrected = [w for w in set(before) | set(after) if before.get(w) != after.get(w)]
+    elapsed = time.time() - start
+    print(f"🧮 User stats reconciled: {len(after)} users, {len(corrected)} corrected ({elapsed:.2f}s)")
+    return {"users": len(after), "corrected": len(corrected), "seconds": round(elapsed, 3)}
 
-    async def connect(self, websocket: WebSocket, chat_room_id: str):
-        await websocket.accept()
-        self.active_connections[chat_room_id].append(websocket)
+# Old left swipes compacted into per-user exclusion sets (SWIPE_ARCHIVE_AFTER_DAYS)
+swipe_archive = SwipeArchive(db)
 
-    def disconnect(self, websocket: WebSocket, chat_room_id: str):
-        self.active_connections[chat_room_id].remove(websocket)
+def archive_old_swipes(older_than_days: int, vacuum: bool = False) -> dict:
+    """Compact old left swipes (buffered swipes are flushed first so they are not missed)"""
+    if swipe_buffer.enabled:
+        swipe_buffer.flush()
+    return swipe_archive.compact(older_than_days, vacuum=vacuum)
 
-    async def broadcast(self, message: dict, chat_room_id: str):
-        for connection in self.active_connections[chat_room_id]:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+async def run_swipe_archival():
+    """Periodic archival job (SWIPE_ARCHIVE_AFTER_DAYS > 0)"""
+    while True:
+        await asyncio.sleep(SWIPE_ARCHIVE_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(archive_old_swipes, SWIPE_ARCHIVE_AFTER_DAYS)
+        except Exception as e:
+            print(f"❌ Swipe archival failed: {e}")
+
+# Optional write-behind swipe buffer (SWIPE_WRITE_BEHIND=true) - replays its log before serving
+swipe_buffer = SwipeWriteBehind(db, on_flush=apply_buffered_swipe_stats, wallet_ids=wallet_ids)
+
+async def run_stats_reconciliation():
+    """Periodic reconciliation job (STATS_RECONCILE_INTERVAL_SECONDS)"""
+    while True:
+        await asyncio.sleep(STATS_RECONCILE_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(reconcile_user_stats)
+        except Exception as e:
+            print(f"❌ Stats reconciliation failed: {e}")
+
+# Startup phase durations in ms (printed when startup completes, see GET /api/startup)
+startup_phases: Dict[str, float] = {}
+
+@contextmanager
+def startup_phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_phases[name] = round((time.perf_counter() - start) * 1000, 1)
+
+async def start_app():
+    """Prepare the database and in-memory state, then start background tasks (lifespan startup)"""
+    started = time.perf_counter()
+    with startup_phase("schema"):
+        # Fast path: a database already at SCHEMA_VERSION needs no DDL at all
+        if db.schema_is_current():
+            print(f"✅ Database schema at version {SCHEMA_VERSION} - skipping table checks and migrations")
+        else:
+            db.init_db()
+            if run_migrations():
+                db.mark_schema_current()
+        message_search.check_ready()
+    with startup_phase("seed"):
+        auto_seed_demo_traders()
+    with startup_phase("wallet_ids"):
+        wallet_ids.load()
+    with startup_phase("swipe_buffer"):
+        swipe_buffer.load()
+    with startup_phase("user_stats"):
+        # First run with the stats table: build it from history
+        if not db.execute_one("SELECT 1 AS present FROM user_stats LIMIT 1") and db.execute_one("SELECT 1 AS present FROM swipes LIMIT 1"):
+            reconcile_user_stats()
+    with startup_phase("ranking"):
+        load_ranking_profiles()
+    with startup_phase("eligibility"):
+        load_wallet_eligibility()
+    if NANSEN_CACHE_WARMUP:
+        with startup_phase("nansen_warmup"):
+            load_nansen_snapshot()
+    
+    if swipe_buffer.enabled:
+        asyncio.create_task(swipe_buffer.run())
+        print(f"✍️ Write-behind swipes enabled (flush every {swipe_buffer.flush_interval * 1000:.0f}ms)")
+    if STATS_RECONCILE_INTERVAL_SECONDS > 0:
+        asyncio.create_task(run_stats_reconciliation())
+    if SWIPE_ARCHIVE_AFTER_DAYS > 0:
+        asyncio.create_task(run_swipe_archival())
+    if CHAT_ARCHIVE_AFTER_DAYS > 0:
+        asyncio.create_task(run_chat_archival())
+    await chat_backplane.start()
+    if message_writer.enabled:
+        message_writer.start()
+    asyncio.create_task(manager.run_heartbeat())
+    asyncio.create_task(loop_lag.run())
+    
+    startup_phases["total"] = round((time.perf_counter() - started) * 1000, 1)
+    phases = ", ".join(f"{name} {ms:.0f}" for name, ms in startup_phases.items() if name != "total")
+    print(f"🚀 Startup complete in {startup_phases['total']:.0f}ms ({phases})")
+
+async def stop_app():
+    """Flush buffered writes and close connections (lifespan shutdown)"""
+    swipe_buffer.close()
+    await message_writer.close()
+    await chat_backplane.stop()
+    cpu_pool.shutdown()
+    if NANSEN_CACHE_WARMUP:
+        save_nansen_snapshot()
 
+# Most messages replayed in one frame when a WebSocket resumes (the rest come from /sync)
+CHAT_RESUME_MAX_MESSAGES = int(os.getenv("CHAT_RESUME_MAX_MESSAGES", "200"))
+
+# Chat room -> participants, for membership checks (see chat_rooms.py)
+chat_rooms = ChatRoomCache(db)
+
+# Inactive chat rooms packed into compressed per-room rows (CHAT_ARCHIVE_AFTER_DAYS, see chat_archive.py)
+chat_archive = ChatArchive(db, wallet_ids)
+message_search.archive = chat_archive  # Archived rooms stay searchable
+
+async def run_chat_archival():
+    """Periodic chat archival job (CHAT_ARCHIVE_AFTER_DAYS > 0)"""
+    while True:
+        await asyncio.sleep(CHAT_ARCHIVE_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(chat_archive.archive_inactive, CHAT_ARCHIVE_AFTER_DAYS)
+        except Exception as e:
+            print(f"❌ Chat archival failed: {e}")
+
+# Chat message inserts share transactions (group commit, see message_writer.py);
+# a message to an archived room rehydrates it in the same transaction
+message_writer = MessageGroupCommit(db, wallet_ids, before_write=chat_archive.rehydrate)
+
+# WebSocket connection manager (per-connection send queues, see ws_fanout.py)
 manager = ConnectionManager()
 
+def load_chat_message(message_id: str) -> Optional[dict]:
+    """Broadcast payload for a stored message (backplane fallback for oversized notifications)"""
+    ph = db.placeholder()
+    row = db.execute_one(f"SELECT id, sender_id, message, created_at, seq FROM messages WHERE id = {ph}", (message_id,))
+    if not row:
+        return None
+    return {
+        "id": row['id'],
+        "sender_wallet": wallet_ids.get_wallet(row['sender_id']),
+        "message": row['message'],
+        "created_at": row['created_at'],
+        "cursor": encode_cursor(row['seq'])
+    }
+
+# Cross-worker chat delivery (Postgres LISTEN/NOTIFY or in-process, see chat_backplane.py)
+chat_backplane = create_backplane(db, manager.broadcast, load_chat_message)
+manager.backplane = chat_backplane
+
 # Pydantic models
 class UserCreate(BaseModel):
     wallet_address: str
@@ -496,6 +1090,13 @@ class MessageCreate(BaseModel):
     chat_room_id: str
     sender_wallet: str
     message: str
+    client_id: Optional[str] = None  # Client-generated id - a retry with the same id is not stored twice
+    
+    @validator('client_id')
+    def client_id_must_be_valid(cls, v):
+        if v is not None and not (0 < len(v) <= 64):
+            raise ValueError('client_id must be 1-64 characters')
+        return v
     
     @validator('message')
     def message_must_be_valid(cls, v):
@@ -567,7 +1168,12 @@ def get_all_trader_wallets():
     """Get all trader wallet addresses from the database (REAL USERS FIRST, then demos if DB is empty)"""
     with db.get_connection() as conn:
         cursor = db.get_cursor(conn)
-        cursor.execute("SELECT wallet_address FROM users ORDER BY created_at DESC")
+        # Skip wallets known to have no Nansen data (unless they're due for a re-check)
+        ph = db.placeholder()
+        cursor.execute(f"""SELECT u.wallet_address FROM users u
+                           LEFT JOIN wallet_eligibility e ON e.wallet_address = u.wallet_address
+                           WHERE e.eligible IS NULL OR e.eligible = 1 OR e.recheck_at <= {ph}
+                           ORDER BY u.created_at DESC""", (int(time.time()),))
         results = cursor.fetchall()
         all_wallets = [row['wallet_address'] if isinstance(row, dict) else row[0] for row in results]
     
@@ -586,6 +1192,88 @@ def get_all_trader_wallets():
     # Real users first, then demo traders
     return real_users + demo_users
 
+def build_feed_candidates(wallet_address: str) -> List[str]:
+    """Compute a viewer's full list of unseen candidates straight from the database"""
+    ph = db.placeholder()
+    viewer_id = wallet_ids.get_id(wallet_address, create=False)
+    
+    # Get user's already swiped wallets (live rows + left swipes compacted into the archive)
+    swiped_ids = set()
+    if viewer_id is not None:
+        rows = db.execute_query(f"SELECT target_id FROM swipes WHERE swiper_id = {ph}", (viewer_id,))
+        swiped_ids = {row['target_id'] for row in rows} | swipe_archive.targets(viewer_id)
+    swiped_wallets = set(wallet_ids.to_wallets(swiped_ids))
+    
+    # Swipes still waiting in the write-behind buffer
+    if swipe_buffer.enabled:
+        swiped_wallets |= swipe_buffer.pending_targets(wallet_address)
+    
+    # Get all available trader wallets from database
+    all_wallets = get_all_trader_wallets()
+    
+    # Filter out current user, already swiped wallets and real users known to be ineligible
+    candidates = [w for w in all_wallets if w != wallet_address and w not in swiped_wallets
+                  and (w in DEMO_TRADERS or get_eligibility_status(w) is not False)]
+    
+    # Order by relevance (PnL, win rate, balance, shared venue/asset/country...)
+    ranked = candidate_ranker.rank(wallet_address, candidates)
+    
+    # People who already liked the viewer go first - a right swipe on them is an instant match
+    likers = get_liker_wallets(wallet_address)
+    if likers:
+        ranked = [w for w in ranked if w in likers] + [w for w in ranked if w not in likers]
+    return ranked
+
+def get_liker_wallets(wallet_address: str) -> Set[str]:
+    """Wallets that swiped right on a user (reverse index range scan)"""
+    viewer_id = wallet_ids.get_id(wallet_address, create=False)
+    if viewer_id is None:
+        return set()
+    ph = db.placeholder()
+    rows = db.execute_query(f"SELECT swiper_id FROM swipes WHERE target_id = {ph} AND direction = 'right'",
+                            (viewer_id,))
+    return set(wallet_ids.to_wallets(row['swiper_id'] for row in rows))
+
+def load_ranking_profiles():
+    """Load every user's profile fields into the ranking feature store"""
+    users = db.execute_query("""SELECT wallet_address, favourite_trading_venue, asset_choice_6m, 
+                                       country, created_at FROM users""")
+    for user in users:
+        candidate_ranker.update_profile(
+            user['wallet_address'],
+            user['favourite_trading_venue'],
+            user['asset_choice_6m'],
+            user['country'],
+            is_real=user['wallet_address'] not in DEMO_TRADERS,
+            created_at=user['created_at']
+        )
+    print(f"📐 Ranking features loaded for {len(users)} users")
+
+def select_wallets_to_fetch(wallet_address: str, count: int) -> List[str]:
+    """Pick the next wallets to load for a viewer's deck
+    
+    Wallets with a fresh eligible verdict (and demos) count towards `count`; known-ineligible
+    wallets are dropped from the queue without any Nansen calls. Only unchecked wallets are
+    fetched speculatively.
+    """
+    selected = []
+    confirmed = 0
+    for wallet in feed_queues.candidates(wallet_address):
+        status = True if wallet in DEMO_TRADERS else get_eligibility_status(wallet)
+        if status is False:
+            # Out of the deck until the queue is rebuilt after its re-check is due
+            feed_queues.remove(wallet_address, wallet)
+            continue
+        selected.append(wallet)
+        if status:
+            confirmed += 1
+        if confirmed >= count or len(selected) >= count * 2:
+            break
+    return selected
+
+# Materialized per-user feed queues (rebuilt lazily from the database after restarts)
+feed_queues = FeedQueueManager(build_feed_candidates)
+
 # Helper function to get next trader number
 def get_next_trader_number():
     """Get the next available trader number"""
@@ -601,6 +1289,55 @@ def get_next_trader_number():
         max_number = 0
     return max_number + 1
 
+def load_profile_card(wallet_address: str) -> Optional[dict]:
+    """Load a wallet's profile row from the database (None if the wallet has no profile)"""
+    ph = db.placeholder()
+    return db.execute_one(f"""SELECT trader_number, bio, country, favourite_ct_account, 
+                               worst_ct_account, favourite_trading_venue, asset_choice_6m, twitter_account,
+                               updated_at
+                               FROM users WHERE wallet_address = {ph}""", (wallet_address,))
+
+def load_profile_cards(wallets: List[str]) -> Dict[str, dict]:
+    """Load several profile rows in one query"""
+    ph = db.placeholder()
+    placeholders = ", ".join([ph] * len(wallets))
+    rows = db.execute_query(f"""SELECT wallet_address, trader_number, bio, country, favourite_ct_account, 
+                                worst_ct_account, favourite_trading_venue, asset_choice_6m, twitter_account,
+                                updated_at
+                                FROM users WHERE wallet_address IN ({placeholders})""", tuple(wallets))
+    return {row.pop('wallet_address'): row for row in rows}
+
+# Profile card cache (invalidated by complete_profile / update_my_profile in this worker,
+# expired after PROFILE_CACHE_TTL_SECONDS for writes made by other workers)
+profile_cards = ProfileCardCache(load_profile_card, load_profile_cards)
+
+def encode_cursor(*parts) -> str:
+    """Opaque pagination cursor"""
+    return base64.urlsafe_b64encode(json.dumps([str(p) for p in parts]).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str, size: int) -> List[str]:
+    """Decode a pagination cursor (400 if it's malformed)"""
+    try:
+        parts = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if isinstance(parts, list) and len(parts) == size:
+            return parts
+    except (ValueError, TypeError):
+        pass
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def utc_timestamp(value, local_time: bool = False) -> Optional[str]:
+    """Normalize a stored timestamp to UTC ISO 8601 (comparable as a string)
+
+    Message times are written by the app as local ISO strings (local_time=True);
+    column defaults (CURRENT_TIMESTAMP) are UTC, as "YYYY-MM-DD HH:MM:SS" in SQLite.
+    """
+    if value is None:
+        return None
+    parsed = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone() if local_time else parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
 def format_trader_number(number):
     """Format trader number with leading zeros and commas (e.g., #001, #1,234)"""
     if number < 1000:
@@ -622,6 +1359,26 @@ async def set_nansen_config(config: NansenConfig):
     nansen_api_key = config.api_key
     return {"status": "success", "message": "Nansen API key configured"}
 
+class RankingConfig(BaseModel):
+    weights: Dict[str, float]
+
+@app.get("/api/config/ranking")
+async def get_ranking_config():
+    """Get swipe deck ranking weights and latency stats"""
+    return candidate_ranker.describe()
+
+@app.post("/api/config/ranking", dependencies=[Depends(require_admin)])
+async def set_ranking_config(config: RankingConfig):
+    """Update swipe deck ranking weights (partial updates allowed)"""
+    try:
+        candidate_ranker.set_weights(config.weights)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Existing feed queues were ordered with the old weights
+    feed_queues.invalidate()
+    return {"status": "success", "weights": candidate_ranker.weights}
+
 class SessionRequest(BaseModel):
     wallet_address: str
     signature: str
@@ -636,14 +1393,22 @@ async def create_session(session_req: SessionRequest):
     Use this token for all subsequent requests (no need to sign again!)
     """
     # Verify the signature
-    if not verify_solana_signature(
+    if not await verify_solana_signature(
         session_req.wallet_address, 
         session_req.message, 
         session_req.signature
     ):
         raise HTTPException(
             status_code=401,
-            detail="Invalid signature. Could not verify wallet ownership"
+            detail="Invalid or expired signature. Could not verify wallet ownership"
+        )
+    
+    # A signature buys one session - a captured request can't be replayed for more
+    if not await asyncio.to_thread(signature_verifier.consume, session_req.wallet_address,
+                                   session_req.message, session_req.signature):
+        raise HTTPException(
+            status_code=401,
+            detail="Signature already used. Please sign a new message"
         )
     
     # Create session token
@@ -726,6 +1491,7 @@ async def complete_profile(
     verify_wallet_ownership(wallet_address, authenticated_wallet)
     
     ph = db.placeholder()
+    is_new_user = False
     
     try:
         with db.get_connection() as conn:
@@ -748,12 +1514,12 @@ async def complete_profile(
                 update_query = f"""UPDATE users 
                             SET bio = {ph}, country = {ph}, favourite_ct_account = {ph}, 
                                 worst_ct_account = {ph}, favourite_trading_venue = {ph}, 
-                                asset_choice_6m = {ph}, twitter_account = {ph}
+                                asset_choice_6m = {ph}, twitter_account = {ph}, updated_at = {ph}
                             WHERE wallet_address = {ph}"""
                 cursor.execute(update_query,
                          (profile_data.bio, profile_data.country, profile_data.favourite_ct_account,
                           profile_data.worst_ct_account, profile_data.favourite_trading_venue,
-                          profile_data.asset_choice_6m, profile_data.twitter_account, wallet_address))
+                          profile_data.asset_choice_6m, profile_data.twitter_account, time.time(), wallet_address))
             else:
                 # Create new user with trader number
                 user_id = str(uuid.uuid4())
@@ -761,16 +1527,31 @@ async def complete_profile(
                 
                 insert_query = f"""INSERT INTO users 
                             (id, wallet_address, trader_number, bio, country, favourite_ct_account,
-                             worst_ct_account, favourite_trading_venue, asset_choice_6m, twitter_account)
-                            VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})"""
+                             worst_ct_account, favourite_trading_venue, asset_choice_6m, twitter_account, updated_at)
+                            VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})"""
                 cursor.execute(insert_query,
                          (user_id, wallet_address, trader_number, profile_data.bio, 
                           profile_data.country, profile_data.favourite_ct_account,
                           profile_data.worst_ct_account, profile_data.favourite_trading_venue,
-                          profile_data.asset_choice_6m, profile_data.twitter_account))
+                          profile_data.asset_choice_6m, profile_data.twitter_account, time.time()))
+                is_new_user = True
             
             conn.commit()
         
+        profile_cards.invalidate(wallet_address)
+        candidate_ranker.update_profile(
+            wallet_address,
+            profile_data.favourite_trading_venue,
+            profile_data.asset_choice_6m,
+            profile_data.country,
+            is_real=wallet_address not in DEMO_TRADERS,
+            created_at=datetime.now() if is_new_user else None
+        )
+        
+        # New signups show up in everyone else's deck without a rebuild
+        if is_new_user:
+            feed_queues.enqueue_new_user(wallet_address)
+        
         return {
             "status": "success",
             "user_id": user_id,
@@ -782,48 +1563,41 @@ async def complete_profile(
         raise HTTPException(status_code=500, detail=f"Failed to complete profile: {str(e)}")
 
 @app.get("/api/users/{wallet_address}/profile")
-async def get_my_profile(wallet_address: str):
-    """Get user's own complete profile for editing"""
-    ph = db.placeholder()
-    query = f"""SELECT trader_number, bio, country, favourite_ct_account, 
-                 worst_ct_account, favourite_trading_venue, asset_choice_6m, twitter_account 
-                 FROM users WHERE wallet_address = {ph}"""
-    
-    with db.get_connection() as conn:
-        cursor = db.get_cursor(conn)
-        cursor.execute(query, (wallet_address,))
-        user = cursor.fetchone()
+async def get_my_profile(
+    wallet_address: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None)
+):
+    """Get user's own complete profile for editing (CACHED, supports conditional GET)"""
+    entry = profile_cards.get(wallet_address)
+    user = entry['card']
     
     if not user:
         raise HTTPException(status_code=404, detail="Profile not found")
     
-    # Convert to dict if needed
-    if isinstance(user, dict):
-        return {
-            "wallet_address": wallet_address,
-            "trader_number": user['trader_number'],
-            "trader_number_formatted": format_trader_number(user['trader_number']) if user['trader_number'] else None,
-            "bio": user['bio'],
-            "country": user['country'],
-            "favourite_ct_account": user['favourite_ct_account'],
-            "worst_ct_account": user['worst_ct_account'],
-            "favourite_trading_venue": user['favourite_trading_venue'],
-            "asset_choice_6m": user['asset_choice_6m'],
-            "twitter_account": user['twitter_account']
-        }
-    else:
-        return {
-            "wallet_address": wallet_address,
-            "trader_number": user[0],
-            "trader_number_formatted": format_trader_number(user[0]) if user[0] else None,
-            "bio": user[1],
-            "country": user[2],
-            "favourite_ct_account": user[3],
-            "worst_ct_account": user[4],
-            "favourite_trading_venue": user[5],
-            "asset_choice_6m": user[6],
-            "twitter_account": user[7]
-        }
+    cache_headers = {
+        "ETag": entry['etag'],
+        "Last-Modified": format_http_date(entry['last_modified']),
+        "Cache-Control": "no-cache"  # Always revalidate - repeat reads become cheap 304s
+    }
+    
+    if is_not_modified(entry['etag'], entry['last_modified'], if_none_match, if_modified_since):
+        return Response(status_code=304, headers=cache_headers)
+    
+    response.headers.update(cache_headers)
+    return {
+        "wallet_address": wallet_address,
+        "trader_number": user['trader_number'],
+        "trader_number_formatted": format_trader_number(user['trader_number']) if user['trader_number'] else None,
+        "bio": user['bio'],
+        "country": user['country'],
+        "favourite_ct_account": user['favourite_ct_account'],
+        "worst_ct_account": user['worst_ct_account'],
+        "favourite_trading_venue": user['favourite_trading_venue'],
+        "asset_choice_6m": user['asset_choice_6m'],
+        "twitter_account": user['twitter_account']
+    }
 
 @app.put("/api/users/{wallet_address}/profile")
 async def update_my_profile(
@@ -845,26 +1619,42 @@ async def update_my_profile(
             query = f"""UPDATE users 
                         SET bio = {ph}, country = {ph}, favourite_ct_account = {ph}, 
                             worst_ct_account = {ph}, favourite_trading_venue = {ph}, 
-                            asset_choice_6m = {ph}, twitter_account = {ph}
+                            asset_choice_6m = {ph}, twitter_account = {ph}, updated_at = {ph}
                         WHERE wallet_address = {ph}"""
             cursor.execute(query,
                      (profile_data.bio, profile_data.country, profile_data.favourite_ct_account,
                       profile_data.worst_ct_account, profile_data.favourite_trading_venue,
-                      profile_data.asset_choice_6m, profile_data.twitter_account, wallet_address))
+                      profile_data.asset_choice_6m, profile_data.twitter_account, time.time(), wallet_address))
             
             if cursor.rowcount == 0:
                 raise HTTPException(status_code=404, detail="User not found")
             
             conn.commit()
         
+        profile_cards.invalidate(wallet_address)
+        candidate_ranker.update_profile(
+            wallet_address,
+            profile_data.favourite_trading_venue,
+            profile_data.asset_choice_6m,
+            profile_data.country,
+            is_real=wallet_address not in DEMO_TRADERS
+        )
+        
         return {"status": "success", "message": "Profile updated successfully"}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update profile: {str(e)}")
 
-async def fetch_profile_data(wallet: str, ph: str, is_demo_func):
-    """Helper function to fetch all data for a single profile in parallel"""
+async def fetch_profile_data(wallet: str, ph: str, is_demo_func) -> Optional[bytes]:
+    """Helper function to fetch all data for a single profile in parallel
+    
+    Returns the profile card as pre-encoded JSON bytes (None if the wallet shouldn't be shown)
+    """
+    # Known-ineligible real users: don't spend Nansen calls until their re-check is due
+    if not is_demo_func(wallet) and get_eligibility_status(wallet) is False:
+        return None
+    
     # Fetch Nansen data in parallel
     pnl_task = get_nansen_pnl(wallet)
     balance_task = get_nansen_balance(wallet)
@@ -880,49 +1670,36 @@ async def fetch_profile_data(wallet: str, ph: str, is_demo_func):
         )
         has_real_balance = balance_data.get("total_balance_usd", 0) > 0
         
-        if not (has_real_pnl or has_real_balance):
+        eligible = has_real_pnl or has_real_balance
+        record_eligibility(wallet, eligible)
+        
+        if not eligible:
             print(f"⚠️ Skipping real user {wallet[:8]}... - No valid Nansen data")
             return None
     
-    # Get profile data from database
-    with db.get_connection() as conn:
-        cursor = db.get_cursor(conn)
-        query = f"""SELECT trader_number, bio, country, favourite_ct_account, 
-                     worst_ct_account, favourite_trading_venue, asset_choice_6m, twitter_account 
-                     FROM users WHERE wallet_address = {ph}"""
-        cursor.execute(query, (wallet,))
-        profile_result = cursor.fetchone()
+    # Get profile data (memory hit after the first load)
+    profile_entry = profile_cards.get(wallet)
+    profile_result = profile_entry['card']
+    
+    # Reuse the encoded card while profile, PnL and balance are unchanged (same cached objects)
+    encoded = profile_entry.get('feed_card')
+    if encoded and encoded[0] is pnl_data and encoded[1] is balance_data:
+        return encoded[2]
     
     if profile_result:
-        # Convert to dict if needed
-        if isinstance(profile_result, dict):
-            trader_number = profile_result['trader_number']
-            trader_display = format_trader_number(trader_number) if trader_number else "Demo"
-            profile_data = {
-                "trader_number": trader_number,
-                "trader_number_formatted": trader_display,
-                "bio": profile_result['bio'],
-                "country": profile_result['country'],
-                "favourite_ct_account": profile_result['favourite_ct_account'],
-                "worst_ct_account": profile_result['worst_ct_account'],
-                "favourite_trading_venue": profile_result['favourite_trading_venue'],
-                "asset_choice_6m": profile_result['asset_choice_6m'],
-                "twitter_account": profile_result['twitter_account']
-            }
-        else:
-            trader_number = profile_result[0]
-            trader_display = format_trader_number(trader_number) if trader_number else "Demo"
-            profile_data = {
-                "trader_number": trader_number,
-                "trader_number_formatted": trader_display,
-                "bio": profile_result[1],
-                "country": profile_result[2],
-                "favourite_ct_account": profile_result[3],
-                "worst_ct_account": profile_result[4],
-                "favourite_trading_venue": profile_result[5],
-                "asset_choice_6m": profile_result[6],
-                "twitter_account": profile_result[7]
-            }
+        trader_number = profile_result['trader_number']
+        trader_display = format_trader_number(trader_number) if trader_number else "Demo"
+        profile_data = {
+            "trader_number": trader_number,
+            "trader_number_formatted": trader_display,
+            "bio": profile_result['bio'],
+            "country": profile_result['country'],
+            "favourite_ct_account": profile_result['favourite_ct_account'],
+            "worst_ct_account": profile_result['worst_ct_account'],
+            "favourite_trading_venue": profile_result['favourite_trading_venue'],
+            "asset_choice_6m": profile_result['asset_choice_6m'],
+            "twitter_account": profile_result['twitter_account']
+        }
     else:
         # Demo profile
         profile_data = {
@@ -937,13 +1714,15 @@ async def fetch_profile_data(wallet: str, ph: str, is_demo_func):
             "twitter_account": None
         }
     
-    return {
+    card = fast_dumps({
         "wallet_address": wallet,
         "pnl_summary": pnl_data,
         "balance": balance_data,
         "is_demo": is_demo_func(wallet),
         **profile_data
-    }
+    })
+    profile_entry['feed_card'] = (pnl_data, balance_data, card)
+    return card
 
 @app.get("/api/profiles/{wallet_address}")
 async def get_profiles(wallet_address: str):
@@ -953,30 +1732,15 @@ async def get_profiles(wallet_address: str):
     
     ph = db.placeholder()
     
-    with db.get_connection() as conn:
-        cursor = db.get_cursor(conn)
-        
-        # Get user's already swiped wallets
-        query = f"""SELECT target_wallet FROM swipes 
-                     WHERE user_id = (SELECT id FROM users WHERE wallet_address = {ph})"""
-        cursor.execute(query, (wallet_address,))
-        results = cursor.fetchall()
-        swiped_wallets = [row['target_wallet'] if isinstance(row, dict) else row[0] for row in results]
-    
-    # Get all available trader wallets from database
-    all_wallets = get_all_trader_wallets()
-    
-    # Filter out current user and already swiped wallets
-    available_wallets = [w for w in all_wallets 
-                         if w != wallet_address and w not in swiped_wallets]
-    
     print(f"📊 Cache status: {len(nansen_cache)} wallets cached")
     print(f"🚀 Loading 3 profiles in parallel...")
     
     is_demo = lambda w: w in DEMO_TRADERS
     
     # Load 3 profiles in parallel (faster initial load)
-    wallets_to_fetch = available_wallets[:6]  # Fetch 6 to ensure we get 3 valid profiles
+    # Next page comes straight off the viewer's materialized feed queue
+    # (only unchecked wallets are over-fetched; known-ineligible ones are skipped)
+    wallets_to_fetch = select_wallets_to_fetch(wallet_address, 3)
     
     # Fetch all profiles in parallel
     fetch_tasks = [fetch_profile_data(wallet, ph, is_demo) for wallet in wallets_to_fetch]
@@ -986,7 +1750,48 @@ async def get_profiles(wallet_address: str):
     profiles = [p for p in profile_results if p is not None][:3]  # Return exactly 3 profiles
     
     print(f"📊 Returning {len(profiles)} valid profiles")
-    return {"profiles": profiles}
+    # Splice the pre-encoded cards straight into the response body
+    return PreEncodedJSONResponse(splice_list("profiles", profiles))
+
+@app.get("/api/profiles/{wallet_address}/stream")
+async def stream_profiles(wallet_address: str, count: int = 3):
+    """Stream profiles to swipe through as NDJSON - each card is sent the moment its data resolves"""
+    clear_expired_cache()
+    
+    ph = db.placeholder()
+    count = max(1, min(count, 20))
+    is_demo = lambda w: w in DEMO_TRADERS
+    
+    wallets_to_fetch = select_wallets_to_fetch(wallet_address, count)
+    
+    async def card_stream():
+        tasks = [asyncio.create_task(fetch_profile_data(wallet, ph, is_demo)) for wallet in wallets_to_fetch]
+        sent = 0
+        try:
+            # Fastest wallet first - the slowest Nansen lookup no longer gates the first card
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    profile = await next_done
+                except Exception as e:
+                    print(f"⚠️ Profile fetch failed while streaming: {str(e)}")
+                    continue
+                if profile is None:
+                    continue
+                
+                yield profile + b"\n"
+                sent += 1
+                if sent >= count:
+                    break
+        finally:
+            # Stop leftover fetches once enough cards went out (or the client went away)
+            cancelled = 0
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                    cancelled += 1
+            print(f"📡 Streamed {sent} profiles ({cancelled} fetches cancelled)")
+    
+    return StreamingResponse(card_stream(), media_type="application/x-ndjson")
 
 async def get_nansen_pnl(wallet_address: str):
     """Fetch PnL summary from Nansen API with 90D fallback to all-time (CACHED, ASYNC)"""
@@ -1025,20 +1830,16 @@ async def get_nansen_pnl(wallet_address: str):
         
         print(f"📊 Fetching Nansen 90D PnL for {wallet_address[:8]}...")
         
+        import httpx  # Only needed with a Nansen API key (imported lazily - shortens cold starts)
         async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.nansen.ai/api/v1/profiler/address/pnl-summary",
-                headers={"apiKey": nansen_api_key, "Content-Type": "application/json"},
-                json={
-                    "address": wallet_address,
-                    "chain": "solana",
-                    "date": {
-                        "from": start_date_90d.strftime("%Y-%m-%dT00:00:00Z"),
-                        "to": end_date.strftime("%Y-%m-%dT23:59:59Z")
-                    }
-                },
-                timeout=10
-            )
+            response = await nansen_post(client, "pnl-summary", nansen_api_key, {
+                "address": wallet_address,
+                "chain": "solana",
+                "date": {
+                    "from": start_date_90d.strftime("%Y-%m-%dT00:00:00Z"),
+                    "to": end_date.strftime("%Y-%m-%dT23:59:59Z")
+                }
+            })
         
         print(f"📊 Nansen 90D PnL Response: Status {response.status_code}")
         
@@ -1056,19 +1857,14 @@ async def get_nansen_pnl(wallet_address: str):
                 await wait_for_rate_limit()
                 
                 async with httpx.AsyncClient() as client:
-                    response_alltime = await client.post(
-                        "https://api.nansen.ai/api/v1/profiler/address/pnl-summary",
-                        headers={"apiKey": nansen_api_key, "Content-Type": "application/json"},
-                        json={
-                            "address": wallet_address,
-                            "chain": "solana",
-                            "date": {
-                                "from": start_date_alltime.strftime("%Y-%m-%dT00:00:00Z"),
-                                "to": end_date.strftime("%Y-%m-%dT23:59:59Z")
-                            }
-                        },
-                        timeout=10
-                    )
+                    response_alltime = await nansen_post(client, "pnl-summary", nansen_api_key, {
+                        "address": wallet_address,
+                        "chain": "solana",
+                        "date": {
+                            "from": start_date_alltime.strftime("%Y-%m-%dT00:00:00Z"),
+                            "to": end_date.strftime("%Y-%m-%dT23:59:59Z")
+                        }
+                    })
                 
                 if response_alltime.status_code == 200:
                     data = response_alltime.json()
@@ -1157,21 +1953,17 @@ async def get_nansen_balance(wallet_address: str):
         
         print(f"💰 Fetching Nansen balance for {wallet_address[:8]}...")
         
+        import httpx  # Only needed with a Nansen API key (imported lazily - shortens cold starts)
         async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.nansen.ai/api/v1/profiler/address/current-balance",
-                headers={"apiKey": nansen_api_key, "Content-Type": "application/json"},
-                json={
-                    "address": wallet_address,
-                    "chain": "solana",
-                    "hide_spam_token": True,
-                    "pagination": {
-                        "page": 1,
-                        "per_page": 10
-                    }
-                },
-                timeout=10
-            )
+            response = await nansen_post(client, "current-balance", nansen_api_key, {
+                "address": wallet_address,
+                "chain": "solana",
+                "hide_spam_token": True,
+                "pagination": {
+                    "page": 1,
+                    "per_page": 10
+                }
+            })
         
         print(f"💰 Nansen Balance Response: Status {response.status_code}")
         
@@ -1229,6 +2021,70 @@ async def get_nansen_balance(wallet_address: str):
             "token_count": 5 + (hash(wallet_address[:6]) % 20)
         }
 
+# Wallet -> users.id (ids never change once assigned)
+user_id_cache = {}
+
+def get_user_id(wallet_address: str) -> Optional[str]:
+    """Look up a user's id (cached)"""
+    user_id = user_id_cache.get(wallet_address)
+    if user_id is None:
+        ph = db.placeholder()
+        row = db.execute_one(f"SELECT id FROM users WHERE wallet_address = {ph}", (wallet_address,))
+        if row:
+            user_id = row['id']
+            user_id_cache[wallet_address] = user_id
+    return user_id
+
+def create_match(wallet_a: str, wallet_b: str):
+    """Insert a match for a wallet pair (no-op if it exists); returns (created, chat_room_id)"""
+    ph = db.placeholder()
+    ids = wallet_ids.get_ids([wallet_a, wallet_b])
+    user1_id, user2_id = sorted((ids[wallet_a], ids[wallet_b]))
+    chat_room_id = str(uuid.uuid4())
+    
+    with db.get_connection() as conn:
+        cursor = db.get_cursor(conn)
+        cursor.execute(f"""INSERT INTO matches (id, user1_id, user2_id, chat_room_id)
+                           VALUES ({ph}, {ph}, {ph}, {ph})
+                           ON CONFLICT (user1_id, user2_id) DO NOTHING""",
+                       (str(uuid.uuid4()), user1_id, user2_id, chat_room_id))
+        created = cursor.rowcount > 0
+        if created:
+            apply_stat_deltas(cursor, {wallet_a: {'matches': 1}, wallet_b: {'matches': 1}})
+        else:
+            cursor.execute(f"SELECT chat_room_id FROM matches WHERE user1_id = {ph} AND user2_id = {ph}",
+                           (user1_id, user2_id))
+            existing = cursor.fetchone()
+            chat_room_id = existing['chat_room_id'] if isinstance(existing, dict) else existing[0]
+        conn.commit()
+    
+    if created:
+        chat_rooms.add(chat_room_id, user1_id, user2_id)
+    return created, chat_room_id
+
+def record_buffered_swipe(swipe_action: SwipeAction):
+    """Write-behind swipe: ack from memory, detect mutual likes from the like index"""
+    if not get_user_id(swipe_action.user_wallet):
+        raise HTTPException(status_code=404, detail="User not found")
+    if swipe_action.target_wallet not in DEMO_TRADERS and not get_user_id(swipe_action.target_wallet):
+        raise HTTPException(status_code=404, detail="Target not found")
+    
+    mutual = swipe_buffer.record(swipe_action.user_wallet, swipe_action.target_wallet, swipe_action.direction)
+    
+    match_created = False
+    chat_room_id = None
+    if mutual:
+        # Matches are rare - write them synchronously so chat works immediately
+        match_created, chat_room_id = create_match(swipe_action.user_wallet, swipe_action.target_wallet)
+    
+    feed_queues.remove(swipe_action.user_wallet, swipe_action.target_wallet)
+    
+    return {
+        "status": "success",
+        "match_created": match_created,
+        "chat_room_id": chat_room_id
+    }
+
 @app.post("/api/swipe")
 async def swipe(
     swipe_action: SwipeAction,
@@ -1238,54 +2094,90 @@ async def swipe(
     # Verify wallet ownership
     verify_wallet_ownership(swipe_action.user_wallet, authenticated_wallet)
     
+    if swipe_buffer.enabled:
+        return record_buffered_swipe(swipe_action)
+    
     ph = db.placeholder()
+    # Get both user IDs in one indexed lookup (the target may be a demo without a row)
+    rows = db.execute_query(f"SELECT id, wallet_address FROM users WHERE wallet_address IN ({ph}, {ph})",
+                            (swipe_action.user_wallet, swipe_action.target_wallet))
+    user_ids = {row['wallet_address']: row['id'] for row in rows}
+    if not user_ids.get(swipe_action.user_wallet):
+        raise HTTPException(status_code=404, detail="User not found")
+    target_is_user = swipe_action.target_wallet in user_ids
+    if not target_is_user and swipe_action.target_wallet not in DEMO_TRADERS:
+        raise HTTPException(status_code=404, detail="Target not found")
+    
+    # Intern both wallets only now - ids are permanent (memory hit for known wallets, committed on its own otherwise)
+    ids = wallet_ids.get_ids([swipe_action.user_wallet, swipe_action.target_wallet])
     
     with db.get_connection() as conn:
         cursor = db.get_cursor(conn)
         
-        # Get user ID
-        cursor.execute(f"SELECT id FROM users WHERE wallet_address = {ph}", (swipe_action.user_wallet,))
-        user = cursor.fetchone()
+        swiper_id, target_id = ids[swipe_action.user_wallet], ids[swipe_action.target_wallet]
+        user1_id, user2_id = sorted((swiper_id, target_id))
         
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        if db.use_postgres:
+            # Serialize concurrent swipes on the same pair so simultaneous likes can't miss each other
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", (user1_id, user2_id))
         
-        user_id = user['id'] if isinstance(user, dict) else user[0]
+        # Previous direction (if any) decides how the stats counters move
+        cursor.execute(f"SELECT direction FROM swipes WHERE swiper_id = {ph} AND target_id = {ph}",
+                       (swiper_id, target_id))
+        previous = cursor.fetchone()
+        old_direction = (previous['direction'] if isinstance(previous, dict) else previous[0]) if previous else None
+        if old_direction is None and swipe_archive.remove_target(cursor, swiper_id, target_id):
+            old_direction = 'left'
         
-        # Record swipe
-        swipe_id = str(uuid.uuid4())
-        insert_query = f"INSERT INTO swipes (id, user_id, target_wallet, direction) VALUES ({ph}, {ph}, {ph}, {ph})"
-        cursor.execute(insert_query,
-                  (swipe_id, user_id, swipe_action.target_wallet, swipe_action.direction))
+        # Record swipe (idempotent - re-swiping the same target just updates the row)
+        insert_query = f"""INSERT INTO swipes (swiper_id, target_id, direction) 
+                           VALUES ({ph}, {ph}, {ph})
+                           ON CONFLICT (swiper_id, target_id) DO UPDATE 
+                           SET direction = excluded.direction, created_at = CURRENT_TIMESTAMP"""
+        cursor.execute(insert_query, (swiper_id, target_id, swipe_action.direction))
         
         # Check for match if swiped right
         match_created = False
         chat_room_id = None
         
-        if swipe_action.direction == "right":
-            # Check if target wallet also swiped right on this user
-            check_query = f"""SELECT s.id FROM swipes s
-                         JOIN users u ON s.user_id = u.id
-                         WHERE u.wallet_address = {ph} 
-                         AND s.target_wallet = {ph} 
-                         AND s.direction = 'right'"""
-            cursor.execute(check_query,
-                      (swipe_action.target_wallet, swipe_action.user_wallet))
+        if swipe_action.direction == "right" and target_is_user:
+            # Create the match in the same statement as the mutual-like check
+            # (unique wallet pair index makes a concurrent duplicate a no-op)
+            new_chat_room_id = str(uuid.uuid4())
+            match_query = f"""INSERT INTO matches (id, user1_id, user2_id, chat_room_id)
+                              SELECT {ph}, {ph}, {ph}, {ph}
+                              WHERE EXISTS (SELECT 1 FROM swipes 
+                                            WHERE swiper_id = {ph} AND target_id = {ph} AND direction = 'right')
+                              ON CONFLICT (user1_id, user2_id) DO NOTHING"""
+            cursor.execute(match_query,
+                      (str(uuid.uuid4()), user1_id, user2_id, new_chat_room_id, target_id, swiper_id))
             
-            mutual_swipe = cursor.fetchone()
-            
-            if mutual_swipe:
-                # Create match
-                match_id = str(uuid.uuid4())
-                chat_room_id = str(uuid.uuid4())
-                match_query = f"""INSERT INTO matches (id, user1_wallet, user2_wallet, chat_room_id) 
-                             VALUES ({ph}, {ph}, {ph}, {ph})"""
-                cursor.execute(match_query,
-                          (match_id, swipe_action.user_wallet, swipe_action.target_wallet, chat_room_id))
+            if cursor.rowcount > 0:
                 match_created = True
+                chat_room_id = new_chat_room_id
+            else:
+                # Already matched (e.g. a retried swipe) - hand back the existing room
+                cursor.execute(f"SELECT chat_room_id FROM matches WHERE user1_id = {ph} AND user2_id = {ph}",
+                               (user1_id, user2_id))
+                existing = cursor.fetchone()
+                if existing:
+                    chat_room_id = existing['chat_room_id'] if isinstance(existing, dict) else existing[0]
+        
+        deltas = swipe_stat_deltas(swipe_action.user_wallet, swipe_action.target_wallet,
+                                   old_direction, swipe_action.direction)
+        if match_created:
+            deltas[swipe_action.user_wallet]['matches'] += 1
+            deltas[swipe_action.target_wallet]['matches'] += 1
+        apply_stat_deltas(cursor, deltas)
         
         conn.commit()
     
+    if match_created:
+        chat_rooms.add(chat_room_id, user1_id, user2_id)
+    
+    # Keep the swiper's feed queue in sync
+    feed_queues.remove(swipe_action.user_wallet, swipe_action.target_wallet)
+    
     return {
         "status": "success",
         "match_created": match_created,
@@ -1295,41 +2187,326 @@ async def swipe(
 @app.get("/api/matches/{wallet_address}")
 async def get_matches(
     wallet_address: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
     authenticated_wallet: Optional[str] = Depends(get_authenticated_wallet)
 ):
-    """Get all matches for a user (AUTH PROTECTED)"""
+    """Get a page of matches with profile summary, last message and unread count (AUTH PROTECTED)
+    
+    Constant number of indexed queries per page, whatever the number of matches.
+    Pass `next_cursor` back as `cursor` to get the next page.
+    """
     # Verify wallet ownership
     verify_wallet_ownership(wallet_address, authenticated_wallet)
     
     ph = db.placeholder()
-    query = f"""SELECT user1_wallet, user2_wallet, chat_room_id, created_at 
-                 FROM matches 
-                 WHERE user1_wallet = {ph} OR user2_wallet = {ph}
-                 ORDER BY created_at DESC"""
+    limit = max(1, min(limit, 100))
+    viewer_id = wallet_ids.get_id(wallet_address, create=False)
+    if viewer_id is None:
+        return {"matches": [], "next_cursor": None}
+    
+    # Query 1: page of matches (two index range scans instead of an OR)
+    cursor_clause = ""
+    params = [viewer_id, viewer_id]
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor, 2)
+        cursor_clause = f"WHERE created_at < {ph} OR (created_at = {ph} AND id < {ph})"
+        params += [cursor_created_at, cursor_created_at, cursor_id]
+    params.append(limit + 1)
+    
+    rows = db.execute_query(f"""SELECT id, user1_id, user2_id, chat_room_id, created_at FROM (
+                                    SELECT id, user1_id, user2_id, chat_room_id, created_at 
+                                    FROM matches WHERE user1_id = {ph}
+                                    UNION ALL
+                                    SELECT id, user1_id, user2_id, chat_room_id, created_at 
+                                    FROM matches WHERE user2_id = {ph}
+                                ) m
+                                {cursor_clause}
+                                ORDER BY created_at DESC, id DESC
+                                LIMIT {ph}""", tuple(params))
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    
+    if not rows:
+        return {"matches": [], "next_cursor": None}
+    
+    room_ids = [row['chat_room_id'] for row in rows]
+    room_placeholders = ", ".join([ph] * len(room_ids))
+    other_ids = [row['user2_id'] if row['user1_id'] == viewer_id else row['user1_id'] for row in rows]
+    id_wallets = wallet_ids.get_wallets(other_ids)
+    other_wallets = [id_wallets[other_id] for other_id in other_ids]
+    
+    # Query 2: profile summaries (memory hits; misses loaded in one batch)
+    profiles = profile_cards.get_many(other_wallets)
+    
+    # Query 3: last message per room
+    last_messages = {}
+    for message in db.execute_query(f"""SELECT chat_room_id, sender_id, message, created_at 
+                                         FROM messages m
+                                         WHERE chat_room_id IN ({room_placeholders})
+                                         AND created_at = (SELECT MAX(created_at) FROM messages m2 
+                                                           WHERE m2.chat_room_id = m.chat_room_id)""",
+                                     tuple(room_ids)):
+        last_messages[message['chat_room_id']] = message
+    
+    # Query 4: unread counts (messages from the other person after the caller's read receipt)
+    unread_counts = {}
+    for row in db.execute_query(f"""SELECT msg.chat_room_id, COUNT(*) AS unread FROM messages msg
+                                    LEFT JOIN chat_reads r 
+                                      ON r.chat_room_id = msg.chat_room_id AND r.wallet_address = {ph}
+                                    WHERE msg.chat_room_id IN ({room_placeholders})
+                                    AND msg.sender_id != {ph}
+                                    AND (r.last_read_at IS NULL OR msg.created_at > r.last_read_at)
+                                    GROUP BY msg.chat_room_id""",
+                                (wallet_address, *room_ids, viewer_id)):
+        unread_counts[row['chat_room_id']] = row['unread']
+
+    # Query 5 (rooms with no hot messages): archived rooms keep their preview and unread counts in the archive row
+    quiet_rooms = [room_id for room_id in room_ids if room_id not in last_messages]
+    if quiet_rooms:
+        user1_rooms = {row['chat_room_id'] for row in rows if row['user1_id'] == viewer_id}
+        for room_id, summary in chat_archive.summaries(quiet_rooms).items():
+            last_messages[room_id] = {"sender_id": summary['last_sender_id'], "message": summary['last_message'],
+                                      "created_at": summary['last_message_at']}
+            unread_counts[room_id] = summary['user1_unread'] if room_id in user1_rooms else summary['user2_unread']
+
+    matches = []
+    for row, other_wallet in zip(rows, other_wallets):
+        card = profiles[other_wallet]['card'] or {}
+        trader_number = card.get('trader_number')
+        last_message = last_messages.get(row['chat_room_id'])
+        last_activity_at = utc_timestamp(row['created_at'])
+        if last_message:
+            last_activity_at = max(last_activity_at, utc_timestamp(last_message['created_at'], local_time=True))
+        matches.append({
+            "wallet_address": other_wallet,
+            "chat_room_id": row['chat_room_id'],
+            "created_at": row['created_at'],
+            "profile": {
+                "trader_number": trader_number,
+                "trader_number_formatted": format_trader_number(trader_number) if trader_number else "Demo",
+                "bio": card.get('bio'),
+                "country": card.get('country'),
+                "favourite_trading_venue": card.get('favourite_trading_venue'),
+                "twitter_account": card.get('twitter_account')
+            },
+            "last_message": {
+                "sender_wallet": wallet_address if last_message['sender_id'] == viewer_id else other_wallet,
+                "message": last_message['message'][:140],
+                "created_at": last_message['created_at']
+            } if last_message else None,
+            "last_activity_at": last_activity_at,
+            "unread_count": unread_counts.get(row['chat_room_id'], 0)
+        })
+    
+    return {"matches": matches, "next_cursor": next_cursor}
+
+@app.get("/api/likes/{wallet_address}")
+async def get_likes_received(
+    wallet_address: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    authenticated_wallet: Optional[str] = Depends(get_authenticated_wallet)
+):
+    """Get the "liked you" inbox: right swipes on a user, newest first (AUTH PROTECTED)
+    
+    Wallets the viewer already swiped (either way) are left out - they are either
+    matches or passes. Served from the (target_id, direction, created_at) index.
+    """
+    verify_wallet_ownership(wallet_address, authenticated_wallet)
+    
+    ph = db.placeholder()
+    limit = max(1, min(limit, 100))
+    viewer_id = wallet_ids.get_id(wallet_address, create=False)
+    if viewer_id is None:
+        return {"likes": [], "next_cursor": None}
+    
+    cursor_clause = ""
+    params = [viewer_id, viewer_id]
+    if cursor:
+        cursor_created_at, cursor_swiper_id = decode_cursor(cursor, 2)
+        cursor_clause = f"AND (s.created_at < {ph} OR (s.created_at = {ph} AND s.swiper_id < {ph}))"
+        params += [cursor_created_at, cursor_created_at, cursor_swiper_id]
+    params.append(limit + 1)
+    
+    rows = db.execute_query(f"""SELECT s.swiper_id, s.created_at FROM swipes s
+                                WHERE s.target_id = {ph} AND s.direction = 'right'
+                                AND NOT EXISTS (SELECT 1 FROM swipes mine 
+                                                WHERE mine.swiper_id = {ph} AND mine.target_id = s.swiper_id)
+                                {cursor_clause}
+                                ORDER BY s.created_at DESC, s.swiper_id DESC
+                                LIMIT {ph}""", tuple(params))
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['swiper_id'])
+    
+    # Swipes the viewer made that are already archived or still in the write-behind buffer
+    archived = swipe_archive.targets(viewer_id)
+    rows = [row for row in rows if row['swiper_id'] not in archived]
+    id_wallets = wallet_ids.get_wallets(row['swiper_id'] for row in rows)
+    for row in rows:
+        row['wallet_address'] = id_wallets[row['swiper_id']]
+    if swipe_buffer.enabled:
+        pending = swipe_buffer.pending_targets(wallet_address)
+        rows = [row for row in rows if row['wallet_address'] not in pending]
+    
+    profiles = profile_cards.get_many([row['wallet_address'] for row in rows])
+    likes = []
+    for row in rows:
+        card = profiles[row['wallet_address']]['card'] or {}
+        trader_number = card.get('trader_number')
+        likes.append({
+            "wallet_address": row['wallet_address'],
+            "liked_at": row['created_at'],
+            "profile": {
+                "trader_number": trader_number,
+                "trader_number_formatted": format_trader_number(trader_number) if trader_number else "Demo",
+                "bio": card.get('bio'),
+                "country": card.get('country'),
+                "favourite_trading_venue": card.get('favourite_trading_venue'),
+                "twitter_account": card.get('twitter_account')
+            }
+        })
+    
+    return {"likes": likes, "next_cursor": next_cursor}
+
+def message_rows_to_payloads(rows) -> List[dict]:
+    """messages rows (id, sender_id, message, created_at, seq) -> API payloads with a sync cursor"""
+    rows = [row if isinstance(row, dict) else dict(zip(("id", "sender_id", "message", "created_at", "seq"), row))
+            for row in rows]
+    senders = wallet_ids.get_wallets({row['sender_id'] for row in rows})
+    return [{
+        "id": row['id'],
+        "sender_wallet": senders.get(row['sender_id']),
+        "message": row['message'],
+        "created_at": row['created_at'],
+        "cursor": encode_cursor(row['seq'])
+    } for row in rows]
+
+def sync_position(chat_room_id: str, after: str) -> int:
+    """Room seq a sync cursor points at (400 if it's malformed)
+
+    Cursors are the message's seq (commit order). Cursors handed out before seq
+    numbers, (created_at, id), map to the last message at or before them.
+    """
+    try:
+        (seq,) = decode_cursor(after, 1)
+        return int(seq)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except HTTPException:
+        after_created_at, after_id = decode_cursor(after, 2)
+    ph = db.placeholder()
+    row = db.execute_one(f"""SELECT COALESCE(MAX(seq), 0) AS seq FROM messages
+                             WHERE chat_room_id = {ph} AND (created_at < {ph} OR (created_at = {ph} AND id <= {ph}))""",
+                         (chat_room_id, after_created_at, after_created_at, after_id))
+    return row['seq']
+
+def fetch_messages_after(chat_room_id: str, after_seq: Optional[int], limit: int) -> Tuple[List[dict], bool]:
+    """Messages committed after a room seq, oldest first; returns (messages, has_more)"""
+    ph = db.placeholder()
+    rows = db.execute_query(f"""SELECT id, sender_id, message, created_at, seq FROM messages 
+                                WHERE chat_room_id = {ph} AND seq > {ph}
+                                ORDER BY seq 
+                                LIMIT {ph}""", (chat_room_id, after_seq or 0, limit + 1))
+    has_more = len(rows) > limit
+    return message_rows_to_payloads(rows[:limit]), has_more
+
+def is_chat_member(chat_room_id: str, wallet_address: Optional[str]) -> bool:
+    """Whether a wallet is one of the two participants of a chat room (in-memory after the first lookup)"""
+    if not wallet_address:
+        return False
+    return chat_rooms.is_member(chat_room_id, wallet_ids.get_id(wallet_address, create=False))
+
+def verify_chat_viewer(chat_room_id: str, authenticated_wallet: Optional[str]):
+    """Verify caller is part of this match (CRITICAL SECURITY CHECK)"""
+    if REQUIRE_AUTH and authenticated_wallet:
+        if not is_chat_member(chat_room_id, authenticated_wallet):
+            raise HTTPException(
+                status_code=403,
+                detail="You are not authorized to view this chat"
+            )
+    elif REQUIRE_AUTH:
+        raise HTTPException(status_code=401, detail="Authentication required")
+
+@app.get("/api/chat/search/{wallet_address}")
+async def search_messages(
+    wallet_address: str,
+    q: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    authenticated_wallet: Optional[str] = Depends(get_authenticated_wallet)
+):
+    """Full-text search over the caller's chats, best match first (AUTH PROTECTED)"""
+    verify_wallet_ownership(wallet_address, authenticated_wallet)
+    if not message_search.available:
+        raise HTTPException(status_code=503, detail="Message search is unavailable")
+    
+    ph = db.placeholder()
+    limit = max(1, min(limit, 50))
+    viewer_id = wallet_ids.get_id(wallet_address, create=False)
+    if viewer_id is None:
+        return {"results": [], "next_cursor": None}
+    
+    after = None
+    if cursor:
+        score, message_id = decode_cursor(cursor, 2)
+        try:
+            after = (float(score), message_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    rooms = db.execute_query(f"""SELECT chat_room_id FROM matches WHERE user1_id = {ph}
+                                 UNION ALL
+                                 SELECT chat_room_id FROM matches WHERE user2_id = {ph}""", (viewer_id, viewer_id))
+    rows, has_more = await asyncio.to_thread(
+        message_search.search, [row['chat_room_id'] for row in rooms], q, limit, after)
     
+    senders = wallet_ids.get_wallets({row['sender_id'] for row in rows})
+    return {
+        "results": [{
+            "id": row['id'],
+            "chat_room_id": row['chat_room_id'],
+            "sender_wallet": senders.get(row['sender_id']),
+            "message": row['message'],
+            "created_at": row['created_at']
+        } for row in rows],
+        "next_cursor": encode_cursor(rows[-1]['score'], rows[-1]['id']) if has_more else None
+    }
+
+class ChatReadReceipt(BaseModel):
+    wallet_address: str
+
+@app.post("/api/chat/{chat_room_id}/read")
+async def mark_chat_read(
+    chat_room_id: str,
+    receipt: ChatReadReceipt,
+    authenticated_wallet: Optional[str] = Depends(get_authenticated_wallet)
+):
+    """Mark everything currently in a chat as read (AUTH PROTECTED - must be part of match)"""
+    verify_wallet_ownership(receipt.wallet_address, authenticated_wallet)
+    
+    if not is_chat_member(chat_room_id, receipt.wallet_address):
+        raise HTTPException(status_code=403, detail="You are not part of this chat")
+    
+    await asyncio.to_thread(chat_archive.ensure_hot, chat_room_id)
+    ph = db.placeholder()
     with db.get_connection() as conn:
         cursor = db.get_cursor(conn)
-        cursor.execute(query, (wallet_address, wallet_address))
-        results = cursor.fetchall()
-    
-    matches = []
-    for row in results:
-        if isinstance(row, dict):
-            other_wallet = row['user2_wallet'] if row['user1_wallet'] == wallet_address else row['user1_wallet']
-            matches.append({
-                "wallet_address": other_wallet,
-                "chat_room_id": row['chat_room_id'],
-                "created_at": row['created_at']
-            })
-        else:
-            other_wallet = row[1] if row[0] == wallet_address else row[0]
-            matches.append({
-                "wallet_address": other_wallet,
-                "chat_room_id": row[2],
-                "created_at": row[3]
-            })
+        # Read receipt = timestamp of the newest message in the room
+        cursor.execute(f"""INSERT INTO chat_reads (chat_room_id, wallet_address, last_read_at)
+                           SELECT {ph}, {ph}, MAX(created_at) FROM messages WHERE chat_room_id = {ph}
+                           ON CONFLICT (chat_room_id, wallet_address) DO UPDATE 
+                           SET last_read_at = excluded.last_read_at""",
+                       (chat_room_id, receipt.wallet_address, chat_room_id))
+        conn.commit()
     
-    return {"matches": matches}
+    return {"status": "success"}
 
 @app.get("/api/chat/{chat_room_id}/messages")
 async def get_messages(
@@ -1339,57 +2516,64 @@ async def get_messages(
 ):
     """Get messages for a chat room (AUTH PROTECTED - must be part of match)"""
     ph = db.placeholder()
+    verify_chat_viewer(chat_room_id, authenticated_wallet)
+    # Archived room: moved back into the messages table on first open
+    await asyncio.to_thread(chat_archive.ensure_hot, chat_room_id)
     
     with db.get_connection() as conn:
         cursor = db.get_cursor(conn)
         
-        # Verify caller is part of this match (CRITICAL SECURITY CHECK)
-        if REQUIRE_AUTH and authenticated_wallet:
-            check_query = f"""
-                SELECT 1 FROM matches 
-                WHERE chat_room_id = {ph}
-                AND (user1_wallet = {ph} OR user2_wallet = {ph})
-            """
-            cursor.execute(check_query, (
-                chat_room_id,
-                authenticated_wallet,
-                authenticated_wallet
-            ))
-            
-            if not cursor.fetchone():
-                raise HTTPException(
-                    status_code=403,
-                    detail="You are not authorized to view this chat"
-                )
-        elif REQUIRE_AUTH:
-            raise HTTPException(status_code=401, detail="Authentication required")
-        
         # Get messages
-        query = f"""SELECT sender_wallet, message, created_at 
+        query = f"""SELECT id, sender_id, message, created_at, seq 
                      FROM messages 
                      WHERE chat_room_id = {ph} 
-                     ORDER BY created_at DESC 
+                     ORDER BY seq DESC 
                      LIMIT {limit}"""
         
         cursor.execute(query, (chat_room_id,))
         results = cursor.fetchall()
     
-    messages = []
-    for row in results:
-        if isinstance(row, dict):
-            messages.append({
-                "sender_wallet": row['sender_wallet'],
-                "message": row['message'],
-                "created_at": row['created_at']
-            })
-        else:
-            messages.append({
-                "sender_wallet": row[0],
-                "message": row[1],
-                "created_at": row[2]
-            })
+    messages = list(reversed(message_rows_to_payloads(results)))
+    
+    # Newest message = starting point for /sync and WebSocket resume
+    return {"messages": messages, "cursor": messages[-1]['cursor'] if messages else None}
+
+@app.get("/api/chat/{chat_room_id}/sync")
+async def sync_messages(
+    chat_room_id: str,
+    after: Optional[str] = None,
+    limit: int = 100,
+    authenticated_wallet: Optional[str] = Depends(get_authenticated_wallet)
+):
+    """Messages newer than a cursor, oldest first (AUTH PROTECTED - must be part of match)
     
-    return {"messages": list(reversed(messages))}
+    `after` is the cursor of the last message the client has (from /messages, a
+    live message or a previous sync); the response cursor is the next `after`.
+    """
+    verify_chat_viewer(chat_room_id, authenticated_wallet)
+    await asyncio.to_thread(chat_archive.ensure_hot, chat_room_id)
+    limit = max(1, min(limit, 500))
+    after_seq = sync_position(chat_room_id, after) if after else None
+    messages, has_more = fetch_messages_after(chat_room_id, after_seq, limit)
+    return {
+        "messages": messages,
+        "cursor": messages[-1]['cursor'] if messages else after,
+        "has_more": has_more
+    }
+
+def message_entry(message_data: MessageCreate) -> dict:
+    """Group-commit entry for a validated message"""
+    return {
+        "chat_room_id": message_data.chat_room_id,
+        "sender_wallet": message_data.sender_wallet,
+        "message": message_data.message,
+        "client_id": message_data.client_id
+    }
+
+async def publish_message(chat_room_id: str, message: dict):
+    """Broadcast a stored message to the room on every worker (with its sync cursor)"""
+    message["cursor"] = encode_cursor(message.pop("seq"))
+    await chat_backplane.publish(chat_room_id, message)
 
 @app.post("/api/chat/message")
 async def send_message(
@@ -1397,66 +2581,217 @@ async def send_message(
     authenticated_wallet: Optional[str] = Depends(get_authenticated_wallet)
 ):
     """Send a message to a chat room (AUTH PROTECTED - must be part of match)"""
-    ph = db.placeholder()
-    
     # Verify sender owns the wallet
     verify_wallet_ownership(message_data.sender_wallet, authenticated_wallet)
     
-    message_id = str(uuid.uuid4())
-    created_at = datetime.now().isoformat()
+    # Verify sender is part of this match (CRITICAL SECURITY CHECK)
+    if REQUIRE_AUTH and not is_chat_member(message_data.chat_room_id, authenticated_wallet):
+        raise HTTPException(
+            status_code=403,
+            detail="You are not authorized to send messages to this chat"
+        )
     
-    with db.get_connection() as conn:
-        cursor = db.get_cursor(conn)
-        
-        # Verify sender is part of this match (CRITICAL SECURITY CHECK)
-        if REQUIRE_AUTH and authenticated_wallet:
-            check_query = f"""
-                SELECT 1 FROM matches 
-                WHERE chat_room_id = {ph}
-                AND (user1_wallet = {ph} OR user2_wallet = {ph})
-            """
-            cursor.execute(check_query, (
-                message_data.chat_room_id,
-                authenticated_wallet,
-                authenticated_wallet
-            ))
-            
-            if not cursor.fetchone():
-                raise HTTPException(
-                    status_code=403,
-                    detail="You are not authorized to send messages to this chat"
-                )
-        elif REQUIRE_AUTH:
-            raise HTTPException(status_code=401, detail="Authentication required")
-        
-        # Save message
-        query = f"""INSERT INTO messages (id, chat_room_id, sender_wallet, message, created_at) 
-                     VALUES ({ph}, {ph}, {ph}, {ph}, {ph})"""
-        cursor.execute(query,
-                  (message_id, message_data.chat_room_id, message_data.sender_wallet, 
-                   message_data.message, created_at))
-        
-        conn.commit()
+    # Resolves once the batch holding this message is committed
+    message, duplicate = await message_writer.submit(message_entry(message_data))
     
-    # Broadcast message to WebSocket connections
-    await manager.broadcast({
-        "sender_wallet": message_data.sender_wallet,
-        "message": message_data.message,
-        "created_at": created_at
-    }, message_data.chat_room_id)
+    # Broadcast to WebSocket connections on every worker (only durable messages)
+    if not duplicate:
+        await publish_message(message_data.chat_room_id, message)
+    
+    return {"status": "success", "message_id": message["id"], "created_at": message["created_at"]}
+
+async def handle_ws_send(connection, frame: dict):
+    """Persist a {"type": "send"} frame and ack it on the same socket
+    
+    Ack: {"type": "ack", "client_id", "id", "created_at", "duplicate"}
+    Error: {"type": "error", "client_id", "detail"}
+    """
+    client_id = frame.get("client_id")
     
-    return {"status": "success", "message_id": message_id}
+    def reply(payload: dict):
+        connection.offer(fast_dumps({"client_id": client_id, **payload}).decode("utf-8"))
+    
+    if not isinstance(client_id, str) or not client_id:
+        reply({"type": "error", "detail": "client_id is required"})
+        return
+    if connection.wallet is None:
+        reply({"type": "error", "detail": "Authentication required"})
+        return
+    try:
+        message_data = MessageCreate(chat_room_id=connection.chat_room_id, sender_wallet=connection.wallet,
+                                     message=frame.get("message") or "", client_id=client_id)
+    except ValidationError as e:
+        reply({"type": "error", "detail": e.errors()[0]['msg']})
+        return
+    
+    try:
+        message, duplicate = await message_writer.submit(message_entry(message_data))
+    except Exception as e:
+        print(f"❌ WebSocket send failed: {e}")
+        reply({"type": "error", "detail": "Message could not be stored"})
+        return
+    if not duplicate:
+        await publish_message(connection.chat_room_id, message)
+    reply({"type": "ack", "id": message["id"], "created_at": message["created_at"], "duplicate": duplicate})
 
 @app.websocket("/ws/chat/{chat_room_id}")
-async def websocket_chat(websocket: WebSocket, chat_room_id: str):
-    """WebSocket endpoint for real-time chat"""
-    await manager.connect(websocket, chat_room_id)
+async def websocket_chat(
+    websocket: WebSocket,
+    chat_room_id: str,
+    wallet: Optional[str] = None,
+    token: Optional[str] = None,
+    signature: Optional[str] = None,
+    message: Optional[str] = None,
+    after: Optional[str] = None
+):
+    """WebSocket endpoint for real-time chat
+    
+    Credentials go in the query string (browsers can't set WebSocket headers):
+    ?token=<session token> or ?wallet=...&signature=...&message=... (same rules
+    as the X-* auth headers). With REQUIRE_AUTH only the two participants can
+    connect. Authenticated sockets can send
+    {"type": "send", "client_id": "...", "message": "..."} frames; sockets
+    without credentials (development mode) only receive.
+    
+    Resume: ?after=<cursor of the last message seen> replays what was missed as
+    one {"type": "replay", "messages", "cursor", "has_more"} frame before any
+    live message (has_more: fetch the rest from /sync).
+    """
+    authenticated_wallet = None
+    if wallet or token or REQUIRE_AUTH:
+        try:
+            authenticated_wallet = await get_authenticated_wallet(
+                x_wallet_address=wallet, x_session_token=token,
+                x_wallet_signature=signature, x_signature_message=message)
+        except HTTPException as e:
+            await websocket.close(code=1008, reason=e.detail)
+            return
+    
+    # Membership is checked once per connection, not per message
+    if REQUIRE_AUTH and not is_chat_member(chat_room_id, authenticated_wallet):
+        await websocket.close(code=1008, reason="You are not part of this chat")
+        return
+    
+    await asyncio.to_thread(chat_archive.ensure_hot, chat_room_id)
+    replay = None
+    if after:
+        try:
+            after_seq = await asyncio.to_thread(sync_position, chat_room_id, after)
+        except HTTPException as e:
+            await websocket.close(code=1008, reason=e.detail)
+            return
+        
+        async def replay():
+            messages, has_more = await asyncio.to_thread(
+                fetch_messages_after, chat_room_id, after_seq, CHAT_RESUME_MAX_MESSAGES)
+            return {"type": "replay", "messages": messages,
+                    "cursor": messages[-1]['cursor'] if messages else after, "has_more": has_more}
+    
+    connection = await manager.connect(websocket, chat_room_id, replay=replay)
+    connection.wallet = authenticated_wallet
     try:
         while True:
-            data = await websocket.receive_text()
-            # Keep connection alive
+            text = await websocket.receive_text()
+            # Any frame (e.g. a heartbeat pong) keeps the connection alive
+            manager.touch(connection)
+            try:
+                frame = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(frame, dict) and frame.get("type") == "send":
+                await handle_ws_send(connection, frame)
     except WebSocketDisconnect:
-        manager.disconnect(websocket, chat_room_id)
+        pass
+    finally:
+        manager.disconnect(connection)
+
+@app.get("/api/users/{wallet_address}/stats")
+async def get_user_stats(
+    wallet_address: str,
+    authenticated_wallet: Optional[str] = Depends(get_authenticated_wallet)
+):
+    """Get swipe and match counters for a user - single primary key lookup (AUTH PROTECTED)"""
+    verify_wallet_ownership(wallet_address, authenticated_wallet)
+    
+    ph = db.placeholder()
+    stats = db.execute_one(f"""SELECT swipes_given, likes_given, likes_received, matches 
+                               FROM user_stats WHERE wallet_address = {ph}""", (wallet_address,))
+    stats = stats or {"swipes_given": 0, "likes_given": 0, "likes_received": 0, "matches": 0}
+    
+    return {
+        "wallet_address": wallet_address,
+        **stats,
+        "match_rate": round(stats['matches'] / stats['likes_given'], 3) if stats['likes_given'] else 0.0
+    }
+
+@app.post("/api/stats/reconcile", dependencies=[Depends(require_admin)])
+async def reconcile_stats():
+    """Rebuild all user stats counters from the swipes and matches tables"""
+    return await asyncio.to_thread(reconcile_user_stats)
+
+@app.post("/api/swipes/archive", dependencies=[Depends(require_admin)])
+async def archive_swipes(older_than_days: int = 30, vacuum: bool = False):
+    """Compact left swipes older than N days into per-user archive rows"""
+    if older_than_days < 0:
+        raise HTTPException(status_code=400, detail="older_than_days must be >= 0")
+    return await asyncio.to_thread(archive_old_swipes, older_than_days, vacuum)
+
+@app.get("/api/swipes/archive")
+async def get_swipe_archive_status():
+    """Swipe archive status (users archived, last run, table size before/after)"""
+    return swipe_archive.describe()
+
+@app.post("/api/chat/archive", dependencies=[Depends(require_admin)])
+async def archive_chats(older_than_days: int = 30, vacuum: bool = False):
+    """Archive chat rooms with no message in the last N days (rehydrated when opened again)"""
+    if older_than_days < 0:
+        raise HTTPException(status_code=400, detail="older_than_days must be >= 0")
+    return await asyncio.to_thread(chat_archive.archive_inactive, older_than_days, vacuum)
+
+@app.get("/api/chat/archive")
+async def get_chat_archive_status():
+    """Chat archive status (rooms and messages archived, rehydrations, codec)"""
+    return chat_archive.describe()
+
+@app.get("/api/startup")
+async def get_startup_report():
+    """Startup phase timings in ms (schema check/migrations, seed, cache loads, Nansen warm-up)"""
+    return {"schema_version": SCHEMA_VERSION, "phases": startup_phases, "nansen_warmup": NANSEN_CACHE_WARMUP}
+
+@app.get("/api/auth/stats")
+async def get_auth_stats():
+    """Signature verification status: cache (hits, failures, expired, replays), batches and worker pool latency"""
+    return {
+        "signatures": signature_verifier.describe(),
+        "batches": signature_checks.describe(),
+        "session_tokens_cached": len(session_token_cache),
+        "pool": cpu_pool.describe()
+    }
+
+@app.get("/api/ws/stats")
+async def get_ws_stats():
+    """WebSocket fan-out status (rooms, connections, queued frames, drops, backplane)"""
+    return {**manager.describe(), "backplane": chat_backplane.describe()}
+
+@app.get("/api/chat/stats")
+async def get_chat_stats():
+    """Chat group-commit status (messages per commit, last commit time) and membership cache"""
+    return {"writer": message_writer.describe(), "rooms": chat_rooms.describe()}
+
+@app.get("/api/swipes/buffer")
+async def swipe_buffer_stats():
+    """Write-behind swipe buffer status"""
+    return swipe_buffer.describe()
+
+@app.get("/api/feed/{wallet_address}/consistency", dependencies=[Depends(require_admin)])
+async def check_feed_consistency(wallet_address: str):
+    """Compare a viewer's feed queue against the database"""
+    return feed_queues.check_consistency(wallet_address)
+
+@app.post("/api/feed/{wallet_address}/repair", dependencies=[Depends(require_admin)])
+async def repair_feed_queue(wallet_address: str):
+    """Compare a viewer's feed queue against the database and rebuild it on drift"""
+    return feed_queues.check_consistency(wallet_address, repair=True)
 
 @app.get("/api/config/trading-venues")
 async def get_trading_venues():
@@ -1480,23 +2815,34 @@ async def get_trading_venues():
 
 @app.get("/api/cache/stats")
 async def cache_stats():
-    """Get cache statistics"""
+    """Get cache statistics (age / expiry per cached data type, lookups by result)"""
     current_time = time.time()
     cached_wallets = []
     
     for wallet, data in nansen_cache.items():
-        age_seconds = current_time - data.get('timestamp', 0)
-        cached_wallets.append({
+        entry = {
             "wallet": f"{wallet[:8]}...{wallet[-4:]}",
-            "age_seconds": round(age_seconds, 1),
             "has_pnl": 'pnl' in data,
-            "has_balance": 'balance' in data,
-            "expires_in": round(CACHE_TTL_SECONDS - age_seconds, 1)
-        })
+            "has_balance": 'balance' in data
+        }
+        for data_type, cached in data.items():
+            ttl = CACHE_TTL_PNL_SECONDS if data_type == 'pnl' else CACHE_TTL_BALANCE_SECONDS
+            age_seconds = current_time - cached.get('timestamp', 0)
+            entry[data_type] = {
+                "age_seconds": round(age_seconds, 1),
+                "expires_in": round(ttl - age_seconds, 1),
+                "hits": cached.get('hits', 0)
+            }
+        cached_wallets.append(entry)
+    
+    lookups = defaultdict(dict)
+    for (data_type, result), count in list(nansen_cache_requests.values.items()):
+        lookups[data_type][result] = int(count)
     
     return {
         "total_cached": len(nansen_cache),
-        "ttl_seconds": CACHE_TTL_SECONDS,
+        "ttl_seconds": {"pnl": CACHE_TTL_PNL_SECONDS, "balance": CACHE_TTL_BALANCE_SECONDS},
+        "lookups": lookups,
         "wallets": cached_wallets
     }
 
@@ -1505,9 +2851,51 @@ async def clear_cache():
     """Manually clear all cache"""
     global nansen_cache
     count = len(nansen_cache)
+    for data in nansen_cache.values():
+        for data_type in data:
+            nansen_cache_evictions.inc(data_type, "cleared")
     nansen_cache = {}
     return {"status": "success", "cleared": count}
 
+# Scrape-time gauges: read from in-memory state only (no database queries), so scraping every few seconds is cheap
+metrics.gauge_callback("ws_connections", "Open chat WebSocket connections", (),
+                       lambda: {(): manager.describe()["connections"]})
+metrics.gauge_callback("ws_rooms", "Chat rooms with a local WebSocket connection", (),
+                       lambda: {(): len(manager.rooms)})
+metrics.gauge_callback("ws_queued_frames", "Frames waiting in WebSocket send queues", (),
+                       lambda: {(): manager.describe()["queued_frames"]})
+metrics.gauge_callback("ws_events_total", "WebSocket fan-out events", ("event",),
+                       lambda: {(event,): count for event, count in manager.stats.items()}, kind="counter")
+metrics.gauge_callback("event_loop_lag_last_seconds", "Event loop lag at the last check", (),
+                       lambda: {(): loop_lag.last_lag})
+metrics.gauge_callback("nansen_cache_wallets", "Wallets in the Nansen cache", (),
+                       lambda: {(): len(nansen_cache)})
+metrics.gauge_callback("nansen_rate_limit_window_requests", "Nansen calls in the rate limiter's 60s window", (),
+                       lambda: {(): len(rate_limiter['requests'])})
+metrics.gauge_callback("cache_entries", "Entries in in-memory caches", ("cache",),
+                       lambda: {("profile_cards",): len(profile_cards.entries), ("chat_rooms",): len(chat_rooms.rooms),
+                                ("signatures",): len(signature_verifier.verified),
+                                ("session_tokens",): len(session_token_cache)})
+metrics.gauge_callback("cache_events_total", "In-memory cache hits, misses and evictions", ("cache", "event"),
+                       lambda: {(cache, event): count
+                                for cache, stats in (("profile_cards", profile_cards.stats), ("chat_rooms", chat_rooms.stats),
+                                                     ("signatures", signature_verifier.stats))
+                                for event, count in stats.items()}, kind="counter")
+metrics.gauge_callback("write_buffer_pending", "Writes waiting in write-behind buffers", ("buffer",),
+                       lambda: {("swipes",): len(swipe_buffer.buffer), ("messages",): len(message_writer.pending)})
+metrics.gauge_callback("cpu_pool_queue_depth", "CPU pool jobs waiting or running", ("task",),
+                       lambda: {(task,): stats["queued"] for task, stats in cpu_pool.tasks.items()})
+metrics.gauge_callback("cpu_pool_wait_seconds_total", "Time CPU pool jobs waited for a worker", ("task",),
+                       lambda: {(task,): stats["wait_ms_total"] / 1000 for task, stats in cpu_pool.tasks.items()},
+                       kind="counter")
+metrics.gauge_callback("cpu_pool_jobs_total", "CPU pool jobs finished", ("task",),
+                       lambda: {(task,): stats["completed"] for task, stats in cpu_pool.tasks.items()}, kind="counter")
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics (text exposition format)"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/")
 async def root():
     return {"message": "Smart Money Tinder API", "status": "running", "cache_enabled": True}
@@ -0,0 +1,403 @@
+"""
+Full-text search over chat messages
+- SQLite: contentless FTS5 table `messages_fts` kept in sync by
+  insert/delete/update triggers. Its rowids come from `messages_fts_ids`
+  (message id -> INTEGER PRIMARY KEY, plus the message's room), so entries
+  stay tied to messages.id - the implicit rowid of `messages` (TEXT primary
+  key) can change on VACUUM. It also indexes each message's room as one
+  token, so the caller's rooms are intersected inside the index instead of
+  filtering every match of a common word afterwards.
+- Postgres: trigger-maintained `messages.search_vector` tsvector column + GIN
+  index, combined with the (chat_room_id, created_at) index by the planner.
+  On a database that already has messages it is built by a one-off migration,
+  `python message_search.py migrate`: the column is added without a table
+  rewrite, filled in batches, and indexed with CREATE INDEX CONCURRENTLY, so
+  writes keep going. Search is unavailable until then.
+Both use plain word tokens (no stemming - tickers and slang stay intact); the
+last word of a query (3+ characters) also matches as a prefix. Results are
+limited to rooms the caller is part of, best match first, with keyset cursor
+pagination.
+
+Archived rooms (see chat_archive.py) stay indexed: when the archiver deletes
+a room's messages, SQLite keeps their FTS entries and Postgres moves their
+vectors into `chat_archive_search` (both by trigger, since the chat_archive
+row is written first); rehydration reverses it. Archived matches rank with
+live ones; only the blobs of archived rooms on the returned page are decoded.
+"""
+
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from chat_archive import decode_messages
+
+# Words kept from a query (everything else is dropped, so user input can't break the query syntax)
+MAX_QUERY_TERMS = 8
+MIN_PREFIX_LENGTH = 3  # Shorter prefixes expand to too many terms
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Rows per transaction when the Postgres migration fills search_vector
+SEARCH_BACKFILL_BATCH = int(os.getenv("SEARCH_BACKFILL_BATCH", "5000"))
+
+
+def query_terms(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())[:MAX_QUERY_TERMS]
+
+
+def room_token(chat_room_id: str) -> str:
+    """A room id as a single FTS token (uuid without the dashes)"""
+    return chat_room_id.replace("-", "")
+
+
+class MessageSearch:
+    """Search index management + ranked, room-scoped queries"""
+
+    def __init__(self, database, archive=None):
+        self.db = database
+        self.archive = archive  # ChatArchive - text of archived matches is read from its blobs
+        self.available = True
+        self.stats = {"searches": 0, "archived_hits": 0, "last_search_ms": 0.0}
+
+    def ensure_index(self, cursor) -> bool:
+        """Create the search index if it's missing and backfill it; returns True if it was built
+
+        On Postgres only an empty messages table is indexed here - otherwise see migrate_postgres.
+        """
+        if self.db.use_postgres:
+            if 'search_vector' in self.db.table_columns(cursor, 'messages'):
+                return False
+            cursor.execute("SELECT 1 FROM messages LIMIT 1")
+            if cursor.fetchone():
+                return False  # check_ready() reports it
+            self.install_postgres(cursor)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_search ON messages USING GIN (search_vector)")
+            return True
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE name IN ('messages_fts', 'messages_fts_ids')")
+        if {row[0] for row in cursor.fetchall()} == {'messages_fts', 'messages_fts_ids'} \
+                and 'chat_room_id' in self.db.table_columns(cursor, 'messages_fts_ids'):
+            return False
+        # Earlier layouts (keyed on messages.rowid, or without the room of archived entries) are rebuilt
+        for trigger in ('messages_fts_insert', 'messages_fts_delete', 'messages_fts_update'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute("DROP TABLE IF EXISTS messages_fts")
+        cursor.execute("DROP TABLE IF EXISTS messages_fts_ids")
+        cursor.execute("""CREATE TABLE messages_fts_ids
+                          (fts_rowid INTEGER PRIMARY KEY,
+                           message_id TEXT NOT NULL UNIQUE,
+                           chat_room_id TEXT NOT NULL)""")
+        cursor.execute("""CREATE VIRTUAL TABLE messages_fts USING fts5(
+                              message, room, content='', tokenize='unicode61')""")
+        # Rehydrated messages are still indexed - only messages new to the index are added
+        cursor.execute("""CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages
+                          WHEN NOT EXISTS (SELECT 1 FROM messages_fts_ids WHERE message_id = new.id) BEGIN
+                              INSERT INTO messages_fts_ids (message_id, chat_room_id) VALUES (new.id, new.chat_room_id);
+                              INSERT INTO messages_fts (rowid, message, room)
+                              VALUES (last_insert_rowid(), new.message, replace(new.chat_room_id, '-', ''));
+                          END""")
+        # The archiver writes the chat_archive row before deleting the room's messages - keep them indexed
+        cursor.execute("""CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages
+                          WHEN NOT EXISTS (SELECT 1 FROM chat_archive WHERE chat_room_id = old.chat_room_id) BEGIN
+                              INSERT INTO messages_fts (messages_fts, rowid, message, room)
+                              SELECT 'delete', fts_rowid, old.message, replace(old.chat_room_id, '-', '')
+                              FROM messages_fts_ids WHERE message_id = old.id;
+                              DELETE FROM messages_fts_ids WHERE message_id = old.id;
+                          END""")
+        cursor.execute("""CREATE TRIGGER messages_fts_update AFTER UPDATE OF message, chat_room_id ON messages BEGIN
+                              INSERT INTO messages_fts (messages_fts, rowid, message, room)
+                              SELECT 'delete', fts_rowid, old.message, replace(old.chat_room_id, '-', '')
+                              FROM messages_fts_ids WHERE message_id = old.id;
+                              UPDATE messages_fts_ids SET chat_room_id = new.chat_room_id WHERE message_id = new.id;
+                              INSERT INTO messages_fts (rowid, message, room)
+                              SELECT fts_rowid, new.message, replace(new.chat_room_id, '-', '')
+                              FROM messages_fts_ids WHERE message_id = new.id;
+                          END""")
+        cursor.execute("INSERT INTO messages_fts_ids (message_id, chat_room_id) SELECT id, chat_room_id FROM messages")
+        cursor.execute("""INSERT INTO messages_fts (rowid, message, room)
+                          SELECT i.fts_rowid, m.message, replace(m.chat_room_id, '-', '')
+                          FROM messages_fts_ids i JOIN messages m ON m.id = i.message_id""")
+        cursor.execute("SELECT chat_room_id, messages FROM chat_archive")
+        for room, blob in cursor.fetchall():
+            messages = decode_messages(blob)
+            cursor.executemany("INSERT OR IGNORE INTO messages_fts_ids (message_id, chat_room_id) VALUES (?, ?)",
+                               [(m['id'], room) for m in messages])
+            cursor.executemany("""INSERT INTO messages_fts (rowid, message, room)
+                                  SELECT fts_rowid, ?, ? FROM messages_fts_ids WHERE message_id = ?""",
+                               [(m['message'], room_token(room), m['id']) for m in messages])
+        return True
+
+    def install_postgres(self, cursor, generated: bool = False):
+        """Postgres: search_vector column + trigger and the archived-room index (catalog changes only)
+
+        `generated`: search_vector is already a generated column (first version).
+        """
+        if not generated:
+            cursor.execute("ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector")
+            cursor.execute("""CREATE OR REPLACE FUNCTION messages_search_vector() RETURNS trigger AS $$
+                              BEGIN
+                                  NEW.search_vector := to_tsvector('simple', NEW.message);
+                                  RETURN NEW;
+                              END
+                              $$ LANGUAGE plpgsql""")
+            cursor.execute("DROP TRIGGER IF EXISTS messages_search_vector ON messages")
+            cursor.execute("""CREATE TRIGGER messages_search_vector BEFORE INSERT OR UPDATE OF message ON messages
+                              FOR EACH ROW EXECUTE FUNCTION messages_search_vector()""")
+
+        cursor.execute("""CREATE TABLE IF NOT EXISTS chat_archive_search
+                          (message_id TEXT PRIMARY KEY,
+                           chat_room_id TEXT NOT NULL,
+                           search_vector tsvector NOT NULL)""")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_archive_search_room ON chat_archive_search (chat_room_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_archive_search ON chat_archive_search USING GIN (search_vector)")
+        # The archiver writes the chat_archive row before deleting the room's messages
+        cursor.execute("""CREATE OR REPLACE FUNCTION messages_search_archive() RETURNS trigger AS $$
+                          BEGIN
+                              IF EXISTS (SELECT 1 FROM chat_archive WHERE chat_room_id = OLD.chat_room_id) THEN
+                                  INSERT INTO chat_archive_search (message_id, chat_room_id, search_vector)
+                                  VALUES (OLD.id, OLD.chat_room_id,
+                                          COALESCE(OLD.search_vector, to_tsvector('simple', OLD.message)))
+                                  ON CONFLICT DO NOTHING;
+                              END IF;
+                              RETURN NULL;
+                          END
+                          $$ LANGUAGE plpgsql""")
+        cursor.execute("DROP TRIGGER IF EXISTS messages_search_archive ON messages")
+        cursor.execute("""CREATE TRIGGER messages_search_archive AFTER DELETE ON messages
+                          FOR EACH ROW EXECUTE FUNCTION messages_search_archive()""")
+        # Rehydration deletes the chat_archive row, then re-inserts the messages (indexed again by the trigger above)
+        cursor.execute("""CREATE OR REPLACE FUNCTION chat_archive_search_drop() RETURNS trigger AS $$
+                          BEGIN
+                              DELETE FROM chat_archive_search WHERE chat_room_id = OLD.chat_room_id;
+                              RETURN NULL;
+                          END
+                          $$ LANGUAGE plpgsql""")
+        cursor.execute("DROP TRIGGER IF EXISTS chat_archive_search_drop ON chat_archive")
+        cursor.execute("""CREATE TRIGGER chat_archive_search_drop AFTER DELETE ON chat_archive
+                          FOR EACH ROW EXECUTE FUNCTION chat_archive_search_drop()""")
+
+    def migrate_postgres(self, batch_size: int = SEARCH_BACKFILL_BATCH):
+        """One-off Postgres index build on a live database (resumable - rerun it if it stops)
+
+        Only brief locks: adding a nullable column and triggers is a catalog
+        change, rows are filled in primary key order one batch per transaction,
+        and the GIN index is built CONCURRENTLY.
+        """
+        start = time.time()
+        with self.db.get_connection() as conn:
+            conn.autocommit = True  # One transaction per statement; CREATE INDEX CONCURRENTLY needs it
+            cursor = conn.cursor()
+            cursor.execute("""SELECT is_generated FROM information_schema.columns
+                              WHERE table_name = 'messages' AND column_name = 'search_vector'""")
+            row = cursor.fetchone()
+            generated = bool(row) and row[0] == 'ALWAYS'  # Built at startup by the first version
+            cursor.execute("SET lock_timeout = '5s'")  # Fail instead of queueing writes behind the ALTER
+            self.install_postgres(cursor, generated=generated)
+            cursor.execute("RESET lock_timeout")
+            print("✅ search_vector column + triggers in place (new and archived messages are indexed from now on)")
+
+            filled, last_id = 0, ""
+            while not generated:
+                cursor.execute("SELECT id FROM messages WHERE id > %s ORDER BY id LIMIT %s", (last_id, batch_size))
+                ids = [row[0] for row in cursor.fetchall()]
+                if not ids:
+                    break
+                cursor.execute("""UPDATE messages SET search_vector = to_tsvector('simple', message)
+                                  WHERE id = ANY(%s) AND search_vector IS NULL""", (ids,))
+                filled += cursor.rowcount
+                last_id = ids[-1]
+            print(f"✅ Filled search_vector for {filled} messages")
+
+            # Rooms archived before chat_archive_search existed
+            cursor.execute("""SELECT chat_room_id FROM chat_archive a
+                              WHERE NOT EXISTS (SELECT 1 FROM chat_archive_search s
+                                                WHERE s.chat_room_id = a.chat_room_id)""")
+            rooms = [row[0] for row in cursor.fetchall()]
+            for room in rooms:
+                cursor.execute("SELECT messages FROM chat_archive WHERE chat_room_id = %s", (room,))
+                row = cursor.fetchone()
+                if row is None:
+                    continue  # Rehydrated meanwhile
+                cursor.execute("BEGIN")
+                cursor.executemany("""INSERT INTO chat_archive_search (message_id, chat_room_id, search_vector)
+                                      SELECT %s, %s, to_tsvector('simple', %s)
+                                      WHERE EXISTS (SELECT 1 FROM chat_archive WHERE chat_room_id = %s)
+                                      ON CONFLICT DO NOTHING""",
+                                   [(m['id'], room, m['message'], room) for m in decode_messages(row[0])])
+                cursor.execute("COMMIT")
+            print(f"✅ Indexed {len(rooms)} archived chat rooms")
+
+            # A failed concurrent build leaves an invalid index behind
+            cursor.execute("""SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+                              WHERE c.relname = 'idx_messages_search'""")
+            row = cursor.fetchone()
+            if row and not row[0]:
+                cursor.execute("DROP INDEX CONCURRENTLY idx_messages_search")
+            cursor.execute("""CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_search
+                              ON messages USING GIN (search_vector)""")
+        print(f"✅ Message search index built in {time.time() - start:.1f}s - restart the app to enable search")
+
+    def check_ready(self) -> bool:
+        """Startup check (every start, also on the schema fast path): Postgres search needs the migrated index"""
+        if self.db.use_postgres:
+            row = self.db.execute_one("""SELECT i.indisvalid AS valid, to_regclass('chat_archive_search') AS archived
+                                         FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+                                         WHERE c.relname = 'idx_messages_search'""")
+            self.available = bool(row and row['valid'] and row['archived'])
+            if not self.available:
+                print("⚠️ Message search unavailable until its index is built: python message_search.py migrate")
+        return self.available
+
+    def hydrate_archived(self, rows: List[dict]) -> List[dict]:
+        """Fill in sender, text and time of archived matches from their rooms' blobs (rooms on this page only)"""
+        missing = [row for row in rows if row['message'] is None]
+        if not missing:
+            return rows
+        found = {}
+        if self.archive is not None:
+            for messages in self.archive.messages(list({row['chat_room_id'] for row in missing})).values():
+                found.update((m['id'], m) for m in messages)
+        unresolved = [row['id'] for row in missing if row['id'] not in found]
+        if unresolved:  # Rehydrated since the index lookup
+            ph = self.db.placeholder()
+            found.update((m['id'], m) for m in self.db.execute_query(
+                f"""SELECT id, sender_id, message, created_at FROM messages
+                    WHERE id IN ({", ".join([ph] * len(unresolved))})""", tuple(unresolved)))
+        self.stats["archived_hits"] += len(missing)
+        hydrated = []
+        for row in rows:
+            if row['message'] is None:
+                message = found.get(row['id'])
+                if message is None:
+                    continue  # Deleted outright
+                row = {**row, "sender_id": message['sender_id'], "message": message['message'],
+                       "created_at": message['created_at']}
+            hydrated.append(row)
+        return hydrated
+
+    def search(self, chat_room_ids: List[str], text: str, limit: int,
+               after: Optional[Tuple[str, str]] = None) -> Tuple[List[dict], bool]:
+        """Best-matching messages in the given rooms; returns (rows, has_more)
+
+        Rows carry id, chat_room_id, sender_id, message, created_at and score
+        (lower = better); `after` is the (score, id) of the last row of the
+        previous page.
+        """
+        terms = query_terms(text)
+        if not terms or not chat_room_ids:
+            return [], False
+        ph = self.db.placeholder()
+        start = time.perf_counter()
+        prefix = len(terms[-1]) >= MIN_PREFIX_LENGTH
+        room_placeholders = ", ".join([ph] * len(chat_room_ids))
+
+        if self.db.use_postgres:
+            # Rounded so the score survives the cursor round trip exactly
+            match = " & ".join(terms[:-1] + [terms[-1] + (":*" if prefix else "")])
+            ranked = f"""SELECT m.id, m.chat_room_id, m.sender_id, m.message, m.created_at,
+                                -ROUND(ts_rank(m.search_vector, q)::numeric, 6) AS score
+                         FROM messages m, to_tsquery('simple', {ph}) q
+                         WHERE m.search_vector @@ q 
+                         AND m.chat_room_id IN ({room_placeholders})
+                         UNION ALL
+                         SELECT a.message_id, a.chat_room_id, NULL, NULL, NULL,
+                                -ROUND(ts_rank(a.search_vector, q)::numeric, 6)
+                         FROM chat_archive_search a, to_tsquery('simple', {ph}) q
+                         WHERE a.search_vector @@ q 
+                         AND a.chat_room_id IN ({room_placeholders})"""
+            params = [match, *chat_room_ids, match, *chat_room_ids]
+        else:
+            words = " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"' + ("*" if prefix else "")
+            rooms = " OR ".join(f'"{room_token(room)}"' for room in chat_room_ids)
+            match = f"message : ({words}) AND room : ({rooms})"
+            # No messages row = archived room
+            ranked = f"""SELECT i.message_id AS id, i.chat_room_id, m.sender_id, m.message, m.created_at, f.score
+                         FROM (SELECT rowid, bm25(messages_fts, 1.0, 0.0) AS score 
+                               FROM messages_fts WHERE messages_fts MATCH {ph}) f
+                         JOIN messages_fts_ids i ON i.fts_rowid = f.rowid
+                         LEFT JOIN messages m ON m.id = i.message_id"""
+            params = [match]
+
+        page_clause = ""
+        if after:
+            page_clause = f"WHERE score > {ph} OR (score = {ph} AND id > {ph})"
+            params += [after[0], after[0], after[1]]
+        params.append(limit + 1)
+        rows = self.db.execute_query(f"""SELECT * FROM ({ranked}) ranked
+                                         {page_clause}
+                                         ORDER BY score, id
+                                         LIMIT {ph}""", tuple(params))
+        has_more = len(rows) > limit
+        rows = self.hydrate_archived(rows[:limit])
+
+        self.stats["searches"] += 1
+        self.stats["last_search_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return rows, has_more
+
+    def describe(self) -> Dict:
+        return {"available": self.available, "backend": "tsvector" if self.db.use_postgres else "fts5",
+                **self.stats}
+
+
+if __name__ == "__main__":
+    # One-off Postgres index build: DATABASE_URL=... python message_search.py migrate
+    # Latency benchmark (SQLite, temp dir): python message_search.py [messages] [rooms]
+    import random
+    import sys
+    import tempfile
+    import uuid
+
+    if sys.argv[1:2] == ["migrate"]:
+        from database import db
+        if not db.use_postgres:
+            sys.exit("The search migration is for Postgres - SQLite builds its index at startup")
+        MessageSearch(db).migrate_postgres()
+        sys.exit()
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    room_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    os.chdir(tempfile.mkdtemp())
+    from database import db
+
+    db.init_db()
+    words = [f"w{i}" for i in range(20000)] + ["gm", "sol", "jup", "bonk", "wen", "moon", "rug", "alpha"]
+    rooms = [str(uuid.uuid4()) for _ in range(room_count)]
+    # ~20 rooms per user
+    user_count = max(2, room_count // 10)
+    pairs = set()
+    while len(pairs) < room_count:
+        pairs.add(tuple(sorted(random.sample(range(1, user_count + 1), 2))))
+    pairs = list(pairs)
+    with db.get_connection() as conn:
+        conn.executemany("INSERT INTO matches (id, user1_id, user2_id, chat_room_id) VALUES (?, ?, ?, ?)",
+                         [(str(uuid.uuid4()), a, b, room) for (a, b), room in zip(pairs, rooms)])
+        conn.executemany("INSERT INTO messages (id, chat_room_id, sender_id, message, created_at) VALUES (?, ?, ?, ?, ?)",
+                         [(str(uuid.uuid4()), random.choice(rooms), 1,
+                           " ".join(random.choices(words, k=random.randint(3, 15))), "2025-01-01T00:00:00")
+                          for _ in range(count)])
+        conn.commit()
+
+    index = MessageSearch(db)
+    start = time.perf_counter()
+    with db.get_connection() as conn:
+        index.ensure_index(conn.cursor())
+        conn.commit()
+    print(f"{count} messages in {room_count} rooms - index built in {time.perf_counter() - start:.1f}s")
+
+    user_rooms = {}
+    for (a, b), room in zip(pairs, rooms):
+        user_rooms.setdefault(a, []).append(room)
+        user_rooms.setdefault(b, []).append(room)
+    users = random.sample(sorted(user_rooms), min(50, len(user_rooms)))
+    for q in ["w123", "w77 w1", "alpha moon", "bonk"]:
+        start = time.perf_counter()
+        for user in users:
+            index.search(user_rooms[user], q, 20)
+        index_ms = (time.perf_counter() - start) / len(users) * 1000
+        start = time.perf_counter()
+        for user in users[:5]:
+            room_list = user_rooms[user]
+            db.execute_query(f"""SELECT id FROM messages WHERE chat_room_id IN ({", ".join("?" * len(room_list))})
+                                 AND ({" AND ".join(["message LIKE ?"] * len(q.split()))})""",
+                             (*room_list, *[f"%{word}%" for word in q.split()]))
+        like_ms = (time.perf_counter() - start) / 5 * 1000
+        print(f"  {q!r:<14} index: {index_ms:7.2f} ms   LIKE scan of the user's rooms: {like_ms:8.2f} ms")
@@ -0,0 +1,233 @@
+"""
+Group commit for chat messages
+Concurrent senders hand their message to one writer task, which commits
+everything that arrived within MESSAGE_COMMIT_WINDOW_MS (or while the previous
+commit was running) as a single transaction. Each sender's future resolves
+only after that commit, so callers broadcast a message once it is durable.
+A busy room pays one commit/fsync per batch instead of one per message.
+If a batch fails, its messages are retried one per transaction so only the
+bad message fails.
+
+Each message gets the next per-room `seq` inside its insert. SQLite has a
+single writer; Postgres batches take a transaction advisory lock per room. So
+a room's seq order is its commit order, and a sync cursor (the last seq a
+client has) never skips a message that becomes visible later.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+MESSAGE_GROUP_COMMIT = os.getenv("MESSAGE_GROUP_COMMIT", "true").lower() == "true"
+MESSAGE_COMMIT_WINDOW_MS = float(os.getenv("MESSAGE_COMMIT_WINDOW_MS", "2"))
+MESSAGE_COMMIT_BATCH_SIZE = int(os.getenv("MESSAGE_COMMIT_BATCH_SIZE", "200"))
+
+
+def room_lock_key(chat_room_id: str) -> int:
+    """Postgres advisory lock key (signed 64-bit) for a room's seq numbers"""
+    return int.from_bytes(hashlib.blake2b(chat_room_id.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+class MessageGroupCommit:
+    """Batches message inserts from concurrent senders into shared transactions"""
+
+    def __init__(self, database, wallet_ids, enabled: bool = MESSAGE_GROUP_COMMIT,
+                 window_ms: float = MESSAGE_COMMIT_WINDOW_MS, batch_size: int = MESSAGE_COMMIT_BATCH_SIZE,
+                 before_write: Optional[Callable] = None):
+        self.db = database
+        self.wallet_ids = wallet_ids
+        # before_write(cursor, chat_room_ids) runs first in each batch transaction (archived room rehydration)
+        self.before_write = before_write
+        self.enabled = enabled
+        self.window = window_ms / 1000
+        self.batch_size = batch_size
+        self.pending: List[Tuple[dict, asyncio.Future]] = []
+        # Created by run() so each lifespan's writer binds to its own event loop
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.running = False
+        self.closing = False
+        self.stats = {"messages": 0, "commits": 0, "duplicates": 0, "failed_commits": 0,
+                      "failed_messages": 0, "max_batch": 0, "last_commit_ms": 0.0}
+
+    def write_batch(self, entries: List[dict]) -> List[Tuple[dict, bool]]:
+        """Insert messages in one transaction; returns (broadcast payload, duplicate) per entry
+
+        Entries are {chat_room_id, sender_wallet, message, client_id}. A message whose
+        (sender, client_id) is already stored - earlier or in this batch - is not
+        inserted again; the stored message comes back with duplicate=True.
+        Payloads carry the message's room `seq` (the caller turns it into a sync cursor).
+        """
+        ph = self.db.placeholder()
+        sender_ids = self.wallet_ids.get_ids({e["sender_wallet"] for e in entries})
+        results = []
+        start = time.perf_counter()
+        with self.db.get_connection() as conn:
+            cursor = self.db.get_cursor(conn)
+            if self.db.use_postgres:
+                # Held until commit; sorted so concurrent batches can't deadlock
+                for key in sorted({room_lock_key(e["chat_room_id"]) for e in entries}):
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (key,))
+            if self.before_write:
+                self.before_write(cursor, [e["chat_room_id"] for e in entries])
+            for e in entries:
+                sender_id = sender_ids[e["sender_wallet"]]
+                message = {
+                    "id": str(uuid.uuid4()),
+                    "sender_wallet": e["sender_wallet"],
+                    "message": e["message"],
+                    "created_at": datetime.now().isoformat()
+                }
+                cursor.execute(f"""INSERT INTO messages (id, chat_room_id, sender_id, message, created_at, client_id, seq)
+                                   VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph},
+                                           (SELECT COALESCE(MAX(seq), 0) + 1 FROM messages WHERE chat_room_id = {ph}))
+                                   ON CONFLICT DO NOTHING
+                                   RETURNING seq""",
+                               (message["id"], e["chat_room_id"], sender_id, message["message"],
+                                message["created_at"], e.get("client_id"), e["chat_room_id"]))
+                row = cursor.fetchone()
+                duplicate = row is None
+                if duplicate:
+                    cursor.execute(f"""SELECT id, message, created_at, seq FROM messages
+                                       WHERE sender_id = {ph} AND client_id = {ph}""",
+                                   (sender_id, e["client_id"]))
+                    row = cursor.fetchone()
+                    message["id"], message["message"], message["created_at"] = row['id'], row['message'], row['created_at']
+                    self.stats["duplicates"] += 1
+                message["seq"] = row['seq']
+                if e.get("client_id"):
+                    message["client_id"] = e["client_id"]
+                results.append((message, duplicate))
+            conn.commit()
+
+        self.stats["messages"] += len(entries)
+        self.stats["commits"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(entries))
+        self.stats["last_commit_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return results
+
+    async def submit(self, entry: dict) -> Tuple[dict, bool]:
+        """Queue a message and wait until its batch is committed"""
+        if not self.enabled or not self.running:
+            return (await asyncio.to_thread(self.write_batch, [entry]))[0]
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((entry, future))
+        self.wakeup.set()
+        return await future
+
+    async def _commit(self, batch: List[Tuple[dict, asyncio.Future]]):
+        try:
+            results = await asyncio.to_thread(self.write_batch, [entry for entry, _ in batch])
+        except Exception as e:
+            self.stats["failed_commits"] += 1
+            if len(batch) > 1:
+                # The whole transaction rolled back - retry one message per transaction
+                print(f"⚠️ Message commit failed ({len(batch)} messages), retrying one by one: {e}")
+                for item in batch:
+                    await self._commit([item])
+                return
+            self.stats["failed_messages"] += 1
+            print(f"❌ Message commit failed: {e}")
+            _, future = batch[0]
+            if not future.done():
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():  # The sender may have gone away; the message is stored either way
+                future.set_result(result)
+
+    def start(self):
+        """Start the writer task (lifespan startup)"""
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        """Writer task: one transaction per window (messages arriving mid-commit form the next batch)"""
+        self.wakeup = asyncio.Event()
+        self.closing = False
+        self.running = True
+        try:
+            while not self.closing or self.pending:
+                await self.wakeup.wait()
+                if self.window and len(self.pending) < self.batch_size and not self.closing:
+                    await asyncio.sleep(self.window)
+                self.wakeup.clear()
+                batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+                if self.pending:
+                    self.wakeup.set()
+                if batch:
+                    await self._commit(batch)
+        finally:
+            self.running = False
+
+    async def close(self):
+        """Stop the writer task once everything queued is committed (shutdown)"""
+        self.running = False  # Messages sent from here on are written directly
+        if self.task is not None and not self.task.done():
+            self.closing = True
+            self.wakeup.set()
+            await self.task
+        self.task = None
+        while self.pending:  # Writer task died - commit the leftovers here
+            batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+            await self._commit(batch)
+
+    def describe(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self.pending),
+            "window_ms": self.window * 1000,
+            "messages_per_commit": round(self.stats["messages"] / self.stats["commits"], 2) if self.stats["commits"] else 0.0,
+            **self.stats
+        }
+
+
+if __name__ == "__main__":
+    # Throughput benchmark (SQLite, temp dir): python message_writer.py [senders] [messages_per_sender]
+    import sys
+    import tempfile
+
+    senders = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    per_sender = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    os.chdir(tempfile.mkdtemp())
+    from database import db
+    from wallet_ids import WalletIdMap
+
+    db.init_db()
+    wallet_map = WalletIdMap(db)
+    wallets = [f"wallet{i}" for i in range(senders)]
+    wallet_map.get_ids(wallets)
+
+    def entry(i: int, n: int) -> dict:
+        return {"chat_room_id": f"room{i % 10}", "sender_wallet": wallets[i], "message": f"gm {n}",
+                "client_id": None}
+
+    async def send_all(writer: MessageGroupCommit) -> float:
+        async def sender(i):
+            for n in range(per_sender):
+                await writer.submit(entry(i, n))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(sender(i) for i in range(senders)))
+        return time.perf_counter() - start
+
+    async def main():
+        total = senders * per_sender
+        one_by_one = MessageGroupCommit(db, wallet_map, enabled=False)
+        sync_seconds = await send_all(one_by_one)
+
+        grouped = MessageGroupCommit(db, wallet_map)
+        grouped.start()
+        await asyncio.sleep(0)
+        group_seconds = await send_all(grouped)
+        await grouped.close()
+
+        print(f"{total} messages from {senders} concurrent senders")
+        print(f"  commit per message: {total / sync_seconds:8.0f} msg/s, {one_by_one.stats['commits']} commits")
+        print(f"  group commit:       {total / group_seconds:8.0f} msg/s, {grouped.stats['commits']} commits "
+              f"({grouped.describe()['messages_per_commit']} messages/commit)")
+
+    asyncio.run(main())
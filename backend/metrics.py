@@ -0,0 +1,224 @@
+"""
+Prometheus metrics - counters, histograms and scrape-time gauges in the text
+exposition format (no client library needed)
+Recording is a lock + a few list/dict updates, so it can sit on hot paths
+(every request, every DB query). Gauges read in-memory stats only when
+scraped, so a scrape costs one pass over the existing series and never
+touches the database.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Seconds - from sub-millisecond cache hits to slow Nansen calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG_INTERVAL_SECONDS = 0.5
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+             for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.values: Dict[Tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = list(self.values.items())
+        lines += [f"{self.name}{format_labels(self.labels, key)} {format_value(value)}" for key, value in items]
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self.series: Dict[Tuple, list] = {}
+        self.lock = threading.Lock()
+        self.prefixes: Dict[Tuple, Tuple[List[str], str, str]] = {}  # Formatted sample names per series
+
+    def _prefixes(self, key: Tuple) -> Tuple[List[str], str, str]:
+        prefixes = self.prefixes.get(key)
+        if prefixes is None:
+            labels = format_labels(self.labels, key)
+            buckets = [f"{self.name}_bucket{format_labels(self.labels, key, f'le={chr(34)}{format_value(bound)}{chr(34)}')} "
+                       for bound in self.buckets + (math.inf,)]
+            prefixes = self.prefixes[key] = (buckets, f"{self.name}_sum{labels} ", f"{self.name}_count{labels} ")
+        return prefixes
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self.series.items()]
+        for key, counts, total, count in items:
+            buckets, sum_prefix, count_prefix = self._prefixes(key)
+            cumulative = 0
+            for prefix, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{prefix}{cumulative}")
+            lines.append(f"{sum_prefix}{format_value(total)}")
+            lines.append(f"{count_prefix}{count}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge or counter whose samples are read from in-memory state at scrape time
+
+    `collect` returns {label values tuple: value}; a failing callback is skipped.
+    """
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], collect: Callable[[], Dict[Tuple, float]],
+                 kind: str = "gauge"):
+        self.name, self.help, self.labels, self.collect, self.kind = name, help_text, labels, collect, kind
+
+    def render(self) -> List[str]:
+        try:
+            samples = self.collect()
+        except Exception as e:
+            print(f"⚠️ Metric {self.name} failed: {e}")
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{format_labels(self.labels, key)} {format_value(value)}"
+                  for key, value in samples.items() if value is not None]
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(name, help_text, tuple(labels)))
+
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, tuple(labels), buckets))
+
+    def gauge_callback(self, name: str, help_text: str, labels: Iterable[str],
+                       collect: Callable[[], Dict[Tuple, float]], kind: str = "gauge") -> CallbackMetric:
+        return self._add(CallbackMetric(name, help_text, tuple(labels), collect, kind))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing HTTP requests per route template (not raw path - ids would explode the series)"""
+
+    def __init__(self, app, histogram: Histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.histogram.observe(time.perf_counter() - start, scope["method"],
+                                   getattr(route, "path", "unmatched"), status)
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping task (time other work held the loop)"""
+
+    def __init__(self, histogram: Histogram, interval: float = LOOP_LAG_INTERVAL_SECONDS):
+        self.histogram = histogram
+        self.interval = interval
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.histogram.observe(lag)
+
+
+if __name__ == "__main__":
+    # Overhead benchmark: python metrics.py [series]
+    import random
+    import sys
+
+    series = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    registry = Registry()
+    latency = registry.histogram("http_request_duration_seconds", "Request latency", ("method", "route", "status"))
+    queries = registry.counter("db_queries_total", "Queries", ("op",))
+    routes = [f"/api/route{i}/{{id}}" for i in range(series)]
+
+    iterations = 200000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        latency.observe(random.random() / 10, "GET", random.choice(routes), 200)
+    observe_us = (time.perf_counter() - start) / iterations * 1e6
+    start = time.perf_counter()
+    for _ in range(iterations):
+        queries.inc("query")
+    inc_us = (time.perf_counter() - start) / iterations * 1e6
+
+    start = time.perf_counter()
+    for _ in range(100):
+        body = registry.render()
+    render_ms = (time.perf_counter() - start) / 100 * 1000
+    print(f"  histogram observe: {observe_us:6.2f} µs   counter inc: {inc_us:6.2f} µs")
+    print(f"  scrape of {series} route series ({len(body) / 1024:.0f} KB): {render_ms:6.2f} ms")
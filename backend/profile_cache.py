@@ -0,0 +1,136 @@
+"""
+Profile card cache - per-wallet profile rows kept in memory
+Entries carry an ETag / Last-Modified pair for conditional GETs, derived from
+the row itself (Last-Modified = users.updated_at), so every worker sends the
+same validators for the same profile. Profile writes invalidate the entry in
+the worker that handled them; other workers reload it once it expires
+(PROFILE_CACHE_TTL_SECONDS, or PROFILE_CACHE_MISS_TTL_SECONDS for wallets
+without a profile - they may sign up any moment).
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict, List, Optional
+
+# Maximum number of cached profile cards (least recently used are dropped)
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "50000"))
+# How long a cached card is served before it is re-read (bounds staleness across workers)
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "60"))
+PROFILE_CACHE_MISS_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_MISS_TTL_SECONDS", "5"))
+
+
+def compute_etag(payload) -> str:
+    """Strong ETag over the JSON form of a payload"""
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return f'"{hashlib.sha1(encoded).hexdigest()[:20]}"'
+
+
+def format_http_date(timestamp: float) -> str:
+    """Format epoch seconds as an HTTP date (Last-Modified)"""
+    return formatdate(timestamp, usegmt=True)
+
+
+def is_not_modified(etag: str, last_modified: float,
+                    if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    """Evaluate conditional request headers (If-None-Match wins over If-Modified-Since)"""
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one-second resolution
+        return int(last_modified) <= int(since)
+    return False
+
+
+class ProfileCardCache:
+    """LRU cache of profile rows keyed by wallet (missing profiles are cached too)"""
+
+    def __init__(self, load_card: Callable[[str], Optional[dict]],
+                 load_cards: Optional[Callable[[List[str]], Dict[str, dict]]] = None,
+                 max_entries: int = PROFILE_CACHE_MAX_ENTRIES, ttl: float = PROFILE_CACHE_TTL_SECONDS,
+                 miss_ttl: float = PROFILE_CACHE_MISS_TTL_SECONDS):
+        self.load_card = load_card
+        self.load_cards = load_cards
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0, "evictions": 0}
+
+    def _store(self, wallet_address: str, card: Optional[dict]) -> Dict:
+        # The version column is only used for the validators (the etag covers it, so a rewrite
+        # with identical fields still counts as a change)
+        updated_at = card.pop('updated_at', None) if card else None
+        entry = {
+            "card": card,
+            "etag": compute_etag([card, updated_at]),
+            "last_modified": updated_at or 0.0,
+            "expires_at": time.monotonic() + (self.ttl if card else self.miss_ttl)
+        }
+        self.entries[wallet_address] = entry
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        return entry
+
+    def _fresh(self, wallet_address: str) -> Optional[Dict]:
+        entry = self.entries.get(wallet_address)
+        if entry is not None and entry["expires_at"] <= time.monotonic():
+            del self.entries[wallet_address]
+            self.stats["expired"] += 1
+            return None
+        return entry
+
+    def get(self, wallet_address: str) -> Dict:
+        """Return {'card', 'etag', 'last_modified'} for a wallet, loading it on a miss"""
+        entry = self._fresh(wallet_address)
+        if entry is not None:
+            self.stats["hits"] += 1
+            self.entries.move_to_end(wallet_address)
+            return entry
+
+        self.stats["misses"] += 1
+        return self._store(wallet_address, self.load_card(wallet_address))
+
+    def get_many(self, wallets: List[str]) -> Dict[str, Dict]:
+        """Entries for several wallets - all misses are loaded with one batch query"""
+        result = {}
+        missing = []
+        for wallet in wallets:
+            entry = self._fresh(wallet)
+            if entry is not None:
+                self.stats["hits"] += 1
+                self.entries.move_to_end(wallet)
+                result[wallet] = entry
+            else:
+                missing.append(wallet)
+
+        if missing:
+            self.stats["misses"] += len(missing)
+            if self.load_cards:
+                cards = self.load_cards(missing)
+            else:
+                cards = {wallet: self.load_card(wallet) for wallet in missing}
+            for wallet in missing:
+                result[wallet] = self._store(wallet, cards.get(wallet))
+        return result
+
+    def invalidate(self, wallet_address: str):
+        """Drop a wallet's card after its profile was written"""
+        if self.entries.pop(wallet_address, None) is not None:
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def describe(self) -> Dict:
+        return {"entries": len(self.entries), "max_entries": self.max_entries, "ttl_seconds": self.ttl,
+                "miss_ttl_seconds": self.miss_ttl, **self.stats}
@@ -0,0 +1,244 @@
+"""
+Candidate ranking engine for the swipe deck
+Keeps a columnar (NumPy) feature store per wallet and scores a whole candidate
+list in a single vectorized pass
+"""
+
+import json
+import math
+import os
+import time
+from datetime import datetime
+from itertools import repeat
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Default feature weights (override with RANKING_WEIGHTS='{"pnl": 2.0}' or POST /api/config/ranking)
+DEFAULT_RANKING_WEIGHTS = {
+    "pnl": 1.0,             # Realized PnL (signed, log-scaled)
+    "win_rate": 0.8,        # Win rate 0-100%
+    "trades": 0.4,          # Number of trades (log-scaled)
+    "balance": 0.6,         # Current USD balance (log-scaled)
+    "venue_match": 0.5,     # Same favourite_trading_venue as the viewer
+    "asset_match": 0.4,     # Same asset_choice_6m as the viewer
+    "country_match": 0.3,   # Same country as the viewer
+    "real_user": 1.5,       # Real signups ahead of demo traders
+    "recency": 0.2,         # Newer signups first (tie-breaker)
+}
+
+# Ranking must finish within this budget (100k candidates included)
+RANKING_LATENCY_BUDGET_MS = float(os.getenv("RANKING_LATENCY_BUDGET_MS", "75"))
+
+def load_weights_from_env() -> Dict[str, float]:
+    """Default weights merged with the RANKING_WEIGHTS environment variable"""
+    weights = dict(DEFAULT_RANKING_WEIGHTS)
+    raw = os.getenv("RANKING_WEIGHTS", "")
+    if raw:
+        try:
+            overrides = json.loads(raw)
+            weights.update({k: float(v) for k, v in overrides.items() if k in weights})
+        except (ValueError, TypeError, AttributeError) as e:
+            print(f"⚠️ Ignoring invalid RANKING_WEIGHTS: {e}")
+    return weights
+
+
+def _to_epoch(value) -> float:
+    """Convert a created_at value (datetime or SQLite string) to epoch seconds"""
+    if value is None:
+        return 0.0
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def _minmax(values: np.ndarray) -> np.ndarray:
+    """Scale a feature column to [0, 1] across the candidate batch (NaN = missing -> 0)"""
+    if values.size == 0 or np.isnan(values).all():
+        return np.zeros(values.size)
+    low = np.nanmin(values)
+    span = np.nanmax(values) - low
+    if span <= 0:
+        return np.zeros(values.size)
+    return np.nan_to_num((values - low) / span, nan=0.0, copy=False)
+
+
+class CandidateRanker:
+    """Columnar feature store + vectorized scorer"""
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, initial_capacity: int = 1024):
+        self.weights = weights or load_weights_from_env()
+        self.index: Dict[str, int] = {}
+        # Row 0 is a sentinel for unknown wallets (all features missing)
+        self.size = 1
+        self.capacity = 0
+
+        # Categorical profile fields are interned to small integer codes
+        self.category_codes: Dict[str, int] = {}
+
+        self.stats = {
+            "rank_calls": 0,
+            "last_candidates": 0,
+            "last_latency_ms": 0.0,
+            "max_latency_ms": 0.0,
+            "budget_exceeded": 0
+        }
+        self._grow(initial_capacity)
+
+    def _grow(self, capacity: int):
+        """Resize all feature columns (amortized doubling)"""
+        def resize(column: Optional[np.ndarray], fill, dtype):
+            new = np.full(capacity, fill, dtype=dtype)
+            if column is not None:
+                new[:self.size] = column[:self.size]
+            return new
+
+        self.pnl = resize(getattr(self, "pnl", None), np.nan, np.float64)
+        self.win_rate = resize(getattr(self, "win_rate", None), np.nan, np.float64)
+        self.trades = resize(getattr(self, "trades", None), np.nan, np.float64)
+        self.balance = resize(getattr(self, "balance", None), np.nan, np.float64)
+        self.venue = resize(getattr(self, "venue", None), -1, np.int32)
+        self.asset = resize(getattr(self, "asset", None), -1, np.int32)
+        self.country = resize(getattr(self, "country", None), -1, np.int32)
+        self.is_real = resize(getattr(self, "is_real", None), False, np.bool_)
+        self.created_at = resize(getattr(self, "created_at", None), 0.0, np.float64)
+        self.capacity = capacity
+
+    def _row(self, wallet: str) -> int:
+        row = self.index.get(wallet)
+        if row is None:
+            if self.size >= self.capacity:
+                self._grow(self.capacity * 2)
+            row = self.size
+            self.index[wallet] = row
+            self.size += 1
+        return row
+
+    def _code(self, value: Optional[str]) -> int:
+        if not value:
+            return -1
+        key = value.strip().lower()
+        code = self.category_codes.get(key)
+        if code is None:
+            code = len(self.category_codes)
+            self.category_codes[key] = code
+        return code
+
+    def update_profile(self, wallet: str, venue: Optional[str], asset: Optional[str],
+                       country: Optional[str], is_real: bool, created_at=None):
+        """Store a wallet's profile fields (called on load, signup and profile edits)"""
+        row = self._row(wallet)
+        self.venue[row] = self._code(venue)
+        self.asset[row] = self._code(asset)
+        self.country[row] = self._code(country)
+        self.is_real[row] = is_real
+        if created_at is not None:
+            self.created_at[row] = _to_epoch(created_at)
+
+    def update_pnl(self, wallet: str, pnl_data: dict):
+        """Store cached Nansen PnL features"""
+        row = self._row(wallet)
+        pnl = pnl_data.get("total_pnl") or 0.0
+        self.pnl[row] = math.copysign(math.log1p(abs(pnl)), pnl)
+        self.win_rate[row] = pnl_data.get("win_rate") or 0.0
+        self.trades[row] = math.log1p(pnl_data.get("total_trades") or 0)
+
+    def update_balance(self, wallet: str, balance_data: dict):
+        """Store cached Nansen balance features"""
+        row = self._row(wallet)
+        self.balance[row] = math.log1p(max(balance_data.get("total_balance_usd") or 0.0, 0.0))
+
+    def set_weights(self, weights: Dict[str, float]):
+        """Partially update feature weights"""
+        unknown = [k for k in weights if k not in DEFAULT_RANKING_WEIGHTS]
+        if unknown:
+            raise ValueError(f"Unknown ranking features: {', '.join(unknown)}")
+        self.weights.update({k: float(v) for k, v in weights.items()})
+
+    def score(self, viewer: str, candidates: List[str]) -> np.ndarray:
+        """Score candidates for a viewer in one vectorized pass"""
+        rows = np.fromiter(map(self.index.get, candidates, repeat(0)), dtype=np.int64, count=len(candidates))
+        w = self.weights
+
+        # Unknown wallets / uncached data contribute nothing for that feature
+        scores = (
+            w["pnl"] * _minmax(self.pnl[rows])
+            + w["win_rate"] * _minmax(self.win_rate[rows])
+            + w["trades"] * _minmax(self.trades[rows])
+            + w["balance"] * _minmax(self.balance[rows])
+            + w["recency"] * _minmax(self.created_at[rows])
+            + w["real_user"] * self.is_real[rows]
+        )
+
+        viewer_row = self.index.get(viewer)
+        if viewer_row is not None:
+            for feature, column in (("venue_match", self.venue),
+                                    ("asset_match", self.asset),
+                                    ("country_match", self.country)):
+                code = column[viewer_row]
+                if code >= 0:
+                    scores += w[feature] * (column[rows] == code)
+
+        return scores
+
+    def rank(self, viewer: str, candidates: List[str]) -> List[str]:
+        """Return candidates ordered by descending score (stable for ties)"""
+        if not candidates:
+            return []
+        start = time.perf_counter()
+        scores = self.score(viewer, candidates)
+        order = np.argsort(-scores, kind="stable")
+        ranked = np.array(candidates, dtype=object)[order].tolist()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.stats["rank_calls"] += 1
+        self.stats["last_candidates"] = len(candidates)
+        self.stats["last_latency_ms"] = round(elapsed_ms, 3)
+        self.stats["max_latency_ms"] = round(max(self.stats["max_latency_ms"], elapsed_ms), 3)
+        if elapsed_ms > RANKING_LATENCY_BUDGET_MS:
+            self.stats["budget_exceeded"] += 1
+            print(f"⏱️ Ranking over budget: {elapsed_ms:.1f}ms for {len(candidates)} candidates "
+                  f"(budget {RANKING_LATENCY_BUDGET_MS:.0f}ms)")
+        return ranked
+
+    def describe(self) -> Dict:
+        """Weights, budget and latency stats"""
+        return {
+            "weights": dict(self.weights),
+            "latency_budget_ms": RANKING_LATENCY_BUDGET_MS,
+            "wallets_indexed": len(self.index),
+            **self.stats
+        }
+
+
+if __name__ == "__main__":
+    # Latency benchmark: python ranking.py [candidates]
+    import random
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    venues = ["Pumpfun", "GMGN", "Photon", "Jupiter", "Drift", "Raydium"]
+    countries = ["US", "GB", "DE", "SG", "JP", "AU"]
+    ranker = CandidateRanker(weights=dict(DEFAULT_RANKING_WEIGHTS))
+    wallets = [f"wallet{i:08d}" for i in range(count)]
+    for i, wallet in enumerate(wallets):
+        ranker.update_profile(wallet, random.choice(venues), "SOL", random.choice(countries),
+                              is_real=random.random() < 0.9, created_at=datetime.fromtimestamp(1.7e9 + i))
+        if random.random() < 0.8:
+            ranker.update_pnl(wallet, {"total_pnl": random.uniform(-5e4, 5e5),
+                                       "win_rate": random.uniform(20, 90),
+                                       "total_trades": random.randint(0, 2000)})
+            ranker.update_balance(wallet, {"total_balance_usd": random.uniform(0, 1e6)})
+
+    viewer = wallets[0]
+    runs = []
+    for _ in range(10):
+        start = time.perf_counter()
+        ranker.rank(viewer, wallets[1:])
+        runs.append((time.perf_counter() - start) * 1000)
+    runs.sort()
+    print(f"Ranked {count - 1} candidates: p50 {runs[len(runs) // 2]:.1f}ms, "
+          f"max {runs[-1]:.1f}ms (budget {RANKING_LATENCY_BUDGET_MS:.0f}ms)")
@@ -0,0 +1,203 @@
+"""
+Cached ed25519 signature verification for wallet auth
+With REQUIRE_SIGNATURE every request carries the same signed message until the
+client signs a new one, so a verification is remembered per
+(wallet, message, signature) and later requests cost one dict lookup instead
+of two base58 decodes, a VerifyKey build and an ed25519 verify. Decoded
+VerifyKeys are cached per wallet as well (new messages from a known wallet
+skip the key decode).
+
+Replay bounds: the signed message carries the client's millisecond timestamp
+("... | Timestamp: 1700000000000"); messages older than
+SIGNATURE_MAX_AGE_SECONDS (or dated in the future) are refused, and a cached
+verification never outlives its message. Signatures exchanged for a session
+token are single-use: they are recorded in the `used_signatures` table, so a
+replay is refused by every worker (see consume). Caches are per worker.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import base58
+from nacl.exceptions import BadSignatureError
+from nacl.signing import VerifyKey
+
+# How long a signed auth message is accepted (0 = no expiry check, legacy clients)
+SIGNATURE_MAX_AGE_SECONDS = int(os.getenv("SIGNATURE_MAX_AGE_SECONDS", "300"))
+SIGNATURE_CLOCK_SKEW_SECONDS = 60  # Client clocks running ahead
+# Verified (wallet, message, signature) triples kept, and for how long at most
+SIGNATURE_CACHE_MAX_ENTRIES = int(os.getenv("SIGNATURE_CACHE_MAX_ENTRIES", "10000"))
+SIGNATURE_CACHE_TTL_SECONDS = int(os.getenv("SIGNATURE_CACHE_TTL_SECONDS", "300"))
+VERIFY_KEY_CACHE_MAX_ENTRIES = int(os.getenv("VERIFY_KEY_CACHE_MAX_ENTRIES", "10000"))
+# How often expired rows are deleted from used_signatures (piggybacks on session exchanges)
+USED_SIGNATURE_CLEANUP_SECONDS = int(os.getenv("USED_SIGNATURE_CLEANUP_SECONDS", "60"))
+
+TIMESTAMP_RE = re.compile(r"Timestamp: (\d{10,16})")
+
+
+def message_timestamp(message: str) -> Optional[float]:
+    """Unix time the client put in a signed message (milliseconds in the message), or None"""
+    match = TIMESTAMP_RE.search(message)
+    return int(match.group(1)) / 1000 if match else None
+
+
+class SignatureVerifier:
+    """ed25519 verification with bounded VerifyKey and verified-signature caches"""
+
+    def __init__(self, database=None, max_age: int = SIGNATURE_MAX_AGE_SECONDS, ttl: int = SIGNATURE_CACHE_TTL_SECONDS,
+                 max_entries: int = SIGNATURE_CACHE_MAX_ENTRIES, max_keys: int = VERIFY_KEY_CACHE_MAX_ENTRIES):
+        self.db = database  # Used signatures are shared through it (None = this process only)
+        self.max_age = max_age
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_keys = max_keys
+        self.keys: "OrderedDict[str, VerifyKey]" = OrderedDict()
+        # (wallet, message, signature) -> unix time the cached verification expires
+        self.verified: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        # (wallet, signature) this worker already exchanged for a session -> message expiry
+        self.consumed: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self.next_cleanup = 0.0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "key_hits": 0, "key_misses": 0, "failures": 0,
+                      "expired_messages": 0, "replays_refused": 0, "used_purged": 0}
+
+    def message_expiry(self, message: str, now: float) -> Optional[float]:
+        """Until when a signed message may be trusted; None if it is already expired / undated"""
+        if not self.max_age:
+            return now + self.ttl  # No expiry check - only bounded by the cache TTL
+        timestamp = message_timestamp(message)
+        if timestamp is None or timestamp > now + SIGNATURE_CLOCK_SKEW_SECONDS or timestamp + self.max_age <= now:
+            self.stats["expired_messages"] += 1
+            return None
+        return timestamp + self.max_age
+
+    def _verify_key(self, wallet_address: str) -> VerifyKey:
+        with self.lock:
+            key = self.keys.get(wallet_address)
+            if key is not None:
+                self.keys.move_to_end(wallet_address)
+                self.stats["key_hits"] += 1
+                return key
+        self.stats["key_misses"] += 1
+        key = VerifyKey(base58.b58decode(wallet_address))  # ValueError for anything that isn't a 32 byte key
+        with self.lock:
+            self.keys[wallet_address] = key
+            while len(self.keys) > self.max_keys:
+                self.keys.popitem(last=False)
+        return key
+
+    def cached(self, wallet_address: str, message: str, signature: str) -> bool:
+        """True if this signed message was verified recently (a dict lookup - fine on the event loop)"""
+        entry = (wallet_address, message, signature)
+        with self.lock:
+            expires_at = self.verified.get(entry)
+            if expires_at is None or expires_at <= time.time():
+                return False
+            self.verified.move_to_end(entry)
+            self.stats["hits"] += 1
+            return True
+
+    def verify(self, wallet_address: str, message: str, signature: str) -> bool:
+        """Whether `signature` is the wallet's signature of `message` and the message is still fresh"""
+        now = time.time()
+        expires_at = self.message_expiry(message, now)
+        if expires_at is None:
+            return False
+
+        if self.cached(wallet_address, message, signature):
+            return True
+        self.stats["misses"] += 1
+
+        try:
+            self._verify_key(wallet_address).verify(message.encode('utf-8'), base58.b58decode(signature))
+        except (BadSignatureError, ValueError, Exception) as e:
+            self.stats["failures"] += 1
+            print(f"❌ Signature verification failed: {type(e).__name__}: {str(e)}")
+            return False
+
+        # Failures are not cached - a bad signature must pay for a full check every time
+        with self.lock:
+            self.verified[(wallet_address, message, signature)] = min(now + self.ttl, expires_at)
+            while len(self.verified) > self.max_entries:
+                self.verified.popitem(last=False)
+        return True
+
+    def consume(self, wallet_address: str, message: str, signature: str) -> bool:
+        """Mark a verified signature as used (session exchange); False if it was used before
+
+        Blocking (a write to used_signatures) - call it off the event loop.
+        """
+        now = time.time()
+        entry = (wallet_address, signature)
+        expires_at = self.message_expiry(message, now) or now
+        with self.lock:
+            # Oldest entries first - drop the ones whose message can no longer be replayed anyway
+            while self.consumed and next(iter(self.consumed.values())) <= now:
+                self.consumed.popitem(last=False)
+            if entry in self.consumed:  # Repeat on this worker - refused without a query
+                self.stats["replays_refused"] += 1
+                return False
+        if self.db is not None and not self._claim(wallet_address, signature, expires_at, now):
+            self.stats["replays_refused"] += 1
+            return False
+        with self.lock:
+            self.consumed[entry] = expires_at
+            while len(self.consumed) > self.max_entries:
+                self.consumed.popitem(last=False)
+        return True
+
+    def _claim(self, wallet_address: str, signature: str, expires_at: float, now: float) -> bool:
+        """Record the signature in used_signatures; False if any worker already did"""
+        ph = self.db.placeholder()
+        if now >= self.next_cleanup:
+            self.next_cleanup = now + USED_SIGNATURE_CLEANUP_SECONDS
+            self.stats["used_purged"] += self.db.execute_write(
+                f"DELETE FROM used_signatures WHERE expires_at <= {ph}", (int(now),))
+        # The primary key makes the insert the check: exactly one worker gets the row
+        return self.db.execute_write(f"""INSERT INTO used_signatures (wallet_address, signature, expires_at)
+                                         VALUES ({ph}, {ph}, {ph}) ON CONFLICT DO NOTHING""",
+                                     (wallet_address, signature, int(expires_at) + 1)) == 1
+
+    def describe(self) -> Dict:
+        return {"verified_cached": len(self.verified), "keys_cached": len(self.keys),
+                "consumed": len(self.consumed), "shared": self.db is not None, "max_age_seconds": self.max_age, "ttl_seconds": self.ttl,
+                **self.stats}
+
+
+if __name__ == "__main__":
+    # Latency benchmark: python signature_cache.py [wallets] [requests_per_wallet]
+    import random
+    import sys
+
+    from nacl.signing import SigningKey
+
+    wallets = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    per_wallet = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    message = f"Smart Money Tinder Authentication | Timestamp: {int(time.time() * 1000)}"
+    signed = []
+    for _ in range(wallets):
+        signing_key = SigningKey.generate()
+        signed.append((base58.b58encode(bytes(signing_key.verify_key)).decode(),
+                       base58.b58encode(signing_key.sign(message.encode()).signature).decode()))
+    requests = [random.choice(signed) for _ in range(wallets * per_wallet)]
+
+    def uncached(wallet_address, signature):
+        VerifyKey(base58.b58decode(wallet_address)).verify(message.encode('utf-8'), base58.b58decode(signature))
+        return True
+
+    verifier = SignatureVerifier()
+    start = time.perf_counter()
+    for wallet_address, signature in requests:
+        assert uncached(wallet_address, signature)
+    uncached_us = (time.perf_counter() - start) / len(requests) * 1e6
+    start = time.perf_counter()
+    for wallet_address, signature in requests:
+        assert verifier.verify(wallet_address, message, signature)
+    cached_us = (time.perf_counter() - start) / len(requests) * 1e6
+    print(f"  verify every request: {uncached_us:8.1f} µs per request")
+    print(f"  cached verification:  {cached_us:8.1f} µs per request")
+    print(f"{len(requests)} requests from {wallets} wallets: {verifier.describe()}")
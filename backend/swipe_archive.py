@@ -0,0 +1,160 @@
+"""
+Swipe archive - old left swipes compacted into one dense row per user
+A left swipe is only ever used to keep a wallet out of the swiper's deck, so
+after SWIPE_ARCHIVE_AFTER_DAYS the rows are folded into a compressed, sorted
+target id list per swiper and deleted from `swipes`. Right swipes are never
+archived (match detection, the liked-you inbox and stats read them).
+"""
+
+import os
+import threading
+import time
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from typing import Dict, Iterable, Set
+
+# Left swipes older than this are compacted (0 = never archive automatically)
+SWIPE_ARCHIVE_AFTER_DAYS = int(os.getenv("SWIPE_ARCHIVE_AFTER_DAYS", "0"))
+SWIPE_ARCHIVE_INTERVAL_SECONDS = int(os.getenv("SWIPE_ARCHIVE_INTERVAL_SECONDS", "86400"))
+
+
+def encode_targets(targets: Iterable[int]) -> bytes:
+    """Sorted wallet ids, delta-encoded as uint32 and zlib-compressed"""
+    ordered = sorted(set(targets))
+    deltas = array("I", (b - a for a, b in zip([0] + ordered, ordered)))
+    return zlib.compress(deltas.tobytes(), 9)
+
+
+def decode_targets(blob) -> Set[int]:
+    if not blob:
+        return set()
+    deltas = array("I")
+    deltas.frombytes(zlib.decompress(bytes(blob)))
+    return set(accumulate(deltas))
+
+
+class SwipeArchive:
+    """Per-user exclusion sets for archived left swipes"""
+
+    def __init__(self, database):
+        self.db = database
+        self.lock = threading.Lock()
+        self.stats = {"runs": 0, "swipes_archived": 0, "last_run_seconds": 0.0,
+                      "swipes_bytes_before": None, "swipes_bytes_after": None}
+
+    def targets(self, swiper_id: int) -> Set[int]:
+        """Archived (left-swiped) target ids of a swiper
+
+        Always a primary key lookup - another worker may have archived this swiper since
+        (no per-process set of archived users to go stale)."""
+        ph = self.db.placeholder()
+        row = self.db.execute_one(f"SELECT targets FROM swipe_archive WHERE swiper_id = {ph}", (swiper_id,))
+        return decode_targets(row['targets']) if row else set()
+
+    def remove_target(self, cursor, swiper_id: int, target_id: int) -> bool:
+        """Drop a target from a swiper's archive inside the caller's transaction
+        (the swipe is being re-recorded in `swipes`); returns True if it was archived"""
+        ph = self.db.placeholder()
+        cursor.execute(f"SELECT targets FROM swipe_archive WHERE swiper_id = {ph}", (swiper_id,))
+        row = cursor.fetchone()
+        if not row:
+            return False
+        targets = decode_targets(row['targets'] if isinstance(row, dict) else row[0])
+        if target_id not in targets:
+            return False
+        targets.discard(target_id)
+        cursor.execute(f"UPDATE swipe_archive SET targets = {ph}, target_count = {ph} WHERE swiper_id = {ph}",
+                       (encode_targets(targets), len(targets), swiper_id))
+        return True
+
+    def table_bytes(self) -> int:
+        """On-disk size of swipes + its indexes (Postgres) or of the whole database file (SQLite)"""
+        if self.db.use_postgres:
+            row = self.db.execute_one("SELECT pg_total_relation_size('swipes') AS size")
+            return int(row['size'])
+        # SQLite: whole-file size (the freelist is only returned by VACUUM)
+        row = self.db.execute_one("""SELECT page_count * page_size AS size
+                                     FROM pragma_page_count(), pragma_page_size()""")
+        return int(row['size'])
+
+    def compact(self, older_than_days: int, vacuum: bool = False) -> Dict:
+        """Fold left swipes older than the cutoff into per-user archive rows"""
+        start = time.time()
+        ph = self.db.placeholder()
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+        bytes_before = self.table_bytes()
+
+        with self.lock, self.db.get_connection() as conn:
+            cursor = self.db.get_cursor(conn)
+            cursor.execute(f"""SELECT swiper_id, target_id FROM swipes
+                               WHERE direction = 'left' AND created_at < {ph}""", (cutoff,))
+            by_user: Dict[int, Set[int]] = {}
+            for row in cursor.fetchall():
+                by_user.setdefault(row['swiper_id'], set()).add(row['target_id'])
+
+            archived = sum(len(targets) for targets in by_user.values())
+            for swiper_id, targets in by_user.items():
+                cursor.execute(f"SELECT targets FROM swipe_archive WHERE swiper_id = {ph}", (swiper_id,))
+                existing = cursor.fetchone()
+                if existing:
+                    targets |= decode_targets(existing['targets'])
+                cursor.execute(f"""INSERT INTO swipe_archive (swiper_id, targets, target_count, archived_at)
+                                   VALUES ({ph}, {ph}, {ph}, CURRENT_TIMESTAMP)
+                                   ON CONFLICT (swiper_id) DO UPDATE SET targets = excluded.targets,
+                                   target_count = excluded.target_count, archived_at = excluded.archived_at""",
+                               (swiper_id, encode_targets(targets), len(targets)))
+            # A row re-swiped since the SELECT has a fresh created_at and is kept
+            cursor.execute(f"DELETE FROM swipes WHERE direction = 'left' AND created_at < {ph}", (cutoff,))
+            conn.commit()
+
+        if vacuum and not self.db.use_postgres:
+            # Postgres reclaims dead tuples through autovacuum
+            with self.db.get_connection() as conn:
+                conn.execute("VACUUM")
+
+        elapsed = time.time() - start
+        bytes_after = self.table_bytes()
+        self.stats["runs"] += 1
+        self.stats["swipes_archived"] += archived
+        self.stats["last_run_seconds"] = round(elapsed, 3)
+        self.stats["swipes_bytes_before"] = bytes_before
+        self.stats["swipes_bytes_after"] = bytes_after
+        print(f"🗜️ Archived {archived} left swipes for {len(by_user)} users older than {older_than_days}d "
+              f"({bytes_before} -> {bytes_after} bytes, {elapsed:.2f}s)")
+        return {"archived": archived, "users": len(by_user), "cutoff": cutoff,
+                "bytes_before": bytes_before, "bytes_after": bytes_after, "seconds": round(elapsed, 3)}
+
+    def describe(self) -> Dict:
+        row = self.db.execute_one("SELECT COUNT(*) AS users FROM swipe_archive")
+        return {"users": row['users'], "archive_after_days": SWIPE_ARCHIVE_AFTER_DAYS, **self.stats}
+
+
+if __name__ == "__main__":
+    # Size benchmark (SQLite, temp dir): python swipe_archive.py [users] [left_swipes_per_user]
+    import random
+    import sys
+    import tempfile
+
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    os.chdir(tempfile.mkdtemp())
+    from database import db
+
+    db.init_db()
+    with db.get_connection() as conn:
+        conn.executemany("INSERT INTO swipes (swiper_id, target_id, direction, created_at) VALUES (?, ?, ?, ?)",
+                         [(u, target, "left", "2020-01-01 00:00:00")
+                          for u in range(users) for target in random.sample(range(per_user * 4), per_user)])
+        conn.commit()
+        conn.execute("VACUUM")
+
+    archive = SwipeArchive(db)
+    result = archive.compact(older_than_days=30, vacuum=True)
+    archive_bytes = db.execute_one("SELECT SUM(LENGTH(targets)) AS size FROM swipe_archive")['size']
+    print(f"{result['archived']} left swipes ({users} users x {per_user})")
+    print(f"  database file before: {result['bytes_before'] / 1e6:8.2f} MB")
+    print(f"  database file after:  {result['bytes_after'] / 1e6:8.2f} MB")
+    print(f"  archive payload:      {archive_bytes / 1e6:8.2f} MB "
+          f"({archive_bytes / result['archived']:.1f} bytes/swipe)")
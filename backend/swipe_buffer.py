@@ -0,0 +1,287 @@
+"""
+Write-behind swipe buffer (optional, SWIPE_WRITE_BEHIND=true)
+Swipes are acknowledged from memory, logged to a local append-only file and
+flushed to the database in batches by a background task. Mutual likes are
+detected instantly from an in-memory "who liked whom" index.
+
+Durability:
+- Every acknowledged swipe is written to the append-only log before the ack.
+- SWIPE_LOG_FSYNC=always fsyncs each record: acked swipes survive process
+  crashes and power loss.
+- SWIPE_LOG_FSYNC=interval (default) fsyncs once per flush cycle: a process
+  crash loses nothing (the OS has the data), a machine crash can lose at most
+  SWIPE_FLUSH_INTERVAL_MS worth of swipes.
+- The log lives on local disk: on hosts with ephemeral disks (Render) swipes
+  still in the buffer are only safe through a graceful shutdown, which flushes.
+Matches are always written synchronously, so a match is never lost.
+
+Single process only: the like index and the log belong to one process (a
+mutual like split across two workers would never match, and every worker
+would replay the same log). load() refuses to start when WEB_CONCURRENCY > 1
+or another process already holds the log's lock file.
+"""
+
+import asyncio
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows - only the WEB_CONCURRENCY check applies
+    fcntl = None
+
+SWIPE_WRITE_BEHIND = os.getenv("SWIPE_WRITE_BEHIND", "false").lower() == "true"
+SWIPE_LOG_PATH = os.getenv("SWIPE_LOG_PATH", "swipe_buffer.log")
+SWIPE_LOG_FSYNC = os.getenv("SWIPE_LOG_FSYNC", "interval").lower()  # "always" or "interval"
+SWIPE_FLUSH_INTERVAL_MS = int(os.getenv("SWIPE_FLUSH_INTERVAL_MS", "500"))
+SWIPE_FLUSH_BATCH_SIZE = int(os.getenv("SWIPE_FLUSH_BATCH_SIZE", "500"))
+
+
+class SwipeWriteBehind:
+    """Buffered swipe writer with an append-only log and an in-memory like index"""
+
+    def __init__(self, database, log_path: str = SWIPE_LOG_PATH, enabled: bool = SWIPE_WRITE_BEHIND,
+                 flush_interval_ms: int = SWIPE_FLUSH_INTERVAL_MS, batch_size: int = SWIPE_FLUSH_BATCH_SIZE,
+                 fsync: str = SWIPE_LOG_FSYNC, on_flush: Optional[Callable] = None, wallet_ids=None):
+        self.db = database
+        # WalletIdMap translating the logged wallet addresses to swipes.swiper_id / target_id
+        self.wallet_ids = wallet_ids
+        # Called as on_flush(cursor, entries) inside the flush transaction, before the upsert
+        self.on_flush = on_flush
+        self.enabled = enabled
+        self.log_path = log_path
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.fsync_always = fsync == "always"
+
+        # { user_wallet: {target_wallet, ...} } for right swipes (flushed + pending)
+        self.likes: Dict[str, Set[str]] = defaultdict(set)
+        self.buffer: List[dict] = []
+        self.lock = threading.Lock()
+        self.log_file = None
+        self.lock_file = None  # Held for the process lifetime - a second process can't own the log
+        self.rotation = 0
+        self.segments: List[str] = []  # Rotated log segments not yet confirmed in the database
+        self.flush_event = asyncio.Event()
+
+        self.stats = {"buffered": 0, "flushed": 0, "flushes": 0, "last_flush_ms": 0.0, "replayed": 0}
+
+    # ---------- startup ----------
+
+    def _claim_log(self):
+        """Make sure this is the only process using write-behind swipes on this log"""
+        workers = int(os.getenv("WEB_CONCURRENCY", "1") or "1")
+        if workers > 1:
+            raise RuntimeError(f"SWIPE_WRITE_BEHIND needs a single worker process (WEB_CONCURRENCY={workers}) - "
+                               "the like index and swipe log are per process")
+        if fcntl is None:
+            return
+        self.lock_file = open(f"{self.log_path}.lock", "w")
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.lock_file.close()
+            self.lock_file = None
+            raise RuntimeError(f"SWIPE_WRITE_BEHIND: {self.log_path} is in use by another process - "
+                               "write-behind swipes need a single worker")
+
+    def load(self):
+        """Replay leftover log files into the database, then build the like index"""
+        if not self.enabled:
+            return
+        self._claim_log()
+        leftovers = sorted(glob.glob(f"{self.log_path}.*.flushing"))
+        if os.path.exists(self.log_path):
+            leftovers.append(self.log_path)
+        for path in leftovers:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            if entries:
+                self._write_batch(entries)
+                self.stats["replayed"] += len(entries)
+            os.remove(path)
+        if self.stats["replayed"]:
+            print(f"♻️ Replayed {self.stats['replayed']} swipes from the write-behind log")
+
+        rows = self.db.execute_query("SELECT swiper_id, target_id FROM swipes WHERE direction = 'right'")
+        wallets = self.wallet_ids.get_wallets({i for row in rows for i in (row['swiper_id'], row['target_id'])})
+        for row in rows:
+            self.likes[wallets[row['swiper_id']]].add(wallets[row['target_id']])
+        self.log_file = open(self.log_path, "a", encoding="utf-8")
+        print(f"💘 Like index loaded: {len(rows)} right swipes (write-behind mode)")
+
+    # ---------- request path ----------
+
+    def record(self, user_wallet: str, target_wallet: str, direction: str) -> bool:
+        """Log + buffer a swipe and return True if it completes a mutual like"""
+        entry = {
+            "user_wallet": user_wallet,
+            "target_wallet": target_wallet,
+            "direction": direction,
+            "ts": time.time()
+        }
+        line = json.dumps(entry) + "\n"
+        with self.lock:
+            self.log_file.write(line)
+            self.log_file.flush()
+            if self.fsync_always:
+                os.fsync(self.log_file.fileno())
+            self.buffer.append(entry)
+            self.stats["buffered"] += 1
+            if len(self.buffer) >= self.batch_size:
+                self.flush_event.set()
+
+        if direction == "right":
+            self.likes[user_wallet].add(target_wallet)
+            return user_wallet in self.likes.get(target_wallet, ())
+        self.likes[user_wallet].discard(target_wallet)
+        return False
+
+    def pending_targets(self, user_wallet: str) -> Set[str]:
+        """Targets swiped by a user that haven't reached the database yet"""
+        with self.lock:
+            return {e["target_wallet"] for e in self.buffer if e["user_wallet"] == user_wallet}
+
+    # ---------- flushing ----------
+
+    def _write_batch(self, entries: List[dict]):
+        """Upsert a batch of swipes in a single transaction"""
+        ph = self.db.placeholder()
+        query = f"""INSERT INTO swipes (swiper_id, target_id, direction, created_at)
+                    VALUES ({ph}, {ph}, {ph}, {ph})
+                    ON CONFLICT (swiper_id, target_id) DO UPDATE
+                    SET direction = excluded.direction, created_at = excluded.created_at"""
+        # Last write wins within a batch (one row per user/target)
+        latest = {}
+        for e in entries:
+            latest[(e["user_wallet"], e["target_wallet"])] = e
+        ids = self.wallet_ids.get_ids({w for pair in latest for w in pair})
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            rows = []
+            for e in latest.values():
+                e["swiper_id"], e["target_id"] = ids[e["user_wallet"]], ids[e["target_wallet"]]
+                rows.append((e["swiper_id"], e["target_id"], e["direction"],
+                             time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(e["ts"]))))
+            if self.on_flush:
+                self.on_flush(cursor, list(latest.values()))
+            cursor.executemany(query, rows)
+            conn.commit()
+
+    def flush(self) -> int:
+        """Write buffered swipes to the database, then drop their log segment"""
+        with self.lock:
+            if not self.buffer:
+                if self.log_file is not None and not self.fsync_always:
+                    os.fsync(self.log_file.fileno())
+                return 0
+            batch, self.buffer = self.buffer, []
+            # Rotate the log so swipes arriving during the flush go to a fresh file
+            self.log_file.flush()
+            os.fsync(self.log_file.fileno())
+            self.log_file.close()
+            self.rotation += 1
+            segment = f"{self.log_path}.{self.rotation:08d}.flushing"
+            os.replace(self.log_path, segment)
+            self.segments.append(segment)
+            segments = list(self.segments)
+            self.log_file = open(self.log_path, "a", encoding="utf-8")
+
+        start = time.perf_counter()
+        try:
+            self._write_batch(batch)
+        except Exception as e:
+            # Keep the segments on disk (replayed on restart) and retry with the next flush
+            print(f"❌ Swipe flush failed ({len(batch)} swipes kept): {e}")
+            with self.lock:
+                self.buffer = batch + self.buffer
+            return 0
+        with self.lock:
+            for path in segments:
+                os.remove(path)
+                self.segments.remove(path)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats["flushed"] += len(batch)
+        self.stats["flushes"] += 1
+        self.stats["last_flush_ms"] = round(elapsed_ms, 2)
+        return len(batch)
+
+    async def run(self):
+        """Background flusher: every interval, or sooner when the batch fills up"""
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_event.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print(f"❌ Swipe flusher error: {e}")
+
+    def close(self):
+        """Final flush on shutdown"""
+        if not self.enabled or self.log_file is None:
+            return
+        flushed = self.flush()
+        self.log_file.close()
+        self.log_file = None
+        if self.lock_file is not None:
+            self.lock_file.close()  # Releases the lock
+            self.lock_file = None
+        print(f"💾 Write-behind buffer flushed on shutdown ({flushed} swipes)")
+
+    def describe(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self.buffer),
+            "fsync": "always" if self.fsync_always else "interval",
+            "flush_interval_ms": int(self.flush_interval * 1000),
+            "users_in_like_index": len(self.likes),
+            **self.stats
+        }
+
+
+if __name__ == "__main__":
+    # Throughput benchmark (SQLite, temp dir): python swipe_buffer.py [swipes]
+    import sys
+    import tempfile
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    os.chdir(tempfile.mkdtemp())
+    from database import db
+    from wallet_ids import WalletIdMap
+
+    db.init_db()
+    wallet_map = WalletIdMap(db)
+    users = [f"wallet{i}" for i in range(100)]
+    targets = [f"target{i}" for i in range(count)]
+    wallet_map.get_ids(users + targets)
+
+    start = time.perf_counter()
+    for i, target in enumerate(targets):
+        ids = wallet_map.get_ids([users[i % len(users)], target])
+        db.execute_write("""INSERT INTO swipes (swiper_id, target_id, direction) VALUES (?, ?, ?)
+                            ON CONFLICT (swiper_id, target_id) DO UPDATE SET direction = excluded.direction""",
+                         (ids[users[i % len(users)]], ids[target], "right"))
+    sync_rate = count / (time.perf_counter() - start)
+
+    buffer = SwipeWriteBehind(db, log_path="bench.log", enabled=True, batch_size=count + 1, wallet_ids=wallet_map)
+    buffer.log_file = open(buffer.log_path, "a", encoding="utf-8")
+    start = time.perf_counter()
+    for i, target in enumerate(targets):
+        buffer.record(users[i % len(users)], target, "left")
+    ack_rate = count / (time.perf_counter() - start)
+    buffer.flush()
+    total_rate = count / (time.perf_counter() - start)
+
+    print(f"{count} swipes")
+    print(f"  synchronous commit per swipe: {sync_rate:10.0f} swipes/s")
+    print(f"  write-behind (ack only):      {ack_rate:10.0f} swipes/s")
+    print(f"  write-behind (ack + flush):   {total_rate:10.0f} swipes/s")
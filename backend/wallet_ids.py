@@ -0,0 +1,222 @@
+"""
+Wallet id map - base58 wallet addresses interned to dense integer ids
+swipes, matches and messages store these ids instead of 44-character
+wallet strings; API payloads keep using wallet addresses, translated
+through the in-process map below (ids never change, so caching is safe
+across workers)
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional
+
+
+class WalletIdMap:
+    """Two-way wallet <-> id map backed by the wallet_ids table"""
+
+    def __init__(self, database):
+        self.db = database
+        self.ids: Dict[str, int] = {}
+        self.wallets: Dict[int, str] = {}
+        self.lock = threading.Lock()
+        self.stats = {"db_lookups": 0, "created": 0}
+
+    def _remember(self, wallet_address: str, wallet_id: int):
+        self.ids[wallet_address] = wallet_id
+        self.wallets[wallet_id] = wallet_address
+
+    def load(self):
+        """Load the whole map (one small row per wallet)"""
+        rows = self.db.execute_query("SELECT id, wallet_address FROM wallet_ids")
+        with self.lock:
+            for row in rows:
+                self._remember(row['wallet_address'], row['id'])
+        print(f"🔢 Wallet id map loaded: {len(rows)} wallets")
+
+    def get_ids(self, wallets: Iterable[str], create: bool = True, cursor=None) -> Dict[str, int]:
+        """Ids for several wallets; unknown wallets are interned when create=True
+
+        With a cursor the lookup runs inside the caller's transaction and the new
+        ids are not cached (a rollback would otherwise leave stale ids in memory).
+        """
+        result = {}
+        missing = []
+        for wallet in wallets:
+            wallet_id = self.ids.get(wallet)
+            if wallet_id is None:
+                missing.append(wallet)
+            else:
+                result[wallet] = wallet_id
+        if not missing:
+            return result
+
+        missing = list(dict.fromkeys(missing))
+        ph = self.db.placeholder()
+        placeholders = ", ".join([ph] * len(missing))
+
+        def resolve(cur):
+            if create:
+                for wallet in missing:
+                    cur.execute(f"""INSERT INTO wallet_ids (wallet_address) VALUES ({ph})
+                                    ON CONFLICT (wallet_address) DO NOTHING""", (wallet,))
+                    self.stats["created"] += max(cur.rowcount, 0)
+            cur.execute(f"SELECT id, wallet_address FROM wallet_ids WHERE wallet_address IN ({placeholders})",
+                        tuple(missing))
+            return [(row['id'], row['wallet_address']) if isinstance(row, dict) else (row[0], row[1])
+                    for row in cur.fetchall()]
+
+        self.stats["db_lookups"] += 1
+        if cursor is not None:
+            result.update({wallet: wallet_id for wallet_id, wallet in resolve(cursor)})
+            return result
+
+        with self.db.get_connection() as conn:
+            found = resolve(self.db.get_cursor(conn))
+            conn.commit()
+
+        with self.lock:
+            for wallet_id, wallet in found:
+                self._remember(wallet, wallet_id)
+                result[wallet] = wallet_id
+        return result
+
+    def get_id(self, wallet_address: str, create: bool = True, cursor=None) -> Optional[int]:
+        return self.get_ids([wallet_address], create=create, cursor=cursor).get(wallet_address)
+
+    def get_wallets(self, wallet_ids: Iterable[int]) -> Dict[int, str]:
+        """Wallet addresses for several ids (ids created by other workers are looked up)"""
+        result = {}
+        missing = []
+        for wallet_id in wallet_ids:
+            wallet = self.wallets.get(wallet_id)
+            if wallet is None:
+                missing.append(wallet_id)
+            else:
+                result[wallet_id] = wallet
+        if missing:
+            self.stats["db_lookups"] += 1
+            ph = self.db.placeholder()
+            rows = self.db.execute_query(
+                f"SELECT id, wallet_address FROM wallet_ids WHERE id IN ({', '.join([ph] * len(missing))})",
+                tuple(missing))
+            with self.lock:
+                for row in rows:
+                    self._remember(row['wallet_address'], row['id'])
+                    result[row['id']] = row['wallet_address']
+        return result
+
+    def get_wallet(self, wallet_id: int) -> Optional[str]:
+        return self.get_wallets([wallet_id]).get(wallet_id)
+
+    def to_wallets(self, wallet_ids: Iterable[int]) -> List[str]:
+        """Translate a list of ids, keeping order (unknown ids are dropped)"""
+        wallet_ids = list(wallet_ids)
+        mapping = self.get_wallets(wallet_ids)
+        return [mapping[i] for i in wallet_ids if i in mapping]
+
+    def describe(self) -> Dict:
+        return {"wallets": len(self.ids), **self.stats}
+
+
+if __name__ == "__main__":
+    # Storage / query benchmark, wallet strings vs wallet ids (SQLite, temp dir):
+    # python wallet_ids.py [users] [swipes_per_user]
+    import os
+    import random
+    import sqlite3
+    import string
+    import sys
+    import tempfile
+    import time
+    import uuid
+
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    os.chdir(tempfile.mkdtemp())
+    from database import db
+
+    alphabet = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+    wallets = ["".join(random.choices(alphabet, k=44)) for _ in range(users)]
+    user_uuids = [str(uuid.uuid4()) for _ in range(users)]
+    swipes = [(u, t, random.choice(("left", "right"))) for u in range(users)
+              for t in random.sample(range(users), per_user) if t != u]
+    matches = sorted({tuple(sorted((u, t))) for u, t, d in swipes if d == "right"})[:users * 5]
+    rooms = [str(uuid.uuid4()) for _ in matches]
+    messages = [(random.randrange(len(matches)), random.choice((0, 1)), "gm " * random.randint(1, 10))
+                for _ in range(users * 20)]
+    now = "2025-01-01 00:00:00"
+
+    # Before: wallet strings / user UUIDs (schema as it was)
+    legacy = sqlite3.connect("legacy.db")
+    legacy.executescript("""
+        CREATE TABLE swipes (id TEXT PRIMARY KEY, user_id TEXT NOT NULL, target_wallet TEXT NOT NULL,
+                             direction TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE matches (id TEXT PRIMARY KEY, user1_wallet TEXT NOT NULL, user2_wallet TEXT NOT NULL,
+                              chat_room_id TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE messages (id TEXT PRIMARY KEY, chat_room_id TEXT NOT NULL, sender_wallet TEXT NOT NULL,
+                               message TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE UNIQUE INDEX idx_swipes_user_target ON swipes (user_id, target_wallet);
+        CREATE INDEX idx_swipes_target_direction_created ON swipes (target_wallet, direction, created_at);
+        CREATE UNIQUE INDEX idx_matches_pair ON matches (user1_wallet, user2_wallet);
+        CREATE INDEX idx_matches_user1 ON matches (user1_wallet, created_at);
+        CREATE INDEX idx_matches_user2 ON matches (user2_wallet, created_at);
+        CREATE INDEX idx_messages_room_created ON messages (chat_room_id, created_at);""")
+    legacy.executemany("INSERT INTO swipes VALUES (?, ?, ?, ?, ?)",
+                       [(str(uuid.uuid4()), user_uuids[u], wallets[t], d, now) for u, t, d in swipes])
+    legacy.executemany("INSERT INTO matches VALUES (?, ?, ?, ?, ?)",
+                       [(str(uuid.uuid4()), wallets[a], wallets[b], room, now) for (a, b), room in zip(matches, rooms)])
+    legacy.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?)",
+                       [(str(uuid.uuid4()), rooms[m], wallets[matches[m][s]], text, now) for m, s, text in messages])
+    legacy.commit()
+
+    # After: dense wallet ids (current schema)
+    dense = sqlite3.connect("dense.db")
+    db.create_tables(dense.cursor())
+    dense.executemany("INSERT INTO wallet_ids (id, wallet_address) VALUES (?, ?)", enumerate(wallets, start=1))
+    dense.executemany("INSERT INTO swipes VALUES (?, ?, ?, ?)", [(u + 1, t + 1, d, now) for u, t, d in swipes])
+    dense.executemany("INSERT INTO matches VALUES (?, ?, ?, ?, ?)",
+                      [(str(uuid.uuid4()), a + 1, b + 1, room, now) for (a, b), room in zip(matches, rooms)])
+    dense.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?)",
+                      [(str(uuid.uuid4()), rooms[m], matches[m][s] + 1, text, now) for m, s, text in messages])
+    dense.commit()
+
+    def table_bytes(conn, table):
+        return conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ? OR name IN "
+                            "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?)",
+                            (table, table)).fetchone()[0] or 0
+
+    def timed(conn, query, params_list):
+        start = time.perf_counter()
+        for params in params_list:
+            conn.execute(query, params).fetchall()
+        return (time.perf_counter() - start) / len(params_list) * 1e6
+
+    sample = random.sample(range(users), min(500, users))
+    print(f"{len(swipes)} swipes, {len(matches)} matches, {len(messages)} messages, {users} wallets")
+    try:
+        for table in ("swipes", "matches", "messages"):
+            before, after = table_bytes(legacy, table), table_bytes(dense, table)
+            print(f"  {table:<9} table + indexes: {before / 1e6:7.2f} MB -> {after / 1e6:7.2f} MB "
+                  f"({before / max(after, 1):.1f}x smaller)")
+        print(f"  wallet_ids table + index:   {table_bytes(dense, 'wallet_ids') / 1e6:7.2f} MB")
+    except sqlite3.OperationalError:
+        # dbstat not compiled in - compare whole files instead
+        for conn in (legacy, dense):
+            conn.execute("VACUUM")
+        print(f"  database file: {os.path.getsize('legacy.db') / 1e6:.2f} MB -> {os.path.getsize('dense.db') / 1e6:.2f} MB")
+
+    queries = [
+        ("feed exclusion (swiped targets)",
+         "SELECT target_wallet FROM swipes WHERE user_id = ?", [(user_uuids[u],) for u in sample],
+         "SELECT target_id FROM swipes WHERE swiper_id = ?", [(u + 1,) for u in sample]),
+        ("liked-you lookup",
+         "SELECT user_id FROM swipes WHERE target_wallet = ? AND direction = 'right'", [(wallets[u],) for u in sample],
+         "SELECT swiper_id FROM swipes WHERE target_id = ? AND direction = 'right'", [(u + 1,) for u in sample]),
+        ("matches list",
+         "SELECT * FROM matches WHERE user1_wallet = ? UNION ALL SELECT * FROM matches WHERE user2_wallet = ?",
+         [(wallets[u], wallets[u]) for u in sample],
+         "SELECT * FROM matches WHERE user1_id = ? UNION ALL SELECT * FROM matches WHERE user2_id = ?",
+         [(u + 1, u + 1) for u in sample]),
+    ]
+    for label, old_query, old_params, new_query, new_params in queries:
+        old_us, new_us = timed(legacy, old_query, old_params), timed(dense, new_query, new_params)
+        print(f"  {label:<32} {old_us:8.1f} µs -> {new_us:8.1f} µs per query")
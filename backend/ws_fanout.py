@@ -0,0 +1,217 @@
+"""
+WebSocket fan-out for chat rooms
+Every connection gets a bounded send queue drained by its own writer task, so
+a broadcast only serializes the message once and enqueues it - a slow or dead
+socket never delays delivery to the rest of the room.
+
+Slow consumers (queue full):
+- WS_SLOW_CONSUMER_POLICY=disconnect (default) closes the socket with 1013;
+  the client reconnects and reloads history, so no message is silently lost
+- WS_SLOW_CONSUMER_POLICY=drop_oldest drops the oldest queued frame instead
+
+Resume: connect(..., replay=...) sends the messages a reconnecting client
+missed (as one frame) before any live broadcast.
+
+Heartbeats: a {"type": "ping"} frame every WS_HEARTBEAT_INTERVAL_SECONDS; any
+frame from the client (e.g. {"type": "pong"}) counts as alive. Connections
+silent for WS_HEARTBEAT_TIMEOUT_SECONDS are closed and their rooms dropped
+when empty.
+
+With a backplane attached (chat_backplane.py) the manager subscribes to a room
+when its first local socket joins and unsubscribes when the last one leaves.
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import orjson
+from fastapi import WebSocket
+
+from fast_json import dumps
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "64"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "disconnect").lower()
+WS_HEARTBEAT_INTERVAL_SECONDS = float(os.getenv("WS_HEARTBEAT_INTERVAL_SECONDS", "25"))
+WS_HEARTBEAT_TIMEOUT_SECONDS = float(os.getenv("WS_HEARTBEAT_TIMEOUT_SECONDS", "75"))
+
+PING_FRAME = dumps({"type": "ping"}).decode("utf-8")
+
+
+class Connection:
+    """One socket: bounded send queue + writer task"""
+
+    def __init__(self, manager: "ConnectionManager", websocket: WebSocket, chat_room_id: str):
+        self.manager = manager
+        self.websocket = websocket
+        self.chat_room_id = chat_room_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=manager.queue_size)
+        self.last_seen = time.monotonic()
+        self.closed = False
+        self.writer: Optional[asyncio.Task] = None
+        # Authenticated sender (None = receive only)
+        self.wallet: Optional[str] = None
+        # Live frames held back while missed messages are replayed
+        self.held: Optional[List[str]] = None
+
+    def start(self):
+        self.writer = asyncio.create_task(self._write_loop())
+
+    def offer(self, frame: str) -> bool:
+        """Queue a frame without waiting; applies the slow consumer policy when full"""
+        if self.closed:
+            return False
+        if self.held is not None and frame is not PING_FRAME:
+            self.held.append(frame)
+            return True
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if frame is PING_FRAME:
+            return False  # a backed-up socket doesn't need a ping on top
+        if self.manager.policy == "drop_oldest":
+            self.queue.get_nowait()
+            self.queue.put_nowait(frame)
+            self.manager.stats["dropped_frames"] += 1
+            return True
+        self.manager.stats["slow_consumers_closed"] += 1
+        self.manager.close(self, code=1013)
+        return False
+
+    async def _write_loop(self):
+        try:
+            while True:
+                frame = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_text(frame), timeout=self.manager.send_timeout)
+                self.manager.stats["frames_sent"] += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # Dead socket or send timeout - reap it, the others are unaffected
+            self.manager.stats["send_failures"] += 1
+            self.manager.close(self, code=1011)
+
+
+class ConnectionManager:
+    """Room -> connections registry with concurrent, queue-based broadcast"""
+
+    def __init__(self, queue_size: int = WS_SEND_QUEUE_SIZE, policy: str = WS_SLOW_CONSUMER_POLICY,
+                 send_timeout: float = WS_SEND_TIMEOUT_SECONDS,
+                 heartbeat_interval: float = WS_HEARTBEAT_INTERVAL_SECONDS,
+                 heartbeat_timeout: float = WS_HEARTBEAT_TIMEOUT_SECONDS):
+        self.rooms: Dict[str, Set[Connection]] = {}
+        self.queue_size = queue_size
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.backplane = None  # Set by the app: per-room subscriptions follow the local rooms
+        self.stats = {"connections_opened": 0, "connections_closed": 0, "broadcasts": 0, "frames_sent": 0,
+                      "dropped_frames": 0, "slow_consumers_closed": 0, "send_failures": 0,
+                      "heartbeat_timeouts": 0, "replayed_messages": 0}
+
+    async def connect(self, websocket: WebSocket, chat_room_id: str,
+                      replay: Optional[Callable[[], Awaitable[dict]]] = None) -> Connection:
+        """Register a socket; replay() returns one frame {"messages": [...], ...} with
+        what it missed, sent before any live broadcast (live ones arriving meanwhile
+        are held and sent after it, minus duplicates)"""
+        await websocket.accept()
+        connection = Connection(self, websocket, chat_room_id)
+        if replay is not None:
+            connection.held = []
+        if chat_room_id not in self.rooms and self.backplane is not None:
+            await self.backplane.subscribe(chat_room_id)
+        self.rooms.setdefault(chat_room_id, set()).add(connection)
+        connection.start()
+        self.stats["connections_opened"] += 1
+        if replay is not None:
+            try:
+                replayed = await replay()
+            except Exception:
+                self.close(connection, code=1011)
+                raise
+            finally:
+                held, connection.held = connection.held, None
+            seen = {message.get("id") for message in replayed["messages"]}
+            connection.offer(dumps(replayed).decode("utf-8"))
+            for frame in held:
+                if orjson.loads(frame).get("id") not in seen:
+                    connection.offer(frame)
+            self.stats["replayed_messages"] += len(replayed["messages"])
+        return connection
+
+    def disconnect(self, connection: Connection):
+        """Forget a connection (its room goes away with the last one)"""
+        if connection.closed:
+            return
+        connection.closed = True
+        self.stats["connections_closed"] += 1
+        room = self.rooms.get(connection.chat_room_id)
+        if room is not None:
+            room.discard(connection)
+            if not room:
+                del self.rooms[connection.chat_room_id]
+                if self.backplane is not None:
+                    asyncio.create_task(self._unsubscribe(connection.chat_room_id))
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+
+    async def _unsubscribe(self, chat_room_id: str):
+        if chat_room_id not in self.rooms:  # Nobody rejoined in the meantime
+            await self.backplane.unsubscribe(chat_room_id)
+
+    def close(self, connection: Connection, code: int = 1000):
+        """Disconnect and close the socket in the background"""
+        if connection.closed:
+            return
+        self.disconnect(connection)
+
+        async def close_socket():
+            try:
+                await asyncio.wait_for(connection.websocket.close(code=code), timeout=self.send_timeout)
+            except Exception:
+                pass
+
+        asyncio.create_task(close_socket())
+
+    def touch(self, connection: Connection):
+        """Record that the client is alive (any inbound frame)"""
+        connection.last_seen = time.monotonic()
+
+    async def broadcast(self, message: dict, chat_room_id: str) -> int:
+        """Serialize once and enqueue for every socket in the room; returns how many accepted it"""
+        room = self.rooms.get(chat_room_id)
+        if not room:
+            return 0
+        frame = dumps(message).decode("utf-8")
+        self.stats["broadcasts"] += 1
+        return sum(connection.offer(frame) for connection in list(room))
+
+    async def run_heartbeat(self):
+        """Ping every connection and reap the ones that stopped answering"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            deadline = time.monotonic() - self.heartbeat_timeout
+            for room in list(self.rooms.values()):
+                for connection in list(room):
+                    if connection.last_seen < deadline:
+                        self.stats["heartbeat_timeouts"] += 1
+                        self.close(connection, code=1001)
+                    else:
+                        connection.offer(PING_FRAME)
+
+    def describe(self) -> Dict:
+        connections = sum(len(room) for room in self.rooms.values())
+        return {
+            "rooms": len(self.rooms),
+            "connections": connections,
+            "queued_frames": sum(c.queue.qsize() for room in self.rooms.values() for c in room),
+            "queue_size": self.queue_size,
+            "slow_consumer_policy": self.policy,
+            **self.stats
+        }
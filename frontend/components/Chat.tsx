@@ -24,9 +24,17 @@ const getWebSocketUrl = () => {
 }
 
 interface Message {
+  id?: string
   sender_wallet: string
   message: string
   created_at: string
+  cursor?: string
+}
+
+// Append messages not already shown (replays and syncs can overlap live messages)
+const mergeMessages = (current: Message[], incoming: Message[]) => {
+  const seen = new Set(current.map(m => m.id).filter(Boolean))
+  return [...current, ...incoming.filter(m => !m.id || !seen.has(m.id))]
 }
 
 interface ChatProps {
@@ -45,17 +53,34 @@ export const Chat: React.FC<ChatProps> = ({
   const wallet = useWallet()
   const [messages, setMessages] = useState<Message[]>([])
   const [newMessage, setNewMessage] = useState('')
-  const [ws, setWs] = useState<WebSocket | null>(null)
+  const wsRef = useRef<WebSocket | null>(null)
+  const closingRef = useRef(false)
+  // Sent over the socket but not acked yet (client_id -> text); re-sent after a reconnect
+  const pendingRef = useRef<Map<string, string>>(new Map())
+  // Cursor of the newest message we have - reconnects and syncs fetch only what came after it
+  const cursorRef = useRef<string | null>(null)
+  // A /sync catch-up is paging - live frames must not move cursorRef past the unfetched gap
+  const catchingUpRef = useRef(false)
   const messagesEndRef = useRef<HTMLDivElement>(null)
 
   useEffect(() => {
+    closingRef.current = false
+    pendingRef.current.clear()
+    cursorRef.current = null
+    setMessages([])
     loadMessages()
     connectWebSocket()
 
+    // Back in the tab - pick up anything missed (a no-op delta when nothing changed)
+    const onVisibilityChange = () => {
+      if (document.visibilityState === 'visible') syncMessages()
+    }
+    document.addEventListener('visibilitychange', onVisibilityChange)
+
     return () => {
-      if (ws) {
-        ws.close()
-      }
+      closingRef.current = true
+      document.removeEventListener('visibilitychange', onVisibilityChange)
+      wsRef.current?.close()
     }
   }, [chatRoomId])
 
@@ -63,20 +88,63 @@ export const Chat: React.FC<ChatProps> = ({
     scrollToBottom()
   }, [messages])
 
-  const connectWebSocket = () => {
-    const wsUrl = `${getWebSocketUrl()}/ws/chat/${chatRoomId}`
-    console.log('Connecting to WebSocket:', wsUrl)
+  const connectWebSocket = async () => {
+    // Browsers can't set WebSocket headers - credentials go in the query string
+    const params = new URLSearchParams()
+    try {
+      const headers = await getAuthHeaders(wallet)
+      if (headers['X-Session-Token']) params.set('token', headers['X-Session-Token'])
+      else if (headers['X-Wallet-Address']) params.set('wallet', headers['X-Wallet-Address'])
+    } catch (error) {
+      console.warn('Chat socket opened without credentials (receive only):', error)
+    }
+    if (closingRef.current) return
+    // Resume: the server replays what we missed before going live
+    if (cursorRef.current) params.set('after', cursorRef.current)
+
+    const wsUrl = `${getWebSocketUrl()}/ws/chat/${chatRoomId}?${params.toString()}`
+    console.log('Connecting to WebSocket:', `${getWebSocketUrl()}/ws/chat/${chatRoomId}`)
     
     const websocket = new WebSocket(wsUrl)
     
     websocket.onopen = () => {
       console.log('✅ WebSocket connected')
+      // Retries are safe: the server dedupes on client_id
+      pendingRef.current.forEach((message, clientId) => {
+        websocket.send(JSON.stringify({ type: 'send', client_id: clientId, message }))
+      })
     }
     
     websocket.onmessage = (event) => {
       const data = JSON.parse(event.data)
+      // Control frames (heartbeats) carry a type; chat messages don't
+      if (data.type === 'ping') {
+        websocket.send(JSON.stringify({ type: 'pong' }))
+        return
+      }
+      if (data.type === 'ack') {
+        pendingRef.current.delete(data.client_id)
+        return
+      }
+      if (data.type === 'error') {
+        const text = pendingRef.current.get(data.client_id)
+        pendingRef.current.delete(data.client_id)
+        console.error('❌ Error sending message:', data.detail)
+        toast.error('Failed to send message')
+        if (text !== undefined) setNewMessage(text) // Restore message on error
+        return
+      }
+      if (data.type === 'replay') {
+        setMessages(prev => mergeMessages(prev, data.messages))
+        if (data.cursor) cursorRef.current = data.cursor
+        // Live frames follow right away - page the rest of the gap from the replay cursor
+        if (data.has_more) syncMessages(data.cursor)
+        return
+      }
+      if (data.type) return
       console.log('📩 Received message:', data)
-      setMessages(prev => [...prev, data])
+      setMessages(prev => mergeMessages(prev, [data]))
+      if (data.cursor && !catchingUpRef.current) cursorRef.current = data.cursor
     }
     
     websocket.onerror = (error) => {
@@ -86,9 +154,17 @@ export const Chat: React.FC<ChatProps> = ({
     
     websocket.onclose = () => {
       console.log('WebSocket closed')
+      // Server closes slow or silent connections - reconnect and resume from our cursor
+      if (!closingRef.current) {
+        setTimeout(() => {
+          if (closingRef.current) return
+          if (!cursorRef.current) loadMessages()
+          connectWebSocket()
+        }, 2000)
+      }
     }
     
-    setWs(websocket)
+    wsRef.current = websocket
   }
 
   const loadMessages = async () => {
@@ -100,25 +176,69 @@ export const Chat: React.FC<ChatProps> = ({
           headers
         }
       )
-      setMessages(response.data.messages)
+      setMessages(prev => mergeMessages(response.data.messages, prev))
+      if (response.data.cursor) cursorRef.current = response.data.cursor
+
+      // Read receipt - clears the unread badge in the matches list
+      await axios.post(`${API_BASE}/api/chat/${chatRoomId}/read`, {
+        wallet_address: userWallet
+      }, {
+        headers
+      })
     } catch (error) {
       console.error('Error loading messages:', error)
     }
   }
 
+  const syncMessages = async (after: string | null = cursorRef.current) => {
+    if (!after || catchingUpRef.current) return
+    // Pages chain on a local cursor; cursorRef only moves once the whole gap is fetched
+    // (messages that arrived live meanwhile are merged already and re-fetched at most once)
+    catchingUpRef.current = true
+    let cursor = after
+    try {
+      const headers = await getAuthHeaders(wallet)
+      let hasMore = true
+      while (hasMore && !closingRef.current) {
+        const response = await axios.get(`${API_BASE}/api/chat/${chatRoomId}/sync`, {
+          headers,
+          params: { after: cursor }
+        })
+        setMessages(prev => mergeMessages(prev, response.data.messages))
+        if (response.data.cursor) cursor = response.data.cursor
+        hasMore = response.data.has_more
+      }
+    } catch (error) {
+      console.error('Error syncing messages:', error)
+    } finally {
+      cursorRef.current = cursor
+      catchingUpRef.current = false
+    }
+  }
+
   const sendMessage = async () => {
     if (!newMessage.trim()) return
 
     const messageText = newMessage.trim()
+    const clientId = crypto.randomUUID()
     setNewMessage('') // Clear immediately for better UX
 
+    // Open socket: one frame, acked by the server
+    const websocket = wsRef.current
+    if (websocket && websocket.readyState === WebSocket.OPEN) {
+      pendingRef.current.set(clientId, messageText)
+      websocket.send(JSON.stringify({ type: 'send', client_id: clientId, message: messageText }))
+      return
+    }
+
     try {
       console.log('Sending message:', messageText)
       const headers = await getAuthHeaders(wallet)
       await axios.post(`${API_BASE}/api/chat/message`, {
         chat_room_id: chatRoomId,
         sender_wallet: userWallet,
-        message: messageText
+        message: messageText,
+        client_id: clientId
       }, {
         headers
       })
@@ -13,6 +13,16 @@ interface Match {
   wallet_address: string
   chat_room_id: string
   created_at: string
+  profile?: {
+    trader_number_formatted: string
+  }
+  last_message?: {
+    sender_wallet: string
+    message: string
+    created_at: string
+  } | null
+  last_activity_at?: string
+  unread_count?: number
 }
 
 interface MatchesProps {
@@ -24,19 +34,23 @@ export const Matches: React.FC<MatchesProps> = ({ walletAddress }) => {
   const [matches, setMatches] = useState<Match[]>([])
   const [selectedChat, setSelectedChat] = useState<string | null>(null)
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
 
   useEffect(() => {
     loadMatches()
   }, [walletAddress])
 
-  const loadMatches = async () => {
-    setLoading(true)
+  const loadMatches = async (cursor?: string) => {
+    if (!cursor) setLoading(true)
     try {
       const headers = await getAuthHeaders(wallet)
+      // One round trip per page: profile summary, last message and unread count included
       const response = await axios.get(`${API_BASE}/api/matches/${walletAddress}`, {
-        headers
+        headers,
+        params: cursor ? { cursor } : undefined
       })
-      setMatches(response.data.matches)
+      setMatches(prev => cursor ? [...prev, ...response.data.matches] : response.data.matches)
+      setNextCursor(response.data.next_cursor)
     } catch (error) {
       console.error('Error loading matches:', error)
     } finally {
@@ -60,7 +74,10 @@ export const Matches: React.FC<MatchesProps> = ({ walletAddress }) => {
         chatRoomId={selectedChat}
         userWallet={walletAddress}
         otherWallet={match?.wallet_address || ''}
-        onBack={() => setSelectedChat(null)}
+        onBack={() => {
+          setSelectedChat(null)
+          loadMatches()
+        }}
       />
     )
   }
@@ -95,20 +112,36 @@ export const Matches: React.FC<MatchesProps> = ({ walletAddress }) => {
               </div>
               <div className="flex-1 text-left min-w-0">
                 <p className="text-white font-bold text-lg mb-1 flex items-center gap-2">
-                  Trader {formatWallet(match.wallet_address)}
+                  Trader {match.profile?.trader_number_formatted && match.profile.trader_number_formatted !== 'Demo'
+                    ? match.profile.trader_number_formatted
+                    : formatWallet(match.wallet_address)}
                 </p>
-                <p className="text-sm text-gray-400 font-mono truncate">
-                  {match.wallet_address}
+                <p className="text-sm text-gray-400 truncate">
+                  {match.last_message ? match.last_message.message : <span className="font-mono">{match.wallet_address}</span>}
                 </p>
               </div>
               <div className="text-right flex-shrink-0">
                 <p className="text-xs text-cyan-400 mb-2 font-semibold">
-                  {formatDate(match.created_at)}
+                  {formatDate(match.last_activity_at || match.created_at)}
                 </p>
-                <FiMessageCircle className="text-xl text-gray-400 group-hover:text-green-400 transition ml-auto" />
+                {match.unread_count ? (
+                  <span className="inline-block min-w-[1.5rem] px-2 py-0.5 rounded-full bg-[#FD3021] text-white text-xs font-bold">
+                    {match.unread_count}
+                  </span>
+                ) : (
+                  <FiMessageCircle className="text-xl text-gray-400 group-hover:text-green-400 transition ml-auto" />
+                )}
               </div>
             </button>
           ))}
+          {nextCursor && (
+            <button
+              onClick={() => loadMatches(nextCursor)}
+              className="w-full py-3 text-sm text-cyan-400 hover:text-white transition"
+            >
+              Load more matches
+            </button>
+          )}
         </div>
       )}
     </div>